@@ -1,17 +1,28 @@
+import asyncio
 import json
 import os
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Optional
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    StreamingResponse,
+)
 from loguru import logger
 from pydantic import BaseModel
 
 from mcs import MedicalCoderSwarm
+from mcs.checkpoint import CheckpointStore
+from mcs.confidence import EarlyExitPolicy
+from mcs.metrics import metrics_registry
+from mcs.router import ModelRouter
+from mcs.security import KeyRotationPolicy, SecureDataHandler
+from mcs.streaming import format_sse
 
 load_dotenv()
 
@@ -33,6 +44,34 @@ app.add_middleware(
 
 db_path = "medical_coder.db"
 
+# Cases of one /run-batch request running at once
+batch_max_concurrency = int(os.getenv("MCS_BATCH_CONCURRENCY", "8"))
+
+# Route each case's stages to a small, medium or large model when
+# MCS_MODEL_ROUTING is set
+router = ModelRouter() if os.getenv("MCS_MODEL_ROUTING") else None
+
+# Skip the synthesizer for cases the coder is confident about when
+# MCS_EARLY_EXIT is set
+early_exit = EarlyExitPolicy() if os.getenv("MCS_EARLY_EXIT") else None
+
+# Encrypts the patient data the API keeps on disk, with the same keys
+# as the swarms it runs
+secure_handler = SecureDataHandler(
+    master_key=os.environ["MASTER_KEY"],
+    rotation_policy=KeyRotationPolicy(
+        rotation_interval=timedelta(days=30),
+        key_overlap_period=timedelta(days=2),
+    ),
+    auto_rotate=True,
+)
+
+# Completed stages of runs, so a failed run can be resumed
+checkpoint_store = CheckpointStore(
+    os.getenv("MCS_CHECKPOINT_DIR", ".mcs_checkpoints"),
+    secure_handler=secure_handler,
+)
+
 logger.add(
     "api.log",
     rotation="10 MB",
@@ -173,6 +212,7 @@ class PatientCase(BaseModel):
     case_description: Optional[str] = None
     summarization: Optional[bool] = False
     rag_url: Optional[str] = None
+    resume_run_id: Optional[str] = None
 
 
 class QueryResponse(BaseModel):
@@ -286,7 +326,7 @@ async def get_rate_limits(request: Request):
 
 
 @app.post("/v1/medical-coder/run", response_model=QueryResponse)
-def run_medical_coder(
+async def run_medical_coder(
     patient_case: PatientCase,
 ):
     """
@@ -296,15 +336,22 @@ def run_medical_coder(
         logger.info(
             f"Running MedicalCoderSwarm for patient: {patient_case.patient_id}"
         )
-        swarm = MedicalCoderSwarm(
+        swarm = await asyncio.to_thread(
+            MedicalCoderSwarm,
             patient_id=patient_case.patient_id,
             max_loops=1,
             output_type="all",
             patient_documentation=patient_case.patient_docs,
             summarization=patient_case.summarization,
             rag_url=patient_case.rag_url,
+            checkpoint_store=checkpoint_store,
+            router=router,
+            early_exit=early_exit,
+        )
+        output = await swarm.arun(
+            task=patient_case.case_description,
+            resume=patient_case.resume_run_id,
         )
-        output = swarm.run(task=patient_case.case_description)
 
         logger.info(
             f"MedicalCoderSwarm completed for patient: {patient_case.patient_id}"
@@ -314,12 +361,14 @@ def run_medical_coder(
             "patient_id": patient_case.patient_id,
             "patient_docs": patient_case.patient_docs,
             "agent_outputs": output,
-            "case_data": json.dumps(swarm.to_dict()),
+            "case_data": swarm.to_json(),
         }
 
         # swarm_output = swarm.to_dict()
-        save_patient_data(
-            patient_case.patient_id, json.dumps(agent_outputs)
+        await asyncio.to_thread(
+            save_patient_data,
+            patient_case.patient_id,
+            json.dumps(agent_outputs),
         )
 
         logger.info(
@@ -338,6 +387,55 @@ def run_medical_coder(
         raise error
 
 
+@app.post("/v1/medical-coder/run-stream")
+async def run_medical_coder_stream(
+    patient_case: PatientCase,
+):
+    """
+    Run the MedicalCoderSwarm on a patient case and stream its progress
+    as Server-Sent Events.
+    """
+    logger.info(
+        f"Streaming MedicalCoderSwarm for patient: {patient_case.patient_id}"
+    )
+    swarm = await asyncio.to_thread(
+        MedicalCoderSwarm,
+        patient_id=patient_case.patient_id,
+        max_loops=1,
+        output_type="all",
+        patient_documentation=patient_case.patient_docs,
+        summarization=patient_case.summarization,
+        rag_url=patient_case.rag_url,
+        router=router,
+        early_exit=early_exit,
+    )
+
+    async def event_stream():
+        async for event in swarm.arun_stream(
+            task=patient_case.case_description
+        ):
+            if event.type == "run_finished":
+                agent_outputs = {
+                    "patient_id": patient_case.patient_id,
+                    "patient_docs": patient_case.patient_docs,
+                    "agent_outputs": event.output,
+                    "case_data": swarm.to_json(),
+                }
+                await asyncio.to_thread(
+                    save_patient_data,
+                    patient_case.patient_id,
+                    json.dumps(agent_outputs),
+                )
+                logger.info(
+                    f"Patient data saved for patient: {patient_case.patient_id}"
+                )
+            yield format_sse(event)
+
+    return StreamingResponse(
+        event_stream(), media_type="text/event-stream"
+    )
+
+
 @app.get(
     "/v1/medical-coder/patient/{patient_id}",
     response_model=QueryResponse,
@@ -402,63 +500,91 @@ def get_all_patients():
         )
 
 
+async def _run_batch_case(
+    patient_case: PatientCase,
+) -> Optional[QueryResponse]:
+    """Run a single case of a batch, returning None on failure."""
+    try:
+        logger.info(
+            f"Running Batched MedicalCoderSwarm for patient: {patient_case.patient_id}"
+        )
+        swarm = await asyncio.to_thread(
+            MedicalCoderSwarm,
+            patient_id=patient_case.patient_id,
+            max_loops=1,
+            output_type="all",
+            patient_documentation=patient_case.patient_docs,
+            summarization=patient_case.summarization,
+            rag_url=patient_case.rag_url,
+            router=router,
+            early_exit=early_exit,
+        )
+
+        output = await swarm.arun(task=patient_case.case_description)
+
+        logger.info(
+            f"MedicalCoderSwarm completed for patient: {patient_case.patient_id}"
+        )
+
+        agent_outputs = {
+            "patient_id": patient_case.patient_id,
+            "patient_docs": patient_case.patient_docs,
+            "agent_outputs": output,
+            "case_data": swarm.to_json(),
+        }
+
+        await asyncio.to_thread(
+            save_patient_data,
+            patient_case.patient_id,
+            json.dumps(agent_outputs),
+        )
+
+        return QueryResponse(
+            patient_id=patient_case.patient_id,
+            case_data=json.dumps(agent_outputs),
+        )
+    except Exception as e:
+        logger.error(
+            f"Error processing patient case: {patient_case.patient_id} - {e}"
+        )
+        return None
+
+
 @app.post(
     "/v1/medical-coder/run-batch", response_model=List[QueryResponse]
 )
-def run_medical_coder_batch(
+async def run_medical_coder_batch(
     batch: BatchPatientCase,
 ):
     """
     Run the MedicalCoderSwarm on a batch of patient cases.
     """
-    responses = []
     logger.info("Running Batched MedicalCoderSwarm")
     logger.info(f"Batch size: {len(batch.cases)}")
 
-    for patient_case in batch.cases:
-        try:
-            logger.info(
-                f"Running Batched MedicalCoderSwarm for patient: {patient_case.patient_id}"
-            )
-            swarm = MedicalCoderSwarm(
-                patient_id=patient_case.patient_id,
-                max_loops=1,
-                output_type="all",
-                patient_documentation=patient_case.patient_docs,
-                summarization=patient_case.summarization,
-                rag_url=patient_case.rag_url,
-            )
+    semaphore = asyncio.Semaphore(batch_max_concurrency)
 
-            output = swarm.run(task=patient_case.case_description)
-
-            logger.info(
-                f"MedicalCoderSwarm completed for patient: {patient_case.patient_id}"
-            )
+    async def run_case(patient_case: PatientCase):
+        async with semaphore:
+            return await _run_batch_case(patient_case)
 
-            agent_outputs = {
-                "patient_id": patient_case.patient_id,
-                "patient_docs": patient_case.patient_docs,
-                "agent_outputs": output,
-                "case_data": json.dumps(swarm.to_dict()),
-            }
+    responses = await asyncio.gather(
+        *(run_case(patient_case) for patient_case in batch.cases)
+    )
 
-            save_patient_data(
-                patient_case.patient_id, json.dumps(agent_outputs)
-            )
+    return [response for response in responses if response]
 
-            responses.append(
-                QueryResponse(
-                    patient_id=patient_case.patient_id,
-                    case_data=json.dumps(agent_outputs),
-                )
-            )
-        except Exception as e:
-            logger.error(
-                f"Error processing patient case: {patient_case.patient_id} - {e}"
-            )
-            continue
 
-    return responses
+@app.get("/v1/metrics")
+def get_metrics(format: str = "json"):
+    """
+    Per-stage wall time, queue time, token and retry histograms of the
+    swarm runs served by this process. ``format=prometheus`` returns
+    the Prometheus text format.
+    """
+    if format == "prometheus":
+        return PlainTextResponse(metrics_registry.to_prometheus())
+    return metrics_registry.snapshot()
 
 
 @app.get("/health", status_code=200)
@@ -5,6 +5,7 @@ from contextlib import contextmanager
 from datetime import datetime
 import structlog
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
@@ -27,7 +28,9 @@ from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 # from opentelemetry.instrumentation.sqlite3 import SQLite3Instrumentor
 from prometheus_client import Counter, Histogram
 import uvicorn
+from mcs.hooks import OpenTelemetryHook
 from mcs.main import MedicalCoderSwarm
+from mcs.metrics import metrics_registry
 
 # Configure structured logging
 logger = structlog.get_logger()
@@ -38,6 +41,7 @@ otlp_span_exporter = OTLPSpanExporter()
 span_processor = BatchSpanProcessor(otlp_span_exporter)
 tracer_provider.add_span_processor(span_processor)
 trace.set_tracer_provider(tracer_provider)
+tracer = trace.get_tracer(__name__)
 
 # Configure metrics
 metric_reader = PeriodicExportingMetricReader(OTLPMetricExporter())
@@ -225,19 +229,18 @@ async def run_medical_coder(
                 patient_id=patient_case.patient_id,
                 max_loops=1,
                 patient_documentation="",
+                hooks=[OpenTelemetryHook(tracer)],
             )
             swarm.run(task=patient_case.case_description)
 
-            swarm_output = swarm.to_dict()
-            save_patient_data(
-                patient_case.patient_id, json.dumps(swarm_output)
-            )
+            swarm_output = swarm.to_json()
+            save_patient_data(patient_case.patient_id, swarm_output)
 
             request_counter.add(1, {"endpoint": "run_medical_coder"})
 
             return QueryResponse(
                 patient_id=patient_case.patient_id,
-                case_data=json.dumps(swarm_output),
+                case_data=swarm_output,
                 timestamp=datetime.utcnow(),
             )
         except Exception as error:
@@ -292,6 +295,14 @@ async def get_patient_data(patient_id: str, request: Request):
             raise
 
 
+@app.get("/v1/medical-coder/metrics")
+async def get_metrics(format: str = "json"):
+    """Per-stage latency, token and retry histograms of swarm runs"""
+    if format == "prometheus":
+        return PlainTextResponse(metrics_registry.to_prometheus())
+    return metrics_registry.snapshot()
+
+
 @app.get("/v1/medical-coder/health")
 async def health_check():
     """Health check endpoint for monitoring"""
@@ -284,7 +284,7 @@ class ContextAwareMedicalSwarm:
             full_context = f"{context}\nUser: {current_message}"
 
             # Process with swarm
-            response = self.swarm.run(
+            response = await self.swarm.arun(
                 task=full_context + "\n" + current_message,
             )
 
@@ -0,0 +1,60 @@
+"""
+Import-time benchmark for the mcs package.
+
+Each scenario runs in a fresh interpreter so module caches do not leak
+between measurements. The "eager" scenario reproduces what ``import
+mcs`` used to do: import swarms, build every shared agent and import the
+API client.
+
+Usage:
+    python benchmarks/import_time.py --repeats 5
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+SCENARIOS = {
+    "import mcs": "import mcs",
+    "from mcs import MedicalCoderSwarm": (
+        "from mcs import MedicalCoderSwarm"
+    ),
+    "eager (previous behaviour)": (
+        "import mcs.main as m\n"
+        "import mcs.api_client\n"
+        "for role in m._SHARED_AGENT_ROLES:\n"
+        "    getattr(m, role)\n"
+    ),
+}
+
+
+def time_scenario(code: str, repeats: int) -> float:
+    """Return the median wall time in seconds of running ``code``."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", code],
+            check=True,
+            stderr=subprocess.DEVNULL,
+        )
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = time_scenario("pass", args.repeats)
+    print(f"interpreter startup: {baseline * 1000:8.1f} ms")
+    for name, code in SCENARIOS.items():
+        elapsed = time_scenario(code, args.repeats) - baseline
+        print(f"{name:<36} {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
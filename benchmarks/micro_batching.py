@@ -0,0 +1,134 @@
+"""
+Benchmark of cross-case micro-batching under a provider rate limit.
+
+A local stub provider admits ``--rpm`` requests per minute, each taking
+``--latency`` seconds. A batch of cases is run with every agent call
+sent on its own, then with the calls collected by a ``MicroBatcher``.
+
+By default every message of a batch is its own provider request, as
+with ``LiteLLMFanOutProvider``, so micro-batching saves no requests.
+``--native-batch`` models a provider that serves a whole batch as one
+request.
+
+Usage:
+    PYTHONPATH=. python benchmarks/micro_batching.py --cases 32 --rpm 600
+    PYTHONPATH=. python benchmarks/micro_batching.py --native-batch
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from mcs.agents import AgentPool
+from mcs.batching import BatchRequest, MicroBatcher, StubBatchProvider
+from mcs.main import MedicalCoderSwarm
+
+os.environ.setdefault("MASTER_KEY", "benchmark_master_key")
+
+
+class RateLimitedProvider(StubBatchProvider):
+    """
+    Admits one request every ``60 / rpm`` seconds. A batch costs one
+    request per message, or a single request with ``native_batch``.
+    """
+
+    def __init__(
+        self, rpm: float, latency: float, native_batch: bool
+    ):
+        super().__init__(latency=latency)
+        self.interval = 60.0 / rpm
+        self.native_batch = native_batch
+        self.requests = 0
+        self._next = time.monotonic()
+        self._admit = threading.Lock()
+
+    def complete(self, requests):
+        cost = 1 if self.native_batch else len(requests)
+        with self._admit:
+            self.requests += cost
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval * cost
+            # The batch completes once its last message is admitted
+            wait = self._next - self.interval - now
+        if wait > 0:
+            time.sleep(wait)
+        return super().complete(requests)
+
+
+def agent_factory(provider: RateLimitedProvider):
+    class ProviderAgent:
+        """Sends each call to the provider on its own."""
+
+        def __init__(self, agent_name: str):
+            self.agent_name = agent_name
+            self.model_name = "stub-model"
+
+        def run(self, task: str) -> str:
+            (output,) = provider.complete(
+                [BatchRequest.from_agent(self, task)]
+            )
+            return output
+
+    return ProviderAgent
+
+
+def run_cases(args, directory: str, batched: bool) -> None:
+    provider = RateLimitedProvider(
+        args.rpm, args.latency, args.native_batch
+    )
+    batcher = (
+        MicroBatcher(
+            provider, window=args.window, max_batch=args.cases
+        )
+        if batched
+        else None
+    )
+    swarm = MedicalCoderSwarm(
+        key_storage_path=os.path.join(directory, "keys"),
+        agent_pool=AgentPool(agent_factory=agent_factory(provider)),
+        batch_max_workers=args.cases,
+        batcher=batcher,
+    )
+    tasks = [
+        f"Case {i}: eGFR {40 + i % 20}" for i in range(args.cases)
+    ]
+
+    start = time.perf_counter()
+    results = swarm.batched_run(tasks=tasks)
+    elapsed = time.perf_counter() - start
+    if batcher is not None:
+        batcher.close()
+
+    failed = sum(result.error is not None for result in results)
+    label = "micro-batched" if batched else "one request per call"
+    print(
+        f"{label:<22} {elapsed:7.2f} s  "
+        f"{args.cases / elapsed:6.2f} cases/s  "
+        f"{provider.requests:4d} provider requests  "
+        f"{failed} failed"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cases", type=int, default=32)
+    parser.add_argument("--rpm", type=float, default=600)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--window", type=float, default=0.02)
+    parser.add_argument(
+        "--native-batch",
+        action="store_true",
+        help="the provider serves a batch as one request",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        run_cases(args, directory, batched=False)
+        run_cases(args, directory, batched=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Benchmark of everything in a swarm run that is not the model.
+
+Agents are offline fakes from ``mcs.fake_agents``, so the numbers are
+the pipeline's own overhead: swarm construction, ``_run`` (with
+zero-latency agents, and with fixed-latency agents minus the critical
+path they account for), ``to_dict``/``to_json``, encryption of the
+output, the API's database write and a full API request handled
+in-process.
+
+Usage:
+    PYTHONPATH=. python benchmarks/pipeline_overhead.py --calls 50
+    PYTHONPATH=. python benchmarks/pipeline_overhead.py --only run api
+"""
+
+import os
+
+# Before mcs is imported, so the API's default agent pool is fake too
+os.environ.setdefault("MCS_AGENT_BACKEND", "fake")
+os.environ.setdefault("MASTER_KEY", "benchmark_master_key")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import importlib.util  # noqa: E402
+import statistics  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+
+from mcs.agents import AgentPool  # noqa: E402
+from mcs.fake_agents import FakeAgentFactory  # noqa: E402
+from mcs.fake_agents import FakeProfile  # noqa: E402
+from mcs.main import MedicalCoderSwarm  # noqa: E402
+
+API_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "api",
+    "api.py",
+)
+
+CASE = (
+    "Patient: 45-year-old male\n"
+    "Lab Results:\n- eGFR: 59 ml/min/1.73m2\n- HbA1c: 8.2%\n"
+    "- Urinalysis: microalbuminuria 300 mg/g\n"
+)
+
+SECTIONS = ("construct", "run", "serialize", "encrypt", "db", "api")
+
+# Stages on the default pipeline's critical path
+CRITICAL_PATH = 3
+
+
+def timeit(function, calls: int) -> float:
+    """Median seconds per call over five rounds."""
+    rounds = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        rounds.append((time.perf_counter() - start) / calls)
+    return statistics.median(rounds)
+
+
+def report(label: str, seconds: float) -> None:
+    print(f"  {label:<34}{seconds * 1e3:10.3f} ms")
+
+
+def make_swarm(directory: str, latency: float = 0.0, **kwargs):
+    factory = FakeAgentFactory(
+        FakeProfile(latency=latency, output_tokens=600)
+    )
+    return MedicalCoderSwarm(
+        patient_id="Patient-001",
+        key_storage_path=os.path.join(directory, "keys"),
+        agent_pool=AgentPool(agent_factory=factory, size=2),
+        **kwargs,
+    )
+
+
+def bench_construct(directory: str, args) -> None:
+    pool = AgentPool(agent_factory=FakeAgentFactory(), size=2)
+    seconds = timeit(
+        lambda: MedicalCoderSwarm(
+            key_storage_path=os.path.join(directory, "keys"),
+            agent_pool=pool,
+        ),
+        args.calls,
+    )
+    print("construction")
+    report("MedicalCoderSwarm()", seconds)
+
+
+def bench_run(directory: str, args) -> None:
+    print("run")
+    swarm = make_swarm(directory)
+    report(
+        "_run, instant agents",
+        timeit(lambda: swarm._run(CASE), args.calls),
+    )
+    report(
+        "arun, instant agents",
+        timeit(lambda: asyncio.run(swarm.arun(CASE)), args.calls),
+    )
+    swarm = make_swarm(directory, latency=args.latency)
+    total = timeit(lambda: swarm._run(CASE), max(args.calls // 5, 1))
+    report(f"_run, {args.latency * 1e3:g} ms agents", total)
+    report(
+        "  overhead over critical path",
+        total - CRITICAL_PATH * args.latency,
+    )
+
+
+def bench_serialize(directory: str, args) -> None:
+    swarm = make_swarm(directory)
+    swarm.run(CASE)
+    print("serialization")
+    report("to_dict (cached)", timeit(swarm.to_dict, args.calls))
+    report(
+        "to_dict (cold)",
+        timeit(
+            lambda: (swarm._serialized.clear(), swarm.to_dict()),
+            args.calls,
+        ),
+    )
+    report("to_json", timeit(swarm.to_json, args.calls))
+
+
+def bench_encrypt(directory: str, args) -> None:
+    swarm = make_swarm(directory)
+    output = swarm.run(CASE)
+    handler = swarm.secure_handler
+    encrypted = handler.encrypt_data(output)
+    print(f"encryption ({len(output) / 1024:.1f} KB output)")
+    report(
+        "encrypt_data",
+        timeit(lambda: handler.encrypt_data(output), args.calls),
+    )
+    report(
+        "decrypt_data",
+        timeit(lambda: handler.decrypt_data(encrypted), args.calls),
+    )
+
+
+def load_api(directory: str):
+    """
+    Import ``api/api.py`` (by path; the repository root also has an
+    ``api.py``) with its database and logs in ``directory``.
+    """
+    os.chdir(directory)
+    spec = importlib.util.spec_from_file_location("mcs_api", API_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench_db(directory: str, args) -> None:
+    api = load_api(directory)
+    swarm = make_swarm(directory)
+    swarm.run(CASE)
+    data = swarm.to_json()
+    print(f"database ({len(data) / 1024:.1f} KB row)")
+    report(
+        "save_patient_data",
+        timeit(
+            lambda: api.save_patient_data("Patient-001", data),
+            args.calls,
+        ),
+    )
+    report(
+        "fetch_patient_data",
+        timeit(
+            lambda: api.fetch_patient_data("Patient-001"), args.calls
+        ),
+    )
+
+
+def bench_api(directory: str, args) -> None:
+    from fastapi.testclient import TestClient
+
+    client = TestClient(load_api(directory).app)
+    payload = {
+        "patient_id": "Patient-001",
+        "patient_docs": "",
+        "case_description": CASE,
+    }
+
+    def request():
+        response = client.post("/v1/medical-coder/run", json=payload)
+        response.raise_for_status()
+
+    print("api")
+    report("POST /v1/medical-coder/run", timeit(request, args.calls))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.05,
+        help="seconds per fake agent call in the overhead run",
+    )
+    parser.add_argument(
+        "--only", nargs="+", choices=SECTIONS, default=SECTIONS
+    )
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            for section in SECTIONS:
+                if section in args.only:
+                    globals()[f"bench_{section}"](directory, args)
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
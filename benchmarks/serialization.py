@@ -0,0 +1,118 @@
+"""
+Benchmark for swarm state and output serialization.
+
+Compares the previous ``to_dict`` (every attribute encoded with
+``json.dumps`` just to check that it can be) with the cached,
+type-checked one, for growing patient documentation, then times the
+JSON encoders on the result and on ``MCSOutput``.
+
+Usage:
+    PYTHONPATH=. python benchmarks/serialization.py --calls 200
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from mcs.agents import AgentPool
+from mcs.main import MedicalCoderSwarm
+from mcs.serialization import dumps, orjson
+
+os.environ.setdefault("MASTER_KEY", "benchmark_master_key")
+
+CASE = "Lab Results:\n- eGFR: 59 ml/min/1.73m2\n- HbA1c: 8.2%\n"
+
+
+class EchoAgent:
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str) -> str:
+        return f"{self.agent_name}: E11.9 Type 2 diabetes mellitus"
+
+
+def legacy_to_dict(swarm: MedicalCoderSwarm) -> dict:
+    """``to_dict`` as it was before caching, for comparison."""
+    result = {}
+    for attr_name, attr_value in swarm.__dict__.items():
+        if attr_name == "_serialized":
+            continue
+        try:
+            if callable(attr_value):
+                result[attr_name] = swarm._serialize_callable(
+                    attr_value
+                )
+            elif hasattr(attr_value, "to_dict"):
+                result[attr_name] = attr_value.to_dict()
+            else:
+                json.dumps(attr_value)
+                result[attr_name] = attr_value
+        except (TypeError, ValueError):
+            result[attr_name] = (
+                f"<Non-serializable: {type(attr_value).__name__}>"
+            )
+    return result
+
+
+def timeit(function, calls: int) -> float:
+    """Median seconds per call over five rounds."""
+    rounds = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        rounds.append((time.perf_counter() - start) / calls)
+    return statistics.median(rounds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for kilobytes in (1, 100, 1000):
+            documentation = CASE * (kilobytes * 1000 // len(CASE))
+            swarm = MedicalCoderSwarm(
+                patient_documentation=documentation,
+                key_storage_path=os.path.join(directory, "keys"),
+                agent_pool=AgentPool(agent_factory=EchoAgent),
+            )
+            swarm.run("Code this visit")
+
+            legacy = timeit(lambda: legacy_to_dict(swarm), args.calls)
+            cached = timeit(swarm.to_dict, args.calls)
+            state = swarm.to_dict()
+            stdlib = timeit(lambda: json.dumps(state), args.calls)
+            fast = timeit(lambda: dumps(state), args.calls)
+
+            print(f"documentation {kilobytes:5d} KB")
+            print(f"  legacy to_dict:   {legacy * 1e6:10.1f} us")
+            print(f"  cached to_dict:   {cached * 1e6:10.1f} us")
+            print(f"  json.dumps:       {stdlib * 1e6:10.1f} us")
+            print(
+                f"  dumps ({'orjson' if orjson else 'json'}):"
+                f"    {fast * 1e6:10.1f} us"
+            )
+
+        output = swarm.output_schema
+        pydantic = timeit(output.model_dump_json, args.calls)
+        indented = timeit(
+            lambda: output.model_dump_json(indent=4), args.calls
+        )
+        via_dumps = timeit(
+            lambda: dumps(output.model_dump(mode="json")), args.calls
+        )
+        print("MCSOutput")
+        print(f"  model_dump_json:          {pydantic * 1e6:8.1f} us")
+        print(f"  model_dump_json(indent):  {indented * 1e6:8.1f} us")
+        print(
+            f"  dumps(model_dump):        {via_dumps * 1e6:8.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,43 @@
-from dotenv import load_dotenv
-
-load_dotenv()
-
-from mcs.main import MedicalCoderSwarm  # noqa: E402
-from mcs.api_client import (  # noqa: E402
-    PatientCase,
-    QueryResponse,
-    MCSClient,
-    MCSClientError,
-    RateLimitError,
-)  # noqa: E402
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from mcs.main import MedicalCoderSwarm
+    from mcs.api_client import (
+        PatientCase,
+        QueryResponse,
+        MCSClient,
+        MCSClientError,
+        RateLimitError,
+    )
+
+# Public names and the submodule that defines them. Submodules are only
+# imported when one of their names is first accessed, so ``import mcs``
+# stays cheap and does not pull in swarms, requests or the agents.
+_LAZY_IMPORTS = {
+    "MedicalCoderSwarm": "mcs.main",
+    "PatientCase": "mcs.api_client",
+    "QueryResponse": "mcs.api_client",
+    "MCSClient": "mcs.api_client",
+    "MCSClientError": "mcs.api_client",
+    "RateLimitError": "mcs.api_client",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}"
+        )
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_IMPORTS))
+
 
 __all__ = [
     "MedicalCoderSwarm",
@@ -0,0 +1,673 @@
+import functools
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    from swarms import Agent
+
+# Keyword arguments for every agent role the swarm knows about. Agents
+# are built from these by ``create_agent`` so each run can own its own
+# instances instead of sharing module-level singletons.
+AGENT_CONFIGS: Dict[str, Dict[str, Any]] = {}
+
+AGENT_CONFIGS["chief_medical_officer"] = dict(
+    agent_name="Chief Medical Officer",
+    system_prompt="""
+    You are the Chief Medical Officer coordinating a team of medical specialists for viral disease diagnosis.
+    Your responsibilities include:
+    - Gathering initial patient symptoms and medical history
+    - Coordinating with specialists to form differential diagnoses
+    - Synthesizing different specialist opinions into a cohesive diagnosis
+    - Ensuring all relevant symptoms and test results are considered
+    - Making final diagnostic recommendations
+    - Suggesting treatment plans based on team input
+    - Identifying when additional specialists need to be consulted
+    - For each differential diagnosis, cite the lab results that support or contradict it; the lab ranges indicative of common diagnoses are provided with the case
+    
+    Format all responses with clear sections for:
+    - Initial Assessment (include preliminary ICD-10 codes for symptoms)
+    - Differential Diagnoses (with corresponding ICD-10 codes)
+    - Specialist Consultations Needed
+    - Recommended Next Steps
+    
+    
+    """,
+    model_name="groq/deepseek-r1-distill-llama-70b",
+    max_loops=1,
+    dynamic_temperature_enabled=True,
+)
+
+# virologist = Agent(
+#     agent_name="Virologist",
+#     system_prompt="""You are a specialist in viral diseases. For each case, provide:
+
+#     Clinical Analysis:
+#     - Detailed viral symptom analysis
+#     - Disease progression timeline
+#     - Risk factors and complications
+
+#     Coding Requirements:
+#     - List relevant ICD-10 codes for:
+#         * Confirmed viral conditions
+#         * Suspected viral conditions
+#         * Associated symptoms
+#         * Complications
+#     - Include both:
+#         * Primary diagnostic codes
+#         * Secondary condition codes
+
+#     Document all findings using proper medical coding standards and include rationale for code selection.""",
+#     model_name="groq/deepseek-r1-distill-llama-70b",
+#     max_loops=1,
+#     dynamic_temperature_enabled=True,
+# )
+
+AGENT_CONFIGS["internist"] = dict(
+    agent_name="Internist",
+    system_prompt="""
+    You are an Internal Medicine specialist responsible for comprehensive evaluation.
+    
+    For each case, provide:
+    
+    Clinical Assessment:
+    - System-by-system review
+    - Vital signs analysis
+    - Comorbidity evaluation
+    
+    Medical Coding:
+    - ICD-10 codes for:
+        * Primary conditions
+        * Secondary diagnoses
+        * Complications
+        * Chronic conditions
+        * Signs and symptoms
+    - Include hierarchical condition category (HCC) codes where applicable
+    
+    Document supporting evidence for each code selected.""",
+    model_name="groq/deepseek-r1-distill-llama-70b",
+    max_loops=1,
+    dynamic_temperature_enabled=True,
+)
+
+AGENT_CONFIGS["medical_coder"] = dict(
+    agent_name="Medical Coder",
+    system_prompt="""
+    You are a highly experienced and certified medical coder with extensive knowledge of ICD-10 coding guidelines, clinical documentation standards, and compliance regulations. Your responsibility is to ensure precise, compliant, and well-documented coding for all clinical cases.
+
+    ### Primary Responsibilities:
+    1. **Review Clinical Documentation**: Analyze all available clinical records, including specialist inputs, physician notes, lab results, imaging reports, and discharge summaries.
+    2. **Assign Accurate ICD-10 Codes**: Identify and assign appropriate codes for primary diagnoses, secondary conditions, symptoms, and complications.
+    3. **Ensure Coding Compliance**: Follow the latest ICD-10-CM/PCS coding guidelines, payer-specific requirements, and organizational policies.
+    4. **Document Code Justification**: Provide clear, evidence-based rationale for each assigned code.
+
+    ### Detailed Coding Process:
+    - **Review Specialist Inputs**: Examine all relevant documentation to capture the full scope of the patient's condition and care provided.
+    - **Identify Diagnoses**: Determine the primary and secondary diagnoses, as well as any symptoms or complications, based on the documentation.
+    - **Assign ICD-10 Codes**: Select the most accurate and specific ICD-10 codes for each identified diagnosis or condition.
+    - **Document Supporting Evidence**: Record the documentation source (e.g., lab report, imaging, or physician note) for each code to justify its assignment.
+    - **Address Queries**: Note and flag any inconsistencies, missing information, or areas requiring clarification from providers.
+
+    ### Output Requirements:
+    Your response must be clear, structured, and compliant with professional standards. Use the following format:
+
+    1. **Primary Diagnosis Codes**:
+        - **ICD-10 Code**: [e.g., E11.9]
+        - **Description**: [e.g., Type 2 diabetes mellitus without complications]
+        - **Supporting Documentation**: [e.g., Physician's note dated MM/DD/YYYY]
+        
+    2. **Secondary Diagnosis Codes**:
+        - **ICD-10 Code**: [Code]
+        - **Description**: [Description]
+        - **Order of Clinical Significance**: [Rank or priority]
+
+    3. **Symptom Codes**:
+        - **ICD-10 Code**: [Code]
+        - **Description**: [Description]
+
+    4. **Complication Codes**:
+        - **ICD-10 Code**: [Code]
+        - **Description**: [Description]
+        - **Relevant Documentation**: [Source of information]
+
+    5. **Coding Notes**:
+        - Observations, clarifications, or any potential issues requiring provider input.
+
+    6. **Confidence**: [A number from 0 to 1 for how certain you are that the codes above are complete and correct]
+
+    ### Additional Guidelines:
+    - Always prioritize specificity and compliance when assigning codes.
+    - For ambiguous cases, provide a brief note with reasoning and flag for clarification.
+    - Ensure the output format is clean, consistent, and ready for professional use.
+    """,
+    model_name="groq/deepseek-r1-distill-llama-70b",
+    max_loops=1,
+    dynamic_temperature_enabled=True,
+)
+
+AGENT_CONFIGS["diagnostic_synthesizer"] = dict(
+    agent_name="Diagnostic Synthesizer",
+    system_prompt="""You are responsible for creating the final diagnostic and coding assessment.
+    
+    Synthesis Requirements:
+    1. Integrate all specialist findings
+    2. Reconcile any conflicting diagnoses
+    3. Verify coding accuracy and completeness
+    
+    Final Report Sections:
+    1. Clinical Summary
+        - Primary diagnosis with ICD-10
+        - Secondary diagnoses with ICD-10
+        - Supporting evidence
+    2. Coding Summary
+        - Complete code list with descriptions
+        - Code hierarchy and relationships
+        - Supporting documentation
+    3. Recommendations
+        - Additional testing needed
+        - Follow-up care
+        - Documentation improvements needed
+    
+    Include confidence levels and evidence quality for all diagnoses and codes.""",
+    model_name="groq/deepseek-r1-distill-llama-70b",
+    max_loops=1,
+    dynamic_temperature_enabled=True,
+)
+
+AGENT_CONFIGS["synthesizer"] = dict(
+    agent_name="Hierarchical Summarization Agent",
+    system_prompt="""You are an expert in hierarchical summarization, skilled at condensing complex medical data into structured, efficient, and accurate summaries. Your task is to generate concise and well-organized summaries that prioritize the most important information while maintaining clarity and completeness.
+
+    ### Summarization Goals:
+    1. Extract and prioritize key insights from detailed medical data.
+    2. Present information hierarchically, starting with the most critical and broad insights before including finer details.
+    3. Ensure summaries are actionable, evidence-backed, and easy to understand by medical professionals.
+
+    ### Output Structure:
+    #### 1. Executive Summary:
+    - **Primary Focus**: State the main diagnosis or issue.
+    - **Key Supporting Evidence**: Highlight critical findings (e.g., lab results, imaging, symptoms).
+    - **ICD-10 Codes**: Include codes relevant to the primary diagnosis.
+
+    #### 2. Detailed Findings:
+    - **Secondary Issues**: List additional diagnoses or findings with brief explanations.
+    - **Supporting Details**: Provide summarized evidence for each finding.
+
+    #### 3. Action Plan:
+    - **Recommendations**: Outline immediate next steps (e.g., additional tests, treatments, follow-ups).
+    - **Unresolved Questions**: Highlight gaps in data or areas requiring further investigation.
+
+    ### Guidelines for Summarization:
+    - **Be Concise**: Use bullet points and short paragraphs for readability.
+    - **Prioritize Information**: Rank findings by clinical relevance and urgency.
+    - **Maintain Accuracy**: Ensure all summaries are backed by provided data and include confidence levels for findings.
+    - **Simplify Complex Data**: Translate medical jargon into clear and accessible language where appropriate.
+
+    
+    ### Output Style:
+    - Clear and professional tone.
+    - Consistent structure with easy-to-scan sections.
+    - Minimize redundancy while ensuring completeness.
+    """,
+    model_name="groq/deepseek-r1-distill-llama-70b",
+    max_loops=1,
+    dynamic_temperature_enabled=True,
+)
+
+AGENT_CONFIGS["summarizer_agent"] = dict(
+    agent_name="Condensed Summarization Agent",
+    system_prompt="""You are an expert in creating concise and actionable summaries from tweets, short texts, and small reports. Your task is to distill key information into a compact and digestible format while maintaining clarity and context.
+
+    ### Summarization Goals:
+    1. Identify the most critical message or insight from the input text.
+    2. Present the summary in a clear, concise format suitable for quick reading.
+    3. Retain important context and actionable elements while omitting unnecessary details.
+
+    ### Output Structure:
+    #### 1. Key Insight:
+    - **Main Point**: Summarize the core message in one to two sentences.
+    - **Relevant Context**: Include key supporting details (if applicable).
+
+    #### 2. Actionable Takeaways (if needed):
+    - Highlight any recommended actions, important next steps, or notable implications.
+
+    ### Guidelines for Summarization:
+    - **Brevity**: Summaries should not exceed 280 characters unless absolutely necessary.
+    - **Clarity**: Avoid ambiguity or technical jargon; focus on accessibility.
+    - **Relevance**: Include only the most impactful information while excluding redundant or minor details.
+    - **Tone**: Match the tone of the original content (e.g., professional, casual, or informative).
+
+    ### Example Workflow:
+    1. Analyze the input for the primary message or intent.
+    2. Condense the content into a clear, actionable summary.
+    3. Format the output to ensure readability and coherence.
+
+    ### Output Style:
+    - Clear, concise, and easy to understand.
+    - Suitable for social media or quick report overviews.
+    """,
+    model_name="groq/deepseek-r1-distill-llama-70b",
+    max_loops=1,
+    dynamic_temperature_enabled=False,  # Keeps summaries consistently concise
+)
+
+AGENT_CONFIGS["lab_matcher"] = dict(
+    agent_name="Laboratory-Test-Matcher",
+    system_prompt="""
+    You are a specialist in laboratory medicine responsible for matching diagnoses with appropriate laboratory tests, providing reference ranges, and identifying the most suitable laboratory locations for patients.
+
+    Primary Responsibilities:
+    1. Match diagnoses to appropriate laboratory tests
+    2. Provide reference ranges and interpretation guidelines
+    3. Indicate test priorities and sequences
+    4. Specify collection requirements
+    5. Identify the most suitable laboratory locations for patients based on their location and diagnosis
+
+    For each case, provide:
+
+    Test Recommendations:
+    - Primary diagnostic tests
+    - Confirmatory tests
+    - Monitoring tests
+    - Differential diagnosis tests
+    
+    Test Details:
+    - Test names and codes (LOINC if applicable)
+    - Specimen requirements
+    - Reference ranges by:
+        * Age
+        * Sex
+        * Special conditions
+    - Critical values
+    
+    Clinical Correlation:
+    - Expected results for specific conditions
+    - Interfering factors
+    - Result interpretation guidelines
+    - Follow-up testing recommendations
+    
+    Laboratory Location Recommendations:
+    - Identify the nearest laboratory locations to the patient based on their address
+    - Provide information on laboratory hours, contact details, and any specific requirements for specimen collection
+    
+    Documentation Requirements:
+    - Medical necessity justification
+    - ICD-10 codes for coverage
+    - Frequency limitations
+    - Special authorization requirements
+    
+    Output Format:
+    1. Primary Test Panel
+        - Essential tests with rationale
+        - Reference ranges
+        - Expected results
+    2. Secondary Tests
+        - Confirmatory tests
+        - Monitoring tests
+    3. Specimen Requirements
+        - Collection instructions
+        - Processing notes
+    4. Interpretation Guidelines
+        - Result interpretation
+        - Clinical correlation
+    5. Laboratory Location Information
+        - Nearest laboratory locations to the patient
+        - Laboratory details (hours, contact, specimen collection requirements)
+    6. Coverage Documentation
+        - Required ICD-10 codes
+        - Medical necessity documentation
+        
+    Always specify:
+    - Test sensitivity and specificity when available
+    - Time considerations (STAT vs. routine)
+    - Cost considerations
+    - Alternative test options
+    """,
+    model_name="groq/deepseek-r1-distill-llama-70b",
+    max_loops=1,
+    dynamic_temperature_enabled=True,
+)
+
+
+AGENT_CONFIGS["treatment_agent"] = dict(
+    agent_name="Treatment-Agent",
+    system_prompt="""
+    You are a specialist in treatment options, responsible for recommending the most effective and cost-efficient treatments for patients, considering both traditional and modern medicine approaches.
+
+    Primary Responsibilities:
+    1. Provide treatment recommendations for various diagnoses
+    2. Offer multiple treatment methods, including traditional and modern medicine approaches
+    3. Rank treatment options based on effectiveness and estimated cost
+    4. Consider patient-specific factors, such as age, health status, and allergies
+    5. Provide detailed treatment plans, including dosages, frequencies, and duration
+
+    For each case, provide:
+
+    Treatment Recommendations:
+    - Multiple treatment options, including traditional and modern medicine approaches
+    - Ranking of treatment options based on effectiveness and estimated cost
+    - Consideration of patient-specific factors, such as age, health status, and allergies
+    
+    Treatment Details:
+    - Detailed treatment plans, including dosages, frequencies, and duration
+    - Information on potential side effects and interactions
+    - Monitoring and follow-up requirements
+    
+    Cost Analysis:
+    - Estimated cost of each treatment option
+    - Breakdown of costs, including medication, hospitalization, and other expenses
+    
+    Patient Education:
+    - Clear explanations of treatment options and their benefits
+    - Instructions for self-care and lifestyle modifications
+    - Addressing patient concerns and questions
+    
+    Output Format:
+    1. Treatment Options
+        - Ranked list of treatment options with effectiveness and cost analysis
+        - Detailed treatment plans
+    2. Patient Education
+        - Clear explanations of treatment options and their benefits
+        - Instructions for self-care and lifestyle modifications
+    3. Cost Analysis
+        - Estimated cost of each treatment option
+        - Breakdown of costs
+    4. Monitoring and Follow-up
+        - Requirements for monitoring and follow-up care
+        - Scheduling and frequency of follow-up appointments
+    
+    Always specify:
+    - Evidence-based information to support treatment recommendations
+    - Consideration of patient preferences and values
+    - Alternative treatment options for patients with specific needs or restrictions
+    """,
+    model_name="groq/deepseek-r1-distill-llama-70b",
+    max_loops=1,
+    dynamic_temperature_enabled=True,
+    do_not_use_cluster_ops=True,
+)
+
+
+# Roles used by the default MedicalCoderSwarm pipeline
+PIPELINE_ROLES: Tuple[str, ...] = (
+    "medical_coder",
+    "synthesizer",
+    "treatment_agent",
+    "summarizer_agent",
+)
+
+
+def create_agent(role: str, **overrides: Any) -> "Agent":
+    """
+    Build a fresh agent for a role from ``AGENT_CONFIGS``.
+
+    Args:
+        role (str): Key into ``AGENT_CONFIGS``.
+        **overrides: Keyword arguments that replace the role's defaults.
+
+    Returns:
+        Agent: A new agent with its own conversation memory.
+    """
+    if role not in AGENT_CONFIGS:
+        raise KeyError(f"Unknown agent role: {role}")
+
+    # Imported here so that importing mcs does not pay for swarms
+    from swarms import Agent
+
+    return Agent(**{**AGENT_CONFIGS[role], **overrides})
+
+
+def reset_agent(agent: Any) -> None:
+    """
+    Return an agent's conversation memory to its freshly built state
+    so nothing from the previous run leaks into the next one.
+    """
+    short_memory_init = getattr(agent, "short_memory_init", None)
+    if callable(short_memory_init):
+        agent.short_memory = short_memory_init()
+
+
+# Calls in flight per agent. A stage that timed out cannot be
+# interrupted, so its agent may still be working after the run ended.
+_calls_lock = threading.Lock()
+_calls: "weakref.WeakKeyDictionary[Any, int]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+@contextmanager
+def agent_call(agent: Any) -> Iterator[None]:
+    """
+    Mark a call in flight on ``agent`` for the duration of the block.
+    Agents that cannot be weakly referenced are not tracked.
+    """
+    try:
+        with _calls_lock:
+            _calls[agent] = _calls.get(agent, 0) + 1
+    except TypeError:
+        yield
+        return
+    try:
+        yield
+    finally:
+        with _calls_lock:
+            remaining = _calls.pop(agent) - 1
+            if remaining:
+                _calls[agent] = remaining
+
+
+def in_flight(agent: Any) -> bool:
+    """Whether ``agent`` has a call in flight."""
+    try:
+        with _calls_lock:
+            return agent in _calls
+    except TypeError:
+        return False
+
+
+class AgentRegistry:
+    """
+    Thread-safe registry of shared agents built on first use.
+
+    Nothing is constructed until a role is requested, so agents the
+    pipeline never touches cost nothing at import time.
+    """
+
+    def __init__(
+        self, agent_factory: Callable[[str], Any] = create_agent
+    ):
+        self.agent_factory = agent_factory
+        self._lock = threading.Lock()
+        self._agents: Dict[str, Any] = {}
+
+    def get(self, role: str) -> Any:
+        """Return the shared agent for a role, building it if needed."""
+        agent = self._agents.get(role)
+        if agent is None:
+            with self._lock:
+                agent = self._agents.get(role)
+                if agent is None:
+                    agent = self.agent_factory(role)
+                    self._agents[role] = agent
+        return agent
+
+    def __contains__(self, role: str) -> bool:
+        return role in AGENT_CONFIGS
+
+    @property
+    def built(self) -> Tuple[str, ...]:
+        """Roles whose agents have been constructed so far."""
+        return tuple(self._agents)
+
+
+class AgentPool:
+    """
+    Thread-safe pool of isolated agent sets.
+
+    Every ``acquire`` hands out a dict of role -> agent that no other
+    run is using. Released sets have their memory reset and are kept for
+    reuse, so steady-state runs skip agent construction entirely.
+
+    Usage:
+        >>> pool = AgentPool(size=4)
+        >>> with pool.lease() as agents:
+        >>>     agents["medical_coder"].run("...")
+    """
+
+    def __init__(
+        self,
+        roles: Tuple[str, ...] = PIPELINE_ROLES,
+        size: int = 0,
+        max_idle: int = 32,
+        agent_factory: Callable[[str], Any] = create_agent,
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            roles (Tuple[str, ...]): Roles included in every agent set.
+            size (int): Number of agent sets to build up front.
+            max_idle (int): Maximum number of released sets kept for reuse.
+            agent_factory (Callable[[str], Any]): Builds an agent for a role.
+        """
+        self.roles = tuple(roles)
+        self.max_idle = max_idle
+        self.agent_factory = agent_factory
+        self._lock = threading.Lock()
+        self._idle: List[Dict[str, Any]] = []
+        self._sub_pools: Dict[Tuple, "AgentPool"] = {}
+        self.warm(size)
+
+    def _build_set(self) -> Dict[str, Any]:
+        return {role: self.agent_factory(role) for role in self.roles}
+
+    def warm(self, count: int) -> None:
+        """Build ``count`` agent sets ahead of time."""
+        agent_sets = [self._build_set() for _ in range(count)]
+        with self._lock:
+            self._idle.extend(agent_sets[: self.max_idle])
+
+    def acquire(self) -> Dict[str, Any]:
+        """Take an idle agent set, building a new one if none is free."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._build_set()
+
+    def release(self, agent_set: Dict[str, Any]) -> None:
+        """
+        Reset an agent set and return it to the pool. A set with a call
+        still in flight, left behind by a stage that timed out, is
+        dropped instead: resetting it or leasing it to another run would
+        share the agent with the call.
+        """
+        if any(in_flight(agent) for agent in agent_set.values()):
+            return
+        for agent in agent_set.values():
+            reset_agent(agent)
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(agent_set)
+
+    @contextmanager
+    def lease(self) -> Iterator[Dict[str, Any]]:
+        """Context manager that acquires an agent set and releases it."""
+        agent_set = self.acquire()
+        try:
+            yield agent_set
+        finally:
+            self.release(agent_set)
+
+    def sub_pool(
+        self, roles: Tuple[str, ...], **overrides: Any
+    ) -> "AgentPool":
+        """
+        Pool of agent sets limited to ``roles`` that shares this pool's
+        factory, e.g. for fanning many coder calls out in parallel.
+        ``overrides`` are passed to the factory, e.g. ``model_name`` to
+        run the roles on another model.
+        """
+        roles = tuple(roles)
+        key = (roles, tuple(sorted(overrides.items())))
+        with self._lock:
+            pool = self._sub_pools.get(key)
+            if pool is None:
+                factory = self.agent_factory
+                if overrides:
+                    factory = functools.partial(factory, **overrides)
+                pool = AgentPool(
+                    roles=roles,
+                    max_idle=self.max_idle,
+                    agent_factory=factory,
+                )
+                self._sub_pools[key] = pool
+            return pool
+
+    @property
+    def idle(self) -> int:
+        """Number of agent sets ready for reuse."""
+        with self._lock:
+            return len(self._idle)
+
+
+def default_agent_factory() -> Callable[[str], Any]:
+    """
+    Factory of the process-wide agents: swarms agents, or offline fakes
+    from ``mcs.fake_agents`` when ``MCS_AGENT_BACKEND=fake``, e.g. to
+    run the API or benchmarks without a model provider.
+    """
+    backend = os.getenv("MCS_AGENT_BACKEND", "swarms")
+    if backend == "fake":
+        from mcs.fake_agents import FakeAgentFactory
+
+        return FakeAgentFactory.from_env()
+    if backend != "swarms":
+        raise ValueError(f"Unknown MCS_AGENT_BACKEND: {backend}")
+    return create_agent
+
+
+class DeferredAgentFactory:
+    """
+    Agent factory that picks its backend on the first agent it builds.
+
+    The module-level registry and pool are created at import time,
+    before ``mcs.main`` loads ``.env``; deferring the choice lets a
+    ``MCS_AGENT_BACKEND`` set there take effect.
+    """
+
+    def __init__(self):
+        self._factory: Optional[Callable[..., Any]] = None
+        self._lock = threading.Lock()
+
+    def __call__(self, role: str, **overrides: Any) -> Any:
+        if self._factory is None:
+            with self._lock:
+                if self._factory is None:
+                    load_dotenv()
+                    self._factory = default_agent_factory()
+        return self._factory(role, **overrides)
+
+
+_default_factory = DeferredAgentFactory()
+
+# Registry behind the shared module-level agents in mcs.main
+agent_registry = AgentRegistry(_default_factory)
+
+# Pool shared by every MedicalCoderSwarm in the process unless one is
+# passed explicitly.
+default_agent_pool: Optional[AgentPool] = AgentPool(
+    agent_factory=_default_factory
+)
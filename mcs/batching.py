@@ -0,0 +1,279 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from mcs.metrics import MetricsRegistry, metrics_registry
+
+BATCH_SIZE_BUCKETS: Tuple[float, ...] = (1, 2, 4, 8, 16, 32, 64)
+
+
+@dataclass(frozen=True)
+class BatchRequest:
+    """One agent call, as sent to a batch provider."""
+
+    agent_name: str
+    model: Optional[str]
+    prompt: str
+    system_prompt: Optional[str] = None
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+
+    @classmethod
+    def from_agent(cls, agent: Any, task: Any) -> "BatchRequest":
+        return cls(
+            agent_name=agent.agent_name,
+            model=getattr(agent, "model_name", None),
+            prompt=str(task),
+            system_prompt=getattr(agent, "system_prompt", None),
+            temperature=getattr(agent, "temperature", None),
+            max_tokens=getattr(agent, "max_tokens", None),
+        )
+
+    @property
+    def key(self) -> Tuple[str, Optional[str]]:
+        """Requests with the same stage and model share batches."""
+        return (self.agent_name, self.model)
+
+    def messages(self) -> List[Dict[str, str]]:
+        messages = []
+        if self.system_prompt:
+            messages.append(
+                {"role": "system", "content": self.system_prompt}
+            )
+        messages.append({"role": "user", "content": self.prompt})
+        return messages
+
+
+class BatchProvider:
+    """
+    Interface of model providers that accept several requests at once.
+
+    ``complete`` returns one item per request, in order: the completion,
+    or the exception that request failed with. Raising fails the whole
+    batch. Whether a batch counts as one request against the
+    provider's rate limit is up to the implementation.
+    """
+
+    def complete(
+        self, requests: Sequence[BatchRequest]
+    ) -> List[Union[str, BaseException]]:
+        raise NotImplementedError
+
+
+class LiteLLMFanOutProvider(BatchProvider):
+    """
+    Sends the requests of a batch concurrently through
+    ``litellm.batch_completion`` (the library swarms agents call models
+    through).
+
+    This is client-side fan-out: litellm makes one provider request per
+    message list, so a batch of 16 costs 16 requests against the
+    provider's rate limit. It saves threads and connections, not
+    requests.
+    """
+
+    def complete(
+        self, requests: Sequence[BatchRequest]
+    ) -> List[Union[str, BaseException]]:
+        # Imported here so the dependency stays optional
+        import litellm
+
+        first = requests[0]
+        options = {}
+        if first.temperature is not None:
+            options["temperature"] = first.temperature
+        if first.max_tokens is not None:
+            options["max_tokens"] = first.max_tokens
+        responses = litellm.batch_completion(
+            model=first.model,
+            messages=[request.messages() for request in requests],
+            **options,
+        )
+        return [
+            (
+                response
+                if isinstance(response, BaseException)
+                else response.choices[0].message.content
+            )
+            for response in responses
+        ]
+
+
+class StubBatchProvider(BatchProvider):
+    """
+    Local provider for tests and benchmarks. Every batch takes
+    ``latency`` seconds and each request is answered by ``respond``;
+    the size of every batch is recorded in ``batches``.
+    """
+
+    def __init__(
+        self,
+        respond: Optional[
+            Callable[[BatchRequest], Union[str, BaseException]]
+        ] = None,
+        latency: float = 0.0,
+    ):
+        self.respond = respond or (
+            lambda request: f"{request.agent_name}: {request.prompt}"
+        )
+        self.latency = latency
+        self.batches: List[int] = []
+        self._lock = threading.Lock()
+
+    def complete(
+        self, requests: Sequence[BatchRequest]
+    ) -> List[Union[str, BaseException]]:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.batches.append(len(requests))
+        return [self.respond(request) for request in requests]
+
+
+class MicroBatcher:
+    """
+    Collects agent calls of concurrent runs into provider batches.
+
+    Calls for the same stage and model are held for up to ``window``
+    seconds, or until ``max_batch`` are waiting, then sent to the
+    provider as one batch; each caller gets its own result back. Only a
+    provider that serves a batch as one request, such as a self-hosted
+    server taking several prompts per call, turns many concurrent cases
+    into fewer requests; with ``LiteLLMFanOutProvider`` every call is
+    still its own request.
+
+    Args:
+        provider (BatchProvider): Where batches are sent.
+        window (float): Seconds the first call of a batch waits for
+            others.
+        max_batch (int): Calls that close a batch immediately.
+        max_workers (int): Batches in flight at once.
+        metrics (MetricsRegistry): Records ``mcs_llm_batch_size``.
+
+    Usage:
+        >>> batcher = MicroBatcher(provider, window=0.02)
+        >>> swarm = MedicalCoderSwarm(batcher=batcher)
+        >>> swarm.batched_run(tasks=cases)
+    """
+
+    def __init__(
+        self,
+        provider: BatchProvider,
+        window: float = 0.02,
+        max_batch: int = 16,
+        max_workers: int = 4,
+        metrics: MetricsRegistry = None,
+    ):
+        self.provider = provider
+        self.window = window
+        self.max_batch = max(int(max_batch), 1)
+        self.metrics = metrics or metrics_registry
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._condition = threading.Condition()
+        self._pending: Dict[
+            Tuple, List[Tuple[BatchRequest, Future]]
+        ] = {}
+        self._deadlines: Dict[Tuple, float] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def submit(self, request: BatchRequest) -> Future:
+        """Queue a request; the future resolves with its completion."""
+        future: Future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._flush_loop, daemon=True
+                )
+                self._thread.start()
+            batch = self._pending.setdefault(request.key, [])
+            if not batch:
+                self._deadlines[request.key] = (
+                    time.monotonic() + self.window
+                )
+            batch.append((request, future))
+            if len(batch) >= self.max_batch:
+                self._dispatch(request.key)
+            else:
+                self._condition.notify()
+        return future
+
+    def call(self, agent: Any, task: Any) -> str:
+        """Run ``task`` on ``agent``'s stage and model, batched."""
+        return self.submit(
+            BatchRequest.from_agent(agent, task)
+        ).result()
+
+    async def acall(self, agent: Any, task: Any) -> str:
+        """Async counterpart of ``call``."""
+        return await asyncio.wrap_future(
+            self.submit(BatchRequest.from_agent(agent, task))
+        )
+
+    def _flush_loop(self) -> None:
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                for key, deadline in list(self._deadlines.items()):
+                    if deadline <= now or self._closed:
+                        self._dispatch(key)
+                if self._closed:
+                    return
+                timeout = None
+                if self._deadlines:
+                    timeout = min(self._deadlines.values()) - now
+                self._condition.wait(timeout)
+
+    def _dispatch(self, key: Tuple) -> None:
+        """Send the pending batch for ``key``; the lock is held."""
+        batch = self._pending.pop(key)
+        del self._deadlines[key]
+        self.metrics.observe(
+            "mcs_llm_batch_size",
+            len(batch),
+            BATCH_SIZE_BUCKETS,
+            stage=key[0],
+        )
+        self._executor.submit(self._complete, batch)
+
+    def _complete(self, batch: List[Tuple[BatchRequest, Future]]):
+        try:
+            results = self.provider.complete([r for r, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"Provider returned {len(results)} results for "
+                    f"{len(batch)} requests"
+                )
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def close(self) -> None:
+        """Send every pending batch and wait for them to complete."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self._executor.shutdown(wait=True)
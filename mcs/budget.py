@@ -0,0 +1,165 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from mcs.pipeline import SkipStage
+
+# USD per million (prompt, completion) tokens, as published by the
+# providers; pass ``prices`` to RunBudget for others or newer rates.
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "groq/deepseek-r1-distill-llama-70b": (0.75, 0.99),
+    "groq/llama-3.3-70b-versatile": (0.59, 0.79),
+    "groq/llama-3.1-8b-instant": (0.05, 0.08),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+# Price of models missing from the table: the swarm's default model
+DEFAULT_PRICE: Tuple[float, float] = MODEL_PRICES[
+    "groq/deepseek-r1-distill-llama-70b"
+]
+
+
+@dataclass
+class RunBudget:
+    """
+    Limits on what one swarm run may spend.
+
+    The budget is checked between stages, from what the finished stages
+    actually used. Required stages always run; once usage reaches
+    ``downgrade_at`` of any limit, optional stages with a fallback model
+    run on it, and once a limit is reached optional stages are skipped.
+    A stage already running is not interrupted (see ``Stage.timeout``).
+
+    Args:
+        max_tokens (Optional[int]): Prompt plus completion tokens.
+        max_dollars (Optional[float]): Estimated cost in USD.
+        max_seconds (Optional[float]): Wall time of the run.
+        optional_stages (Tuple[str, ...]): Stages that may be skipped or
+            downgraded, in addition to every stage with
+            ``required=False``.
+        fallback_models (Dict[str, str]): Cheaper model per stage name.
+        downgrade_at (float): Fraction of a limit from which optional
+            stages move to their fallback model.
+        prices (Dict[str, Tuple[float, float]]): USD per million prompt
+            and completion tokens, by model name.
+
+    Usage:
+        >>> budget = RunBudget(
+        >>>     max_dollars=0.05,
+        >>>     fallback_models={"treatment_agent": "groq/llama-3.1-8b-instant"},
+        >>> )
+        >>> swarm = MedicalCoderSwarm(budget=budget)
+    """
+
+    max_tokens: Optional[int] = None
+    max_dollars: Optional[float] = None
+    max_seconds: Optional[float] = None
+    optional_stages: Tuple[str, ...] = (
+        "treatment_agent",
+        "summarizer_agent",
+    )
+    fallback_models: Dict[str, str] = field(default_factory=dict)
+    downgrade_at: float = 0.8
+    prices: Dict[str, Tuple[float, float]] = field(
+        default_factory=lambda: dict(MODEL_PRICES)
+    )
+
+    def is_optional(self, stage) -> bool:
+        return (
+            not stage.required or stage.name in self.optional_stages
+        )
+
+    def cost(
+        self,
+        model: Optional[str],
+        prompt_tokens: int,
+        completion_tokens: int,
+    ) -> float:
+        """Estimated USD cost of a call to ``model``."""
+        prompt, completion = self.prices.get(model, DEFAULT_PRICE)
+        return (
+            prompt_tokens * prompt + completion_tokens * completion
+        ) / 1_000_000
+
+
+class BudgetTracker:
+    """
+    Live accounting of one run against a ``RunBudget``: what the
+    finished stages used, and which stages were skipped or downgraded.
+    """
+
+    def __init__(self, budget: RunBudget):
+        self.budget = budget
+        self.started = time.perf_counter()
+        self.tokens = 0
+        self.dollars = 0.0
+        self.skipped: Dict[str, str] = {}
+        self.downgraded: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    def charge(self, model: Optional[str], stats) -> None:
+        """Add a stage's ``StageStats``, run on ``model``."""
+        cost = self.budget.cost(
+            model, stats.prompt_tokens, stats.completion_tokens
+        )
+        with self._lock:
+            self.tokens += (
+                stats.prompt_tokens + stats.completion_tokens
+            )
+            self.dollars += cost
+
+    def usage(self) -> Dict[str, float]:
+        """Fraction used of each configured limit."""
+        budget = self.budget
+        usage = {}
+        if budget.max_tokens is not None:
+            usage["tokens"] = self.tokens / max(budget.max_tokens, 1)
+        if budget.max_dollars is not None:
+            usage["dollars"] = self.dollars / max(
+                budget.max_dollars, 1e-12
+            )
+        if budget.max_seconds is not None:
+            usage["wall_time"] = self.seconds / max(
+                budget.max_seconds, 1e-12
+            )
+        return usage
+
+    def exhausted(self) -> Optional[str]:
+        """The first limit reached, None while within budget."""
+        for limit, used in self.usage().items():
+            if used >= 1:
+                return limit
+        return None
+
+    def plan(self, stage) -> Optional[str]:
+        """
+        Decide how ``stage`` runs: returns the fallback model to run it
+        on, or None to run it as configured. Raises ``SkipStage`` when
+        it must be left out.
+        """
+        if not self.budget.is_optional(stage):
+            return None
+        limit = self.exhausted()
+        if limit is not None:
+            reason = f"{limit} budget exhausted"
+            self.skip(stage, reason)
+            raise SkipStage(reason)
+        fallback = self.budget.fallback_models.get(stage.name)
+        usage = self.usage()
+        if fallback and max(usage.values(), default=0) >= (
+            self.budget.downgrade_at
+        ):
+            with self._lock:
+                self.downgraded[stage.name] = fallback
+            return fallback
+        return None
+
+    def skip(self, stage, reason: str) -> None:
+        with self._lock:
+            self.skipped[stage.name] = reason
@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from cryptography.fernet import InvalidToken
+
+from mcs.security import DecryptionError, IntegrityError
+
+# Header fields of the case prompt that change on every run without
+# changing what the agents are asked to do. The patient id stays: the
+# agents see it and may repeat it, so an output is only ever reused
+# for the same patient.
+_VOLATILE_FIELDS = re.compile(r"^\s*Timestamp:[^\n]*$", re.MULTILINE)
+_WHITESPACE = re.compile(r"\s+")
+
+_MISSING = object()
+
+
+def normalize_stage_input(text: Any) -> str:
+    """
+    Normalize a stage input so equivalent prompts hash identically.
+
+    Drops the per-run timestamp header line and collapses whitespace.
+    """
+    text = _VOLATILE_FIELDS.sub("", str(text))
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def stage_cache_key(text: Any, agent: Any) -> str:
+    """
+    Content-addressed key for one agent call.
+
+    Args:
+        text (Any): The stage input passed to the agent.
+        agent (Any): The agent; its prompt and sampling settings are
+            part of the key so a config change never hits stale entries.
+
+    Returns:
+        str: Hex SHA-256 digest.
+    """
+    material = json.dumps(
+        [
+            normalize_stage_input(text),
+            getattr(agent, "system_prompt", None),
+            getattr(agent, "model_name", None),
+            getattr(agent, "temperature", None),
+            getattr(agent, "dynamic_temperature_enabled", None),
+        ],
+        default=str,
+    )
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory least-recently-used cache."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache:
+    """
+    JSON file cache bounded by total size on disk.
+
+    Entries are written atomically, and encrypted when a
+    ``secure_handler`` (a SecureDataHandler) is given. When the
+    directory grows past ``max_bytes`` the least recently read or
+    written entries are deleted until it is back under ``low_water`` of
+    the limit.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 512 * 1024 * 1024,
+        low_water: float = 0.9,
+        secure_handler: Any = None,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.secure_handler = secure_handler
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._size = sum(size for _, _, size in self._entries())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def get(self, key: str, default: Any = None) -> Any:
+        path = self._path(key)
+        try:
+            with open(path) as file:
+                data = json.load(file)
+            if self.secure_handler is not None:
+                value = self.secure_handler.decrypt_data(
+                    data["encrypted"]
+                )
+            else:
+                value = data["value"]
+        except (
+            FileNotFoundError,
+            ValueError,
+            KeyError,
+            DecryptionError,
+            IntegrityError,
+            InvalidToken,
+        ):
+            # Unreadable entries, or entries written with another key
+            # or without encryption, are misses
+            return default
+        # Reads refresh the entry's position in the eviction order
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if self.secure_handler is not None:
+            data = {
+                "key": key,
+                "encrypted": self.secure_handler.encrypt_data(value),
+            }
+        else:
+            data = {"key": key, "value": value}
+        payload = json.dumps(data).encode()
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as file:
+            file.write(payload)
+
+        with self._lock:
+            try:
+                self._size -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, path)
+            self._size += len(payload)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        target = self.max_bytes * self.low_water
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        self._size = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+
+    @property
+    def size(self) -> int:
+        """Bytes currently used on disk."""
+        return self._size
+
+
+class StageCache:
+    """
+    Two-tier cache for agent stage outputs.
+
+    Lookups hit the in-memory LRU first and fall back to the optional
+    disk tier, promoting disk hits into memory.
+
+    Usage:
+        >>> cache = StageCache(
+        >>>     directory=".mcs_cache", secure_handler=handler
+        >>> )
+        >>> swarm = MedicalCoderSwarm(stage_cache=cache)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        directory: Optional[str] = None,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+        secure_handler: Any = None,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Capacity of the in-memory tier.
+            directory (Optional[str]): Directory for the disk tier.
+                The disk tier is disabled when None.
+            max_disk_bytes (int): Size limit of the disk tier.
+            secure_handler (Any): Optional SecureDataHandler that
+                encrypts the disk tier at rest. A MedicalCoderSwarm
+                given a cache without one sets its own.
+        """
+        self.memory = LRUCache(max_entries)
+        self.disk = (
+            DiskCache(
+                directory,
+                max_bytes=max_disk_bytes,
+                secure_handler=secure_handler,
+            )
+            if directory
+            else None
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key, _MISSING)
+        if value is _MISSING and self.disk is not None:
+            value = self.disk.get(key, _MISSING)
+            if value is not _MISSING:
+                self.memory.set(key, value)
+        if value is _MISSING:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
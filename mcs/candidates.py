@@ -0,0 +1,486 @@
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# ICD-10-CM code without the leading word boundary of
+# ``mcs.chunking.ICD10_CODE``: starting on a character class lets the
+# regex engine skip ahead quickly, and the boundary is checked by hand.
+_CODE_SCAN = re.compile(r"[A-Z][0-9][0-9AB](?:\.[0-9A-Z]{1,4})?\b")
+
+# Built-in condition lexicon: ICD-10-CM code -> (description, synonyms).
+# Synonyms are matched case-insensitively on word boundaries. Extend or
+# replace it with ``CandidateExtractor.from_json``.
+DEFAULT_LEXICON: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "N18.1": (
+        "Chronic kidney disease, stage 1",
+        ("ckd stage 1", "chronic kidney disease stage 1", "ckd 1"),
+    ),
+    "N18.2": (
+        "Chronic kidney disease, stage 2 (mild)",
+        ("ckd stage 2", "chronic kidney disease stage 2", "ckd 2"),
+    ),
+    "N18.30": (
+        "Chronic kidney disease, stage 3 unspecified",
+        (
+            "ckd stage 3",
+            "chronic kidney disease stage 3",
+            "ckd 3",
+            "stage 3 ckd",
+        ),
+    ),
+    "N18.31": (
+        "Chronic kidney disease, stage 3a",
+        ("ckd stage 3a", "ckd 3a", "stage 3a ckd"),
+    ),
+    "N18.32": (
+        "Chronic kidney disease, stage 3b",
+        ("ckd stage 3b", "ckd 3b", "stage 3b ckd"),
+    ),
+    "N18.4": (
+        "Chronic kidney disease, stage 4 (severe)",
+        ("ckd stage 4", "chronic kidney disease stage 4", "ckd 4"),
+    ),
+    "N18.5": (
+        "Chronic kidney disease, stage 5",
+        ("ckd stage 5", "chronic kidney disease stage 5", "ckd 5"),
+    ),
+    "N18.6": (
+        "End stage renal disease",
+        (
+            "end stage renal disease",
+            "esrd",
+            "end-stage renal disease",
+        ),
+    ),
+    "N18.9": (
+        "Chronic kidney disease, unspecified",
+        (
+            "chronic kidney disease",
+            "ckd",
+            "chronic renal insufficiency",
+        ),
+    ),
+    "N17.9": (
+        "Acute kidney failure, unspecified",
+        ("acute kidney injury", "aki", "acute renal failure", "arf"),
+    ),
+    "N04.9": (
+        "Nephrotic syndrome with unspecified morphologic changes",
+        ("nephrotic syndrome",),
+    ),
+    "R80.9": (
+        "Proteinuria, unspecified",
+        ("proteinuria", "albuminuria", "microalbuminuria"),
+    ),
+    "E11.9": (
+        "Type 2 diabetes mellitus without complications",
+        (
+            "type 2 diabetes",
+            "type ii diabetes",
+            "t2dm",
+            "dm2",
+            "dm type 2",
+            "diabetes mellitus type 2",
+            "niddm",
+        ),
+    ),
+    "E11.22": (
+        "Type 2 diabetes mellitus with diabetic chronic kidney disease",
+        ("diabetic nephropathy", "diabetic kidney disease", "dkd"),
+    ),
+    "E11.65": (
+        "Type 2 diabetes mellitus with hyperglycemia",
+        ("uncontrolled diabetes", "poorly controlled diabetes"),
+    ),
+    "E10.9": (
+        "Type 1 diabetes mellitus without complications",
+        (
+            "type 1 diabetes",
+            "type i diabetes",
+            "t1dm",
+            "dm1",
+            "iddm",
+        ),
+    ),
+    "E87.5": ("Hyperkalemia", ("hyperkalemia", "hyperkalaemia")),
+    "E87.6": ("Hypokalemia", ("hypokalemia", "hypokalaemia")),
+    "E87.1": (
+        "Hypo-osmolality and hyponatremia",
+        ("hyponatremia", "hyponatraemia"),
+    ),
+    "E87.2": ("Acidosis", ("metabolic acidosis", "acidosis")),
+    "E83.39": (
+        "Other disorders of phosphorus metabolism",
+        ("hyperphosphatemia",),
+    ),
+    "N25.81": (
+        "Secondary hyperparathyroidism of renal origin",
+        (
+            "secondary hyperparathyroidism",
+            "renal hyperparathyroidism",
+        ),
+    ),
+    "D63.1": (
+        "Anemia in chronic kidney disease",
+        ("anemia of ckd", "anemia in ckd", "renal anemia"),
+    ),
+    "D64.9": ("Anemia, unspecified", ("anemia", "anaemia")),
+    "I10": (
+        "Essential (primary) hypertension",
+        ("hypertension", "htn", "high blood pressure"),
+    ),
+    "I12.9": (
+        "Hypertensive chronic kidney disease with stage 1-4 CKD",
+        (
+            "hypertensive nephropathy",
+            "hypertensive kidney disease",
+            "hypertensive nephrosclerosis",
+        ),
+    ),
+    "I50.9": (
+        "Heart failure, unspecified",
+        ("heart failure", "chf", "congestive heart failure"),
+    ),
+    "I48.91": (
+        "Unspecified atrial fibrillation",
+        ("atrial fibrillation", "afib", "a-fib"),
+    ),
+    "I25.10": (
+        "Atherosclerotic heart disease of native coronary artery",
+        ("coronary artery disease", "cad", "ischemic heart disease"),
+    ),
+    "I21.9": (
+        "Acute myocardial infarction, unspecified",
+        ("myocardial infarction", "heart attack", "stemi", "nstemi"),
+    ),
+    "I63.9": (
+        "Cerebral infarction, unspecified",
+        ("stroke", "cerebral infarction", "cva"),
+    ),
+    "I73.9": (
+        "Peripheral vascular disease, unspecified",
+        (
+            "peripheral vascular disease",
+            "peripheral arterial disease",
+        ),
+    ),
+    "E78.5": (
+        "Hyperlipidemia, unspecified",
+        ("hyperlipidemia", "dyslipidemia", "high cholesterol"),
+    ),
+    "E66.9": ("Obesity, unspecified", ("obesity", "obese")),
+    "E03.9": ("Hypothyroidism, unspecified", ("hypothyroidism",)),
+    "E05.90": ("Thyrotoxicosis, unspecified", ("hyperthyroidism",)),
+    "E55.9": (
+        "Vitamin D deficiency, unspecified",
+        ("vitamin d deficiency",),
+    ),
+    "E86.0": ("Dehydration", ("dehydration", "volume depletion")),
+    "M10.9": ("Gout, unspecified", ("gout", "gouty arthritis")),
+    "E79.0": (
+        "Hyperuricemia without signs of inflammatory arthritis",
+        ("hyperuricemia",),
+    ),
+    "J44.9": (
+        "Chronic obstructive pulmonary disease, unspecified",
+        (
+            "copd",
+            "chronic obstructive pulmonary disease",
+            "emphysema",
+        ),
+    ),
+    "J45.909": (
+        "Unspecified asthma, uncomplicated",
+        ("asthma",),
+    ),
+    "J18.9": ("Pneumonia, unspecified organism", ("pneumonia",)),
+    "G47.33": (
+        "Obstructive sleep apnea",
+        ("obstructive sleep apnea", "osa", "sleep apnea"),
+    ),
+    "N39.0": (
+        "Urinary tract infection, site not specified",
+        ("urinary tract infection", "uti"),
+    ),
+    "N20.0": (
+        "Calculus of kidney",
+        ("kidney stone", "nephrolithiasis", "renal calculus"),
+    ),
+    "N40.0": (
+        "Benign prostatic hyperplasia without LUTS",
+        ("benign prostatic hyperplasia", "bph"),
+    ),
+    "Q61.3": (
+        "Polycystic kidney, unspecified",
+        ("polycystic kidney disease", "pkd", "adpkd"),
+    ),
+    "A41.9": (
+        "Sepsis, unspecified organism",
+        ("sepsis", "septicemia"),
+    ),
+    "K21.9": (
+        "Gastro-esophageal reflux disease without esophagitis",
+        ("gerd", "gastroesophageal reflux", "acid reflux"),
+    ),
+    "K74.60": (
+        "Unspecified cirrhosis of liver",
+        ("cirrhosis", "liver cirrhosis"),
+    ),
+    "K76.0": (
+        "Fatty (change of) liver, not elsewhere classified",
+        ("fatty liver", "nafld", "hepatic steatosis"),
+    ),
+    "B18.2": (
+        "Chronic viral hepatitis C",
+        ("hepatitis c", "hcv"),
+    ),
+    "B20": (
+        "Human immunodeficiency virus [HIV] disease",
+        ("hiv", "hiv disease"),
+    ),
+    "M32.9": (
+        "Systemic lupus erythematosus, unspecified",
+        ("systemic lupus erythematosus", "sle", "lupus"),
+    ),
+    "M06.9": (
+        "Rheumatoid arthritis, unspecified",
+        ("rheumatoid arthritis",),
+    ),
+    "M81.0": (
+        "Age-related osteoporosis without current pathological fracture",
+        ("osteoporosis",),
+    ),
+    "F32.A": ("Depression, unspecified", ("depression",)),
+    "F41.9": ("Anxiety disorder, unspecified", ("anxiety",)),
+    "F17.210": (
+        "Nicotine dependence, cigarettes, uncomplicated",
+        ("tobacco use", "nicotine dependence", "current smoker"),
+    ),
+    "F10.20": (
+        "Alcohol dependence, uncomplicated",
+        ("alcohol dependence", "alcohol use disorder"),
+    ),
+    "R60.0": ("Localized edema", ("edema", "pedal edema", "oedema")),
+    "R53.83": ("Other fatigue", ("fatigue",)),
+    "R31.9": ("Hematuria, unspecified", ("hematuria",)),
+    "Z99.2": (
+        "Dependence on renal dialysis",
+        ("hemodialysis", "peritoneal dialysis", "on dialysis"),
+    ),
+    "Z94.0": (
+        "Kidney transplant status",
+        ("kidney transplant", "renal transplant"),
+    ),
+}
+
+
+@dataclass
+class ICD10Candidate:
+    """
+    A likely ICD-10 code found in the case text before any agent runs.
+
+    Attributes:
+        code (str): ICD-10-CM code.
+        description (str): Lexicon description; empty for explicit codes
+            the lexicon does not know.
+        source (str): ``explicit`` when the code itself appears in the
+            text, ``lexicon`` when only a synonym matched.
+        count (int): Number of matches in the text.
+        terms (List[str]): Distinct matched terms, in order of appearance.
+        first_offset (int): Character offset of the first match.
+    """
+
+    code: str
+    description: str = ""
+    source: str = "lexicon"
+    count: int = 0
+    terms: List[str] = field(default_factory=list)
+    first_offset: int = 0
+
+
+def trie_pattern(terms: Iterable[str]) -> str:
+    """
+    Regex alternation for ``terms`` factored into a prefix trie.
+
+    A trie-shaped pattern lets the regex engine reject a position after
+    one or two characters instead of trying every term, which is what
+    keeps a several-hundred-term lexicon scan at plain-regex speed.
+    """
+    trie: Dict[str, dict] = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        end = "" in node
+        branches = [
+            re.escape(char) + build(child)
+            for char, child in sorted(node.items())
+            if char
+        ]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not end:
+            return branches[0]
+        pattern = "(?:" + "|".join(branches) + ")"
+        return pattern + "?" if end else pattern
+
+    return build(trie)
+
+
+class CandidateExtractor:
+    """
+    Deterministic ICD-10 candidate finder.
+
+    Runs one compiled trie regex over the lower-cased text for lexicon
+    synonyms and the ICD-10 code regex for codes already written in the
+    record. No model calls, no network.
+
+    Usage:
+        >>> extractor = CandidateExtractor()
+        >>> candidates = extractor.extract("Pt with CKD stage 3, T2DM")
+        >>> print(format_candidates(candidates))
+    """
+
+    def __init__(
+        self,
+        lexicon: Optional[
+            Dict[str, Tuple[str, Iterable[str]]]
+        ] = None,
+    ):
+        """
+        Initialize the extractor.
+
+        Args:
+            lexicon (Optional[Dict]): Code -> (description, synonyms).
+                Defaults to ``DEFAULT_LEXICON``.
+        """
+        self.lexicon = DEFAULT_LEXICON if lexicon is None else lexicon
+        self.descriptions: Dict[str, str] = {}
+        self._term_codes: Dict[str, str] = {}
+        for code, (description, synonyms) in self.lexicon.items():
+            self.descriptions[code] = description
+            for synonym in synonyms:
+                term = " ".join(synonym.lower().split())
+                # The first, usually more specific, code wins a
+                # synonym listed twice
+                self._term_codes.setdefault(term, code)
+
+        # Optional trie groups are greedy, so the longest term wins at
+        # each position: "ckd stage 3a" beats "ckd"
+        # Terms are anchored on the preceding non-alphanumeric character
+        # rather than ``\b`` so the scan only enters the trie at word
+        # starts; the text is prefixed with a space to match at offset 0
+        self._pattern = re.compile(
+            r"[^a-z0-9](" + trie_pattern(self._term_codes) + r")\b"
+        )
+
+    @classmethod
+    def from_json(cls, path: str) -> "CandidateExtractor":
+        """
+        Load a lexicon from a JSON file shaped like
+        ``{"N18.30": {"description": "...", "synonyms": ["ckd 3"]}}``.
+        """
+        with open(path) as file:
+            data = json.load(file)
+        return cls(
+            {
+                code: (
+                    entry.get("description", ""),
+                    tuple(entry.get("synonyms", ())),
+                )
+                for code, entry in data.items()
+            }
+        )
+
+    def extract(self, text: str) -> List[ICD10Candidate]:
+        """
+        Find candidate codes in ``text``.
+
+        Returns:
+            List[ICD10Candidate]: Explicit codes first, then lexicon
+            matches, each group ordered by match count and first
+            appearance.
+        """
+        if not text:
+            return []
+        found: Dict[str, ICD10Candidate] = {}
+
+        def add(code: str, term: str, offset: int, source: str):
+            candidate = found.get(code)
+            if candidate is None:
+                candidate = found[code] = ICD10Candidate(
+                    code=code,
+                    description=self.descriptions.get(code, ""),
+                    source=source,
+                    first_offset=offset,
+                )
+            elif source == "explicit":
+                candidate.source = source
+            candidate.count += 1
+            if term not in candidate.terms:
+                candidate.terms.append(term)
+
+        for match in _CODE_SCAN.finditer(text):
+            start = match.start()
+            if start and (
+                text[start - 1].isalnum() or text[start - 1] == "_"
+            ):
+                continue
+            code = match.group(0)
+            add(code, code, start, "explicit")
+
+        term_codes = self._term_codes
+        for match in self._pattern.finditer(" " + text.lower()):
+            term = match.group(1)
+            add(term_codes[term], term, match.start(1) - 1, "lexicon")
+
+        return sorted(
+            found.values(),
+            key=lambda c: (
+                c.source != "explicit",
+                -c.count,
+                c.first_offset,
+            ),
+        )
+
+
+def format_candidates(
+    candidates: List[ICD10Candidate], limit: int = 25
+) -> str:
+    """
+    Render candidates as a compact shortlist for the coder prompt.
+    Returns an empty string when there are none.
+    """
+    if not candidates:
+        return ""
+    lines = [
+        "Candidate ICD-10 codes found in the record (deterministic "
+        "pre-extraction; verify against the documentation):"
+    ]
+    for candidate in candidates[:limit]:
+        terms = ", ".join(candidate.terms[:3])
+        description = (
+            f" {candidate.description}"
+            if candidate.description
+            else ""
+        )
+        lines.append(
+            f"- {candidate.code}{description} [{candidate.source}:"
+            f" {terms}; x{candidate.count}]"
+        )
+    return "\n".join(lines) + "\n"
+
+
+_default_extractor: Optional[CandidateExtractor] = None
+
+
+def extract_candidates(text: str) -> List[ICD10Candidate]:
+    """Extract candidates with a shared extractor over the default lexicon."""
+    global _default_extractor
+    if _default_extractor is None:
+        _default_extractor = CandidateExtractor()
+    return _default_extractor.extract(text)
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class StageCheckpoint:
+    """Output of one completed stage, as stored for resuming."""
+
+    agent_name: Optional[str]
+    output: Optional[str]
+    stats: Dict[str, float] = field(default_factory=dict)
+    completed_at: str = field(
+        default_factory=lambda: datetime.now().isoformat()
+    )
+
+
+def case_fingerprint(
+    patient_id: Optional[str], documentation: Optional[str]
+) -> str:
+    """Hash of the patient and documentation a run was started for."""
+    material = json.dumps([patient_id, documentation or ""])
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+@dataclass
+class RunCheckpoint:
+    """
+    The completed stages of one swarm run, keyed by stage name.
+
+    ``case_hash`` is the ``case_fingerprint`` of the run's patient and
+    documentation; a run is only resumed for the same case.
+    """
+
+    run_id: str
+    task: Optional[str] = None
+    patient_id: Optional[str] = None
+    case_hash: Optional[str] = None
+    stages: Dict[str, StageCheckpoint] = field(default_factory=dict)
+    updated_at: Optional[str] = None
+
+
+class CheckpointStore:
+    """
+    Directory of per-run JSON checkpoint files.
+
+    Every stage output is written as soon as the stage completes, so a
+    run that fails part way can be resumed with
+    ``swarm.run(resume=run_id)`` without paying for the stages that
+    already succeeded. A run's checkpoint is deleted once it completes.
+
+    Usage:
+        >>> store = CheckpointStore(".mcs_checkpoints")
+        >>> swarm = MedicalCoderSwarm(checkpoint_store=store)
+    """
+
+    def __init__(
+        self,
+        directory: str = ".mcs_checkpoints",
+        secure_handler: Any = None,
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            directory (str): Where checkpoint files are kept.
+            secure_handler (Any): Optional SecureDataHandler; when given,
+                checkpoints are encrypted at rest.
+        """
+        self.directory = directory
+        self.secure_handler = secure_handler
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, run_id: str) -> str:
+        name = hashlib.sha256(str(run_id).encode()).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def load(self, run_id: str) -> Optional[RunCheckpoint]:
+        """Load a run's checkpoint, None if it has none."""
+        try:
+            with open(self._path(run_id)) as file:
+                data: Dict[str, Any] = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+        if self.secure_handler is not None:
+            data = self.secure_handler.decrypt_data(data["encrypted"])
+        return RunCheckpoint(
+            run_id=data["run_id"],
+            task=data.get("task"),
+            patient_id=data.get("patient_id"),
+            case_hash=data.get("case_hash"),
+            stages={
+                name: StageCheckpoint(**stage)
+                for name, stage in data["stages"].items()
+            },
+            updated_at=data.get("updated_at"),
+        )
+
+    def save_stage(
+        self,
+        checkpoint: RunCheckpoint,
+        name: str,
+        stage: StageCheckpoint,
+    ) -> None:
+        """Add a completed stage to ``checkpoint`` and write it."""
+        # Parallel stages save the same run; writing under the lock
+        # keeps an older snapshot from replacing a newer one.
+        with self._lock:
+            checkpoint.stages[name] = stage
+            checkpoint.updated_at = datetime.now().isoformat()
+            data: Dict[str, Any] = asdict(checkpoint)
+            if self.secure_handler is not None:
+                data = {
+                    "encrypted": self.secure_handler.encrypt_data(
+                        data
+                    )
+                }
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(fd, "w") as file:
+                json.dump(data, file)
+            os.replace(tmp_path, self._path(checkpoint.run_id))
+
+    def delete(self, run_id: str) -> None:
+        with self._lock:
+            try:
+                os.remove(self._path(run_id))
+            except FileNotFoundError:
+                pass
+
+    def prune(self, older_than: timedelta) -> int:
+        """
+        Delete checkpoints not written to for ``older_than``, i.e. runs
+        nobody resumed. Returns how many were deleted.
+        """
+        cutoff = (datetime.now() - older_than).timestamp()
+        removed = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"):
+                continue
+            if entry.stat().st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+        return removed
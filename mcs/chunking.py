@@ -0,0 +1,281 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Explicit page markers such as "Page 12", "--- Page 12 ---" or
+# "Page 12 of 300" at the start of a line.
+_PAGE_MARKER = re.compile(
+    r"^[ \t\-=#*\[]*page\s+(\d+)(?:\s+of\s+\d+)?[ \t\-=#*\]]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# ICD-10-CM code: letter, two characters, optional dotted extension.
+# Chapter U holds emergency-use codes such as U07.1 (COVID-19).
+ICD10_CODE = re.compile(
+    r"\b([A-Z][0-9][0-9AB](?:\.[0-9A-Z]{1,4})?)\b"
+)
+
+# Reasoning models wrap their chain of thought in <think> tags; codes
+# considered and rejected there are not part of the answer.
+THINK_BLOCK = re.compile(
+    r"<think>.*?</think>", re.DOTALL | re.IGNORECASE
+)
+
+# Page references in agent output: "page 12", "pages 3-5", "p. 7"
+_PAGE_REFERENCE = re.compile(
+    r"\b(?:pages?|pg\.?|p\.)\s*(\d+)(?:\s*(?:-|–|to)\s*(\d+))?",
+    re.IGNORECASE,
+)
+_EMPTY_PARENS = re.compile(r"[(\[]\s*[)\]]")
+
+
+@dataclass
+class Page:
+    """
+    A single page of patient documentation.
+
+    ``document`` counts the documents of a concatenated record: it goes
+    up each time the page markers restart, so the second document's
+    "Page 1" is not mistaken for the first one's.
+    """
+
+    number: int
+    text: str
+    document: int = 0
+
+
+@dataclass
+class DocumentChunk:
+    """A run of consecutive pages sent to the coder as one call."""
+
+    index: int
+    first_page: int
+    last_page: int
+    text: str
+    page_numbers: List[int] = field(default_factory=list)
+    page_keys: List[Tuple[int, int]] = field(default_factory=list)
+
+    @property
+    def page_range(self) -> str:
+        if self.first_page == self.last_page:
+            return f"page {self.first_page}"
+        return f"pages {self.first_page}-{self.last_page}"
+
+
+@dataclass
+class ICD10Finding:
+    """An ICD-10 code found by the coder and the pages supporting it."""
+
+    code: str
+    description: str = ""
+    pages: List[int] = field(default_factory=list)
+
+
+def split_pages(
+    text: str, fallback_page_chars: int = 3000
+) -> List[Page]:
+    """
+    Split documentation into pages.
+
+    Form feeds (as produced by PDF text extraction) take precedence,
+    then explicit "Page N" marker lines; a marker that does not go past
+    the previous page number starts a new document. Text without either
+    is cut into pseudo-pages of ``fallback_page_chars`` on line
+    boundaries.
+    """
+    if not text:
+        return []
+
+    if "\f" in text:
+        return [
+            Page(number, page)
+            for number, page in enumerate(text.split("\f"), start=1)
+            if page.strip()
+        ]
+
+    markers = list(_PAGE_MARKER.finditer(text))
+    if markers:
+        pages = []
+        preamble = text[: markers[0].start()]
+        if preamble.strip():
+            pages.append(Page(0, preamble))
+        document, previous = 0, -1
+        for current, following in zip(markers, markers[1:] + [None]):
+            end = following.start() if following else len(text)
+            number = int(current.group(1))
+            if number <= previous:
+                document += 1
+            previous = number
+            pages.append(
+                Page(number, text[current.end() : end], document)
+            )
+        return pages
+
+    pages = []
+    start = 0
+    while start < len(text):
+        end = min(start + fallback_page_chars, len(text))
+        if end < len(text):
+            newline = text.rfind("\n", start, end)
+            if newline > start:
+                end = newline + 1
+        pages.append(Page(len(pages) + 1, text[start:end]))
+        start = end
+    return pages
+
+
+def chunk_pages(
+    pages: Iterable[Page], max_chars: int = 12000
+) -> List[DocumentChunk]:
+    """
+    Pack consecutive pages into chunks of at most ``max_chars``.
+
+    Every page is prefixed with a ``[Page N]`` marker so the coder can
+    cite it. A page longer than ``max_chars`` gets chunks of its own.
+    """
+    chunks: List[DocumentChunk] = []
+    parts: List[str] = []
+    page_numbers: List[int] = []
+    page_keys: List[Tuple[int, int]] = []
+    first_page: Optional[int] = None
+    last_page = 0
+    size = 0
+
+    def flush():
+        nonlocal parts, page_numbers, page_keys, first_page, size
+        if parts:
+            chunks.append(
+                DocumentChunk(
+                    index=len(chunks),
+                    first_page=first_page,
+                    last_page=last_page,
+                    text="".join(parts),
+                    page_numbers=page_numbers,
+                    page_keys=page_keys,
+                )
+            )
+        parts, page_numbers, page_keys = [], [], []
+        first_page, size = None, 0
+
+    for page in pages:
+        body = page.text.strip()
+        pieces = [
+            body[offset : offset + max_chars]
+            for offset in range(0, max(len(body), 1), max_chars)
+        ]
+        for piece in pieces:
+            text = f"[Page {page.number}]\n{piece}\n\n"
+            if parts and size + len(text) > max_chars:
+                flush()
+            if first_page is None:
+                first_page = page.number
+            parts.append(text)
+            if page.number not in page_numbers:
+                page_numbers.append(page.number)
+            if (page.document, page.number) not in page_keys:
+                page_keys.append((page.document, page.number))
+            last_page = page.number
+            size += len(text)
+    flush()
+    return chunks
+
+
+def extract_icd10_findings(
+    output: str, chunk: Optional[DocumentChunk] = None
+) -> List[ICD10Finding]:
+    """
+    Pull ICD-10 codes and their cited pages out of a coder's output.
+
+    Page references on the same line as a code, or in the lines that
+    follow it up to the next code, are attributed to it. Codes without
+    a page reference are attributed to the chunk's page range. The
+    model's ``<think>`` reasoning is ignored.
+    """
+    findings: List[ICD10Finding] = []
+    current: Optional[ICD10Finding] = None
+
+    text = THINK_BLOCK.sub("", str(output or ""))
+    for line in text.splitlines():
+        codes = ICD10_CODE.findall(line)
+        if codes:
+            description = ICD10_CODE.split(line)[-1]
+            description = _PAGE_REFERENCE.sub("", description)
+            description = _EMPTY_PARENS.sub("", description)
+            description = description.strip(" *:-–|()[]\t,;")
+            for code in codes:
+                current = ICD10Finding(
+                    code=code, description=description
+                )
+                findings.append(current)
+        if current is None:
+            continue
+        if not codes and not current.description:
+            label, _, value = line.partition(":")
+            if "description" in label.lower():
+                current.description = value.strip(" *")
+        for match in _PAGE_REFERENCE.finditer(line):
+            first = int(match.group(1))
+            last = int(match.group(2) or first)
+            if last - first > 50:
+                last = first
+            current.pages.extend(range(first, last + 1))
+
+    if chunk is not None:
+        for finding in findings:
+            if not finding.pages:
+                finding.pages = list(
+                    range(chunk.first_page, chunk.last_page + 1)
+                )
+    return findings
+
+
+def merge_findings(
+    findings: Iterable[ICD10Finding],
+) -> List[ICD10Finding]:
+    """
+    Deduplicate findings by code, keeping the first non-empty
+    description and the union of supporting pages.
+    """
+    merged: Dict[str, ICD10Finding] = {}
+    for finding in findings:
+        existing = merged.get(finding.code)
+        if existing is None:
+            merged[finding.code] = ICD10Finding(
+                code=finding.code,
+                description=finding.description,
+                pages=sorted(set(finding.pages)),
+            )
+            continue
+        if not existing.description:
+            existing.description = finding.description
+        existing.pages = sorted(
+            set(existing.pages) | set(finding.pages)
+        )
+    return list(merged.values())
+
+
+def _format_pages(pages: List[int]) -> str:
+    ranges: List[Tuple[int, int]] = []
+    for page in pages:
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], page)
+        else:
+            ranges.append((page, page))
+    return ", ".join(
+        str(start) if start == end else f"{start}-{end}"
+        for start, end in ranges
+    )
+
+
+def format_findings(findings: List[ICD10Finding]) -> str:
+    """Render merged findings as the markdown handed to the synthesizer."""
+    lines = [
+        "Merged ICD-10 findings across all documentation chunks:"
+    ]
+    for finding in findings:
+        pages = _format_pages(finding.pages) or "n/a"
+        lines.append(
+            f"- **{finding.code}**: {finding.description or 'n/a'}"
+            f" (pages: {pages})"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,152 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+
+from mcs.candidates import extract_candidates
+from mcs.chunking import THINK_BLOCK
+from mcs.icd10_index import find_codes
+
+# "**Confidence**: 0.9", "Confidence level: 85%", "confidence = high"
+_CONFIDENCE = re.compile(
+    r"confidence(?:\s+(?:level|score))?\W{0,6}?[:=]\W*"
+    r"(?:(\d+(?:\.\d+)?)\s*(%)?|(very high|high|moderate|medium|low))",
+    re.IGNORECASE,
+)
+
+CONFIDENCE_WORDS = {
+    "very high": 0.95,
+    "high": 0.85,
+    "moderate": 0.6,
+    "medium": 0.6,
+    "low": 0.3,
+}
+
+
+def parse_confidence(output: Any) -> Optional[float]:
+    """
+    The confidence an agent reported for its answer, from 0 to 1: the
+    last ``Confidence: ...`` given as a fraction, a percentage or a
+    word. None when the output states none.
+    """
+    text = THINK_BLOCK.sub("", str(output or ""))
+    matches = list(_CONFIDENCE.finditer(text))
+    if not matches:
+        return None
+    number, percent, word = matches[-1].groups()
+    if word is not None:
+        return CONFIDENCE_WORDS[word.lower()]
+    value = float(number)
+    if percent or value > 1:
+        value /= 100
+    return min(value, 1.0)
+
+
+def _category(code: str) -> str:
+    return code.split(".")[0].upper()
+
+
+@dataclass
+class ConfidenceCheck:
+    """
+    Outcome of the local check of the coder's output.
+
+    Attributes:
+        confident (bool): Whether every criterion passed.
+        codes (List[str]): Codes the coder emitted.
+        valid (Optional[float]): Fraction of them in the ICD-10 index;
+            None without an index.
+        agreement (float): Overlap of the coder's code categories with
+            the deterministic candidates', as a Jaccard index.
+        self_reported (Optional[float]): Confidence the coder stated.
+        reasons (List[str]): Criteria that failed, empty when confident.
+    """
+
+    confident: bool
+    codes: List[str] = field(default_factory=list)
+    valid: Optional[float] = None
+    agreement: float = 0.0
+    self_reported: Optional[float] = None
+    reasons: List[str] = field(default_factory=list)
+
+
+@dataclass
+class EarlyExitPolicy:
+    """
+    When the coder's output is trusted without the stages that review
+    it.
+
+    After ``source`` runs, its output is checked locally: its codes
+    must be in the ICD-10 index (when one is configured), agree with
+    the candidates extracted from the case, and come with a
+    self-reported confidence. When all criteria pass, the ``stages``
+    are bypassed and their dependents read the coder's output
+    directly.
+
+    Args:
+        min_confidence (float): Lowest self-reported confidence.
+        min_valid (float): Lowest fraction of codes in the index.
+        min_agreement (float): Lowest Jaccard index between the coder's
+            and the candidates' code categories.
+        source (str): Stage whose output is checked.
+        stages (Tuple[str, ...]): Stages bypassed when it passes.
+
+    Usage:
+        >>> swarm = MedicalCoderSwarm(early_exit=EarlyExitPolicy())
+        >>> swarm.run("45-year-old male, eGFR 59, CKD stage 3")
+    """
+
+    min_confidence: float = 0.8
+    min_valid: float = 1.0
+    min_agreement: float = 0.5
+    source: str = "medical_coder"
+    stages: Tuple[str, ...] = ("synthesizer",)
+
+    def check(
+        self, output: Any, case_text: str, index: Any = None
+    ) -> ConfidenceCheck:
+        """Check ``output`` of the source stage against the case."""
+        codes = find_codes(THINK_BLOCK.sub("", str(output or "")))
+        reasons = []
+        if not codes:
+            reasons.append("no codes")
+
+        valid = None
+        if index is not None and codes:
+            valid = sum(
+                index.lookup(code) is not None for code in codes
+            ) / len(codes)
+            if valid < self.min_valid:
+                reasons.append(
+                    f"valid {valid:.2f} < {self.min_valid:g}"
+                )
+
+        coded = {_category(code) for code in codes}
+        expected = {
+            _category(candidate.code)
+            for candidate in extract_candidates(case_text)
+        }
+        union = coded | expected
+        agreement = (
+            len(coded & expected) / len(union) if union else 0.0
+        )
+        if agreement < self.min_agreement:
+            reasons.append(
+                f"agreement {agreement:.2f} < {self.min_agreement:g}"
+            )
+
+        self_reported = parse_confidence(output)
+        if self_reported is None:
+            reasons.append("no confidence reported")
+        elif self_reported < self.min_confidence:
+            reasons.append(
+                f"confidence {self_reported:.2f} < {self.min_confidence:g}"
+            )
+
+        return ConfidenceCheck(
+            confident=not reasons,
+            codes=codes,
+            valid=valid,
+            agreement=agreement,
+            self_reported=self_reported,
+            reasons=reasons,
+        )
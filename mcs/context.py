@@ -0,0 +1,146 @@
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# Rough characters-per-token ratio of BPE tokenizers on English clinical
+# text. Close enough for budgeting and needs no tokenizer or network.
+CHARS_PER_TOKEN = 4.0
+
+# Default input budgets per pipeline stage, in estimated tokens. None
+# disables packing for a stage.
+DEFAULT_STAGE_BUDGETS: Dict[str, Optional[int]] = {
+    "medical_coder": 24000,
+    "synthesizer": 12000,
+    "treatment_agent": 8000,
+    "summarizer_agent": 4000,
+}
+
+
+def estimate_tokens(
+    text: str, chars_per_token: float = CHARS_PER_TOKEN
+) -> int:
+    """Estimate the token count of ``text`` from its length."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / chars_per_token)
+
+
+@dataclass
+class ContextSection:
+    """
+    One section of a prompt.
+
+    Attributes:
+        name (str): Identifier reported when the section is trimmed.
+        text (str): Section content, emitted verbatim when it fits.
+        priority (int): Higher priority sections get budget first.
+        required (bool): Required sections are never trimmed or dropped.
+    """
+
+    name: str
+    text: str
+    priority: int = 0
+    required: bool = False
+
+
+@dataclass
+class PackedContext:
+    """Result of packing sections against a budget."""
+
+    text: str
+    tokens: int
+    trimmed: List[str] = field(default_factory=list)
+    dropped: List[str] = field(default_factory=list)
+
+
+def trim_text(text: str, max_chars: int, marker: str) -> str:
+    """
+    Shorten text to ``max_chars`` by eliding its middle, keeping the
+    beginning and the most recent end of a record.
+    """
+    if len(text) <= max_chars:
+        return text
+    keep = max(max_chars - len(marker), 0)
+    head = keep // 2
+    tail = keep - head
+    return text[:head] + marker + (text[-tail:] if tail else "")
+
+
+class ContextPacker:
+    """
+    Fits prompt sections into a token budget.
+
+    Required sections are always kept. The remaining budget goes to the
+    other sections in priority order; a section that no longer fits is
+    trimmed to what is left, or dropped when too little is left to be
+    useful. Sections are emitted in their original order.
+
+    Usage:
+        >>> packer = ContextPacker(budget_tokens=8000)
+        >>> packed = packer.pack([ContextSection("task", task, required=True)])
+        >>> packed.text
+    """
+
+    def __init__(
+        self,
+        budget_tokens: Optional[int],
+        min_section_tokens: int = 64,
+        chars_per_token: float = CHARS_PER_TOKEN,
+    ):
+        self.budget_tokens = budget_tokens
+        self.min_section_tokens = min_section_tokens
+        self.chars_per_token = chars_per_token
+
+    def pack(self, sections: List[ContextSection]) -> PackedContext:
+        texts = [section.text or "" for section in sections]
+        sizes = [
+            estimate_tokens(text, self.chars_per_token)
+            for text in texts
+        ]
+        total = sum(sizes)
+        if self.budget_tokens is None or total <= self.budget_tokens:
+            return PackedContext(text="".join(texts), tokens=total)
+
+        remaining = self.budget_tokens - sum(
+            size
+            for section, size in zip(sections, sizes)
+            if section.required
+        )
+        trimmed, dropped = [], []
+
+        order = sorted(
+            (
+                index
+                for index, section in enumerate(sections)
+                if not section.required
+            ),
+            key=lambda index: -sections[index].priority,
+        )
+        for index in order:
+            section = sections[index]
+            if sizes[index] <= remaining:
+                remaining -= sizes[index]
+                continue
+            if remaining < self.min_section_tokens:
+                texts[index] = ""
+                dropped.append(section.name)
+                continue
+            marker = (
+                f"\n[... {section.name} trimmed to fit the context"
+                " budget ...]\n"
+            )
+            texts[index] = trim_text(
+                texts[index],
+                int(remaining * self.chars_per_token),
+                marker,
+            )
+            remaining = 0
+            trimmed.append(section.name)
+
+        text = "".join(texts)
+        return PackedContext(
+            text=text,
+            tokens=estimate_tokens(text, self.chars_per_token),
+            trimmed=trimmed,
+            dropped=dropped,
+        )
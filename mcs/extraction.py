@@ -0,0 +1,242 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from mcs.chunking import ICD10_CODE, THINK_BLOCK
+
+# "**Supporting Documentation**: ..." and similar labelled lines
+_LABEL = re.compile(
+    r"^[\s\-*#>\d.)]*\**([A-Za-z][A-Za-z /-]{1,40}?)\**\s*:\s*\**\s*(.*)$"
+)
+
+_PAGE_REFERENCE = re.compile(
+    r"\(?\b(?:pages?|pg\.?|p\.)\s*:?\s*\d+(?:\s*(?:-|–|,|to)\s*\d+)*\)?",
+    re.IGNORECASE,
+)
+_RANK = re.compile(r"\d+")
+
+# "E11.9 Type 2 diabetes - evidence: HbA1c 8.2%" on a single line
+_INLINE_EVIDENCE = re.compile(
+    r"\s*[-–;(]?\s*\b(?:supporting documentation|evidence|rationale"
+    r"|justification)\s*:\s*",
+    re.IGNORECASE,
+)
+
+CATEGORIES = ("primary", "secondary", "complication", "symptom")
+
+_CATEGORY_WORDS = {
+    "primary": "primary",
+    "principal": "primary",
+    "secondary": "secondary",
+    "comorbid": "secondary",
+    "complication": "complication",
+    "symptom": "symptom",
+}
+_CATEGORY = re.compile(
+    r"\b(" + "|".join(_CATEGORY_WORDS) + r")", re.IGNORECASE
+)
+
+_DESCRIPTION_LABELS = ("description", "diagnosis")
+_EVIDENCE_LABELS = (
+    "supporting",
+    "relevant documentation",
+    "documentation",
+    "evidence",
+    "rationale",
+    "justification",
+    "source",
+)
+_RANK_LABELS = ("order of clinical significance", "rank", "priority")
+_CODE_LABELS = ("icd-10 code", "icd10 code", "icd code", "code")
+
+_STRIP = " *:-–|()[]\t,;"
+
+
+class MCSCode(BaseModel):
+    """
+    An ICD-10 code extracted from the agents' output.
+
+    Attributes:
+        code (str): ICD-10 code as written by the agent.
+        description (str): Description given next to the code.
+        category (str): ``primary``, ``secondary``, ``complication``,
+            ``symptom`` or ``other``, from the section the code was in.
+        evidence (List[str]): Supporting documentation cited for it.
+        rank (int): 1-based order of clinical significance.
+        agents (List[str]): Agents that emitted the code.
+    """
+
+    code: str
+    description: str = ""
+    category: str = "other"
+    evidence: List[str] = Field(default_factory=list)
+    rank: int = 0
+    agents: List[str] = Field(default_factory=list)
+
+
+def _label(line: str) -> Tuple[str, str]:
+    match = _LABEL.match(line)
+    if match is None:
+        return "", ""
+    return match.group(1).strip().lower(), match.group(2)
+
+
+def _is_heading(line: str, label: str, value: str) -> bool:
+    stripped = line.strip()
+    if label and value.strip(_STRIP):
+        return False
+    return len(stripped) <= 80 and (
+        stripped.startswith("#")
+        or "**" in stripped
+        or stripped.endswith(":")
+    )
+
+
+def _clean(text: str) -> str:
+    return _PAGE_REFERENCE.sub("", text).strip(_STRIP)
+
+
+def parse_codes(output: str, agent_name: str = "") -> List[MCSCode]:
+    """
+    Parse one agent's markdown output into code records.
+
+    Codes inherit the category of the section heading they appear
+    under. Labelled lines that follow a code (``Description``,
+    ``Supporting Documentation``, ``Order of Clinical Significance``,
+    ...) fill in its fields until the next code or heading. Page
+    references are kept as evidence.
+
+    Returns:
+        List[MCSCode]: One record per code occurrence, in order, with
+        ``rank`` set only where the agent stated one.
+    """
+    records: List[MCSCode] = []
+    current: List[MCSCode] = []
+    category = "other"
+
+    text = THINK_BLOCK.sub("", str(output or ""))
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        label, value = _label(line)
+        codes = ICD10_CODE.findall(line)
+
+        if not codes:
+            heading = _CATEGORY.search(line)
+            if heading and _is_heading(line, label, value):
+                category = _CATEGORY_WORDS[heading.group(1).lower()]
+                current = []
+                continue
+            if not current:
+                continue
+            if label.startswith(_DESCRIPTION_LABELS):
+                for record in current:
+                    record.description = record.description or _clean(
+                        value
+                    )
+            elif label.startswith(_RANK_LABELS):
+                rank = _RANK.search(value)
+                for record in current:
+                    record.rank = int(rank.group(0)) if rank else 0
+            elif label.startswith(_EVIDENCE_LABELS) and value.strip():
+                for record in current:
+                    record.evidence.append(value.strip(" *\t"))
+                continue
+            for reference in _PAGE_REFERENCE.findall(line):
+                for record in current:
+                    record.evidence.append(reference.strip("()"))
+            continue
+
+        description = ICD10_CODE.split(line)[-1]
+        if label in _CODE_LABELS:
+            # "**ICD-10 Code**: E11.9" - the description follows on its
+            # own line
+            description = ""
+        parts = _INLINE_EVIDENCE.split(description, maxsplit=1)
+        evidence = [
+            part.strip(" *\t)") for part in parts[1:] if part.strip()
+        ]
+        current = [
+            MCSCode(
+                code=code,
+                description=_clean(parts[0]),
+                category=category,
+                evidence=list(evidence),
+                agents=[agent_name] if agent_name else [],
+            )
+            for code in codes
+        ]
+        for reference in _PAGE_REFERENCE.findall(line):
+            for record in current:
+                record.evidence.append(reference.strip("()"))
+        records.extend(current)
+    return records
+
+
+def merge_codes(
+    outputs: Iterable[Tuple[str, str]],
+) -> List[MCSCode]:
+    """
+    Extract and merge the codes of several agents' outputs.
+
+    Args:
+        outputs: ``(agent_name, output)`` pairs, most authoritative
+            first.
+
+    Returns:
+        List[MCSCode]: One record per code. The first description and
+        non-``other`` category win; evidence and agents are combined.
+        Records are ranked by category, then the agents' stated rank,
+        then order of appearance.
+    """
+    merged: Dict[str, MCSCode] = {}
+    stated: Dict[str, int] = {}
+    for agent_name, output in outputs:
+        for record in parse_codes(output, agent_name):
+            existing = merged.get(record.code)
+            if record.rank:
+                stated.setdefault(record.code, record.rank)
+            if existing is None:
+                merged[record.code] = record
+                continue
+            existing.description = (
+                existing.description or record.description
+            )
+            if existing.category == "other":
+                existing.category = record.category
+            for item in record.evidence:
+                if item not in existing.evidence:
+                    existing.evidence.append(item)
+            for agent in record.agents:
+                if agent not in existing.agents:
+                    existing.agents.append(agent)
+
+    order = {code: position for position, code in enumerate(merged)}
+
+    def sort_key(record: MCSCode):
+        category = (
+            CATEGORIES.index(record.category)
+            if record.category in CATEGORIES
+            else len(CATEGORIES)
+        )
+        return (
+            category,
+            stated.get(record.code, float("inf")),
+            order[record.code],
+        )
+
+    ranked = sorted(merged.values(), key=sort_key)
+    for rank, record in enumerate(ranked, start=1):
+        record.rank = rank
+    return ranked
+
+
+def codes_by_category(
+    codes: Optional[List[MCSCode]],
+) -> Dict[str, List[MCSCode]]:
+    """Group extracted codes by category, keeping their rank order."""
+    grouped: Dict[str, List[MCSCode]] = {}
+    for record in codes or []:
+        grouped.setdefault(record.category, []).append(record)
+    return grouped
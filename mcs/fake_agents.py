@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from mcs.context import CHARS_PER_TOKEN
+
+# A fixed value, or a function drawing one from the agent's generator
+Distribution = Union[float, Callable[[random.Random], float]]
+
+# Codes cited in fake outputs, so extraction and validation have work
+FAKE_CODES: Tuple[str, ...] = (
+    "N18.30",
+    "E11.22",
+    "E11.65",
+    "I12.9",
+    "R53.83",
+    "R60.0",
+)
+
+_FILLER = (
+    "Clinical findings reviewed against the documentation and labs. "
+)
+
+
+def constant(value: float) -> Callable[[random.Random], float]:
+    return lambda rng: value
+
+
+def uniform(
+    low: float, high: float
+) -> Callable[[random.Random], float]:
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(
+    median: float, sigma: float = 0.5
+) -> Callable[[random.Random], float]:
+    """Right-skewed latencies with the given median, like LLM calls."""
+    mu = math.log(median)
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+
+def _sample(distribution: Distribution, rng: random.Random) -> float:
+    if callable(distribution):
+        return distribution(rng)
+    return distribution
+
+
+class FakeAgentError(RuntimeError):
+    """A provider failure injected by a fake agent."""
+
+
+@dataclass(frozen=True)
+class FakeProfile:
+    """
+    How a fake agent behaves.
+
+    Attributes:
+        latency (Distribution): Seconds each call takes.
+        output_tokens (Distribution): Approximate tokens per output.
+        failure_rate (float): Probability that a call raises
+            ``FakeAgentError`` (after its latency).
+        codes (Tuple[str, ...]): ICD-10 codes the outputs cite.
+    """
+
+    latency: Distribution = 0.0
+    output_tokens: Distribution = 200
+    failure_rate: float = 0.0
+    codes: Tuple[str, ...] = FAKE_CODES
+
+
+class FakeAgent:
+    """
+    Offline, deterministic stand-in for a swarms ``Agent``.
+
+    Every call draws its latency, failure and output from a generator
+    seeded with the seed, the agent name, the call's index on this agent
+    and the task, so a given sequence of calls always behaves the same.
+    """
+
+    def __init__(
+        self,
+        agent_name: str,
+        profile: FakeProfile = FakeProfile(),
+        seed: int = 0,
+        model_name: str = "fake",
+    ):
+        self.agent_name = agent_name
+        self.profile = profile
+        self.seed = seed
+        self.model_name = model_name
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _draw(self, task: Any) -> Tuple[float, bool, str]:
+        with self._lock:
+            index = self.calls
+            self.calls += 1
+        digest = hashlib.sha256(
+            f"{self.seed}|{self.agent_name}|{index}|{task}".encode()
+        ).digest()
+        rng = random.Random(digest)
+        profile = self.profile
+        latency = max(_sample(profile.latency, rng), 0.0)
+        failed = rng.random() < profile.failure_rate
+        tokens = max(int(_sample(profile.output_tokens, rng)), 0)
+        return latency, failed, self._output(rng, tokens)
+
+    def _output(self, rng: random.Random, tokens: int) -> str:
+        codes = rng.sample(
+            self.profile.codes, k=min(2, len(self.profile.codes))
+        )
+        text = f"{self.agent_name} ({self.model_name}): " + "; ".join(
+            f"ICD-10 {code}" for code in codes
+        )
+        # Pad to the drawn size, less the newline before the padding
+        missing = int(tokens * CHARS_PER_TOKEN) - len(text) - 1
+        if missing > 0:
+            filler = _FILLER * (missing // len(_FILLER) + 1)
+            text += "\n" + filler[:missing]
+        return text
+
+    def _fail(self) -> None:
+        raise FakeAgentError(
+            f"{self.agent_name}: injected provider error"
+        )
+
+    def run(self, task: str) -> str:
+        latency, failed, output = self._draw(task)
+        if latency:
+            time.sleep(latency)
+        if failed:
+            self._fail()
+        return output
+
+    async def arun(self, task: str) -> str:
+        latency, failed, output = self._draw(task)
+        if latency:
+            await asyncio.sleep(latency)
+        if failed:
+            self._fail()
+        return output
+
+
+class FakeAgentFactory:
+    """
+    Agent factory building ``FakeAgent``s, for ``AgentPool``.
+
+    Args:
+        profile (FakeProfile): Behaviour of every role.
+        profiles (Optional[Dict[str, FakeProfile]]): Per-role overrides.
+        seed (int): Seed of every agent built.
+
+    Usage:
+        >>> factory = FakeAgentFactory(FakeProfile(latency=lognormal(2.0)))
+        >>> swarm = MedicalCoderSwarm(agent_pool=AgentPool(agent_factory=factory))
+    """
+
+    def __init__(
+        self,
+        profile: FakeProfile = FakeProfile(),
+        profiles: Optional[Dict[str, FakeProfile]] = None,
+        seed: int = 0,
+    ):
+        self.profile = profile
+        self.profiles = profiles or {}
+        self.seed = seed
+
+    def __call__(
+        self, role: str, model_name: str = "fake", **overrides: Any
+    ) -> FakeAgent:
+        return FakeAgent(
+            role,
+            self.profiles.get(role, self.profile),
+            seed=self.seed,
+            model_name=model_name,
+        )
+
+    @classmethod
+    def from_env(cls) -> "FakeAgentFactory":
+        """
+        Factory configured by ``MCS_FAKE_LATENCY`` (median seconds,
+        log-normal), ``MCS_FAKE_OUTPUT_TOKENS``,
+        ``MCS_FAKE_FAILURE_RATE`` and ``MCS_FAKE_SEED``.
+        """
+        latency = float(os.getenv("MCS_FAKE_LATENCY", "0"))
+        return cls(
+            FakeProfile(
+                latency=lognormal(latency) if latency > 0 else 0.0,
+                output_tokens=int(
+                    os.getenv("MCS_FAKE_OUTPUT_TOKENS", "200")
+                ),
+                failure_rate=float(
+                    os.getenv("MCS_FAKE_FAILURE_RATE", "0")
+                ),
+            ),
+            seed=int(os.getenv("MCS_FAKE_SEED", "0")),
+        )
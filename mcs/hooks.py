@@ -0,0 +1,421 @@
+import asyncio
+import inspect
+import itertools
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+HOOK_EVENTS = (
+    "on_run_start",
+    "on_stage_start",
+    "on_stage_end",
+    "on_error",
+    "on_run_end",
+)
+
+
+@dataclass
+class RunInfo:
+    """
+    One swarm run, as seen by hooks.
+
+    Attributes:
+        swarm (Any): The MedicalCoderSwarm (or batch fork) running.
+        task (Optional[str]): The task it was given.
+        run_id (str): Unique id of the run.
+        started (float): ``time.perf_counter()`` at the start.
+        data (Dict[str, Any]): Scratch space for hooks to keep per-run
+            state in, since one hook instance serves concurrent runs.
+        errors (List[BaseException]): Errors already reported to
+            ``on_error``.
+        finished (bool): Set once the stages have settled. A stage that
+            timed out may still be running; nothing it does afterwards
+            is checkpointed or reported to hooks, metrics or the budget.
+    """
+
+    swarm: Any
+    task: Optional[str] = None
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    started: float = field(default_factory=time.perf_counter)
+    data: Dict[str, Any] = field(default_factory=dict)
+    errors: List[BaseException] = field(default_factory=list)
+    finished: bool = False
+    lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def finish(self) -> None:
+        """Mark the run finished, after any checkpoint write under way."""
+        with self.lock:
+            self.finished = True
+
+
+class MCSHook:
+    """
+    Base class for pipeline hooks. Override the events you need; each
+    may be a plain method or a coroutine.
+
+    Hooks are called on the thread or task doing the work: in threaded
+    runs ``on_stage_start`` and ``on_stage_end`` run on the stage's
+    worker thread, in async runs on the event loop. A hook that raises
+    is reported and does not affect the run.
+    """
+
+    def on_run_start(self, run: RunInfo) -> None:
+        """Called before the first stage."""
+
+    def on_stage_start(self, run: RunInfo, stage) -> None:
+        """Called when a stage starts, with its ``Stage``."""
+
+    def on_stage_end(self, run: RunInfo, stage, result) -> None:
+        """Called when a stage succeeds, with its ``StageResult``."""
+
+    def on_error(
+        self, run: RunInfo, error: BaseException, stage=None
+    ) -> None:
+        """
+        Called once per error: with the stage for stage failures and
+        timeouts, with None for errors outside a stage.
+        """
+
+    def on_run_end(self, run: RunInfo, output: Optional[str]) -> None:
+        """
+        Called when the run finishes, with the output JSON, or None if
+        it failed (after ``on_error``).
+        """
+
+
+class HookSet:
+    """
+    The hooks registered on a swarm, dispatched per event.
+
+    Only methods a hook actually overrides are called, and events
+    nobody listens to return immediately, so an empty set costs one
+    dict lookup per event.
+    """
+
+    def __init__(self, hooks: Iterable[Any] = ()):
+        self.hooks: List[Any] = []
+        self._listeners: Dict[str, List[Any]] = {}
+        for hook in hooks:
+            self.add(hook)
+
+    def add(self, hook: Any) -> None:
+        self.hooks.append(hook)
+        for event in HOOK_EVENTS:
+            method = getattr(hook, event, None)
+            default = getattr(MCSHook, event)
+            if (
+                method is None
+                or getattr(method, "__func__", None) is default
+            ):
+                continue
+            self._listeners.setdefault(event, []).append(method)
+
+    def __bool__(self) -> bool:
+        return bool(self.hooks)
+
+    def __len__(self) -> int:
+        return len(self.hooks)
+
+    def fire(self, event: str, *args: Any) -> None:
+        """
+        Call the listeners of ``event`` from synchronous code.
+        Coroutine hooks are run to completion, or scheduled on the
+        running loop when called from one.
+        """
+        listeners = self._listeners.get(event)
+        if not listeners:
+            return
+        for method in listeners:
+            try:
+                result = method(*args)
+                if inspect.isawaitable(result):
+                    _run_awaitable(result)
+            except Exception as e:
+                _report(method, event, e)
+
+    async def afire(self, event: str, *args: Any) -> None:
+        """Call the listeners of ``event``, awaiting coroutine hooks."""
+        listeners = self._listeners.get(event)
+        if not listeners:
+            return
+        for method in listeners:
+            try:
+                result = method(*args)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                _report(method, event, e)
+
+
+# Tasks of coroutine hooks fired from sync code on a running loop
+_background = set()
+
+
+def _run_awaitable(awaitable) -> None:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.run(_await(awaitable))
+        return
+    task = loop.create_task(_await(awaitable))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def _await(awaitable):
+    return await awaitable
+
+
+def _report(method: Any, event: str, error: Exception) -> None:
+    owner = getattr(method, "__self__", method)
+    print(f"Hook {type(owner).__name__}.{event} failed: {error}")
+
+
+class ProfilerHook(MCSHook):
+    """
+    Profile whole swarm runs with cProfile or pyinstrument.
+
+    The run's own thread is profiled from ``on_run_start`` to
+    ``on_run_end``, which covers async runs, where every stage runs on
+    the event loop. In threaded runs each stage's worker thread is
+    profiled too and the profiles are merged.
+
+    Args:
+        profiler (str): ``cprofile`` or ``pyinstrument`` (optional
+            dependency).
+        output_dir (Optional[str]): Where to write one profile per run,
+            ``<run_id>.prof`` (pstats) or ``<run_id>.html``.
+        every (int): Profile one run in ``every``, to bound the
+            overhead in production.
+
+    Usage:
+        >>> hook = ProfilerHook("cprofile", output_dir="profiles", every=100)
+        >>> swarm = MedicalCoderSwarm(hooks=[hook])
+    """
+
+    def __init__(
+        self,
+        profiler: str = "cprofile",
+        output_dir: Optional[str] = None,
+        every: int = 1,
+    ):
+        if profiler not in ("cprofile", "pyinstrument"):
+            raise ValueError(f"Unknown profiler: {profiler}")
+        if profiler == "pyinstrument":
+            # Imported here so the dependency stays optional
+            import pyinstrument  # noqa: F401
+        self.profiler = profiler
+        self.output_dir = output_dir
+        self.every = max(int(every), 1)
+        self.last_profile: Any = None
+        self.last_path: Optional[str] = None
+        self._counter = itertools.count()
+        self._key = f"profiler-{id(self)}"
+
+    def _start(self):
+        if self.profiler == "cprofile":
+            import cProfile
+
+            profile = cProfile.Profile()
+            profile.enable()
+            return profile
+        from pyinstrument import Profiler
+
+        profile = Profiler(async_mode="disabled")
+        profile.start()
+        return profile
+
+    def _stop(self, profile):
+        if self.profiler == "cprofile":
+            profile.disable()
+        else:
+            profile.stop()
+        return profile
+
+    def on_run_start(self, run: RunInfo) -> None:
+        if next(self._counter) % self.every:
+            return
+        try:
+            profile = self._start()
+        except ValueError as e:
+            # Another profiler is already active on this thread
+            print(f"Profiling run {run.run_id} skipped: {e}")
+            return
+        run.data[self._key] = {
+            "thread": threading.get_ident(),
+            "run": profile,
+            "stages": {},
+            "done": [],
+            "lock": threading.Lock(),
+        }
+
+    def on_stage_start(self, run: RunInfo, stage) -> None:
+        state = run.data.get(self._key)
+        if state is None or state["thread"] == threading.get_ident():
+            return
+        try:
+            profile = self._start()
+        except ValueError:
+            return
+        with state["lock"]:
+            state["stages"][threading.get_ident()] = profile
+
+    def on_stage_end(self, run: RunInfo, stage, result) -> None:
+        self._stop_stage(run)
+
+    def on_error(
+        self, run: RunInfo, error: BaseException, stage=None
+    ) -> None:
+        if stage is not None:
+            self._stop_stage(run)
+
+    def _stop_stage(self, run: RunInfo) -> None:
+        state = run.data.get(self._key)
+        if state is None:
+            return
+        with state["lock"]:
+            profile = state["stages"].pop(threading.get_ident(), None)
+        if profile is not None:
+            profile = self._stop(profile)
+            with state["lock"]:
+                state["done"].append(profile)
+
+    def on_run_end(self, run: RunInfo, output: Optional[str]) -> None:
+        state = run.data.pop(self._key, None)
+        if state is None:
+            return
+        profiles = [self._stop(state["run"])] + state["done"]
+        self.last_profile = self._merge(profiles)
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            self.last_path = self._write(run)
+
+    def _merge(self, profiles):
+        if self.profiler == "cprofile":
+            import pstats
+
+            return pstats.Stats(*profiles)
+        from pyinstrument.session import Session
+
+        sessions = [
+            p.last_session for p in profiles if p.last_session
+        ]
+        merged = sessions[0]
+        for session in sessions[1:]:
+            merged = Session.combine(merged, session)
+        return merged
+
+    def _write(self, run: RunInfo) -> str:
+        if self.profiler == "cprofile":
+            path = os.path.join(self.output_dir, f"{run.run_id}.prof")
+            self.last_profile.dump_stats(path)
+            return path
+        from pyinstrument.renderers import HTMLRenderer
+
+        path = os.path.join(self.output_dir, f"{run.run_id}.html")
+        with open(path, "w") as file:
+            file.write(HTMLRenderer().render(self.last_profile))
+        return path
+
+
+class OpenTelemetryHook(MCSHook):
+    """
+    Emit an OpenTelemetry span per run with a child span per stage.
+
+    Stage spans carry the stage's wall time, queue time, token counts
+    and retries; errors are recorded on the span they happened in.
+
+    Args:
+        tracer: An OpenTelemetry tracer, e.g. the one the API app sets
+            up. Defaults to ``trace.get_tracer("mcs")`` on the global
+            provider.
+    """
+
+    def __init__(self, tracer: Any = None):
+        # Imported here so the dependency stays optional
+        from opentelemetry import trace
+
+        self._trace = trace
+        self.tracer = tracer or trace.get_tracer("mcs")
+        self._key = f"otel-{id(self)}"
+
+    def on_run_start(self, run: RunInfo) -> None:
+        swarm = run.swarm
+        span = self.tracer.start_span(
+            "mcs.run",
+            attributes={
+                "mcs.run_id": run.run_id,
+                "mcs.patient_id": str(
+                    getattr(swarm, "patient_id", "") or ""
+                ),
+            },
+        )
+        run.data[self._key] = {"run": span, "stages": {}}
+
+    def on_stage_start(self, run: RunInfo, stage) -> None:
+        state = run.data.get(self._key)
+        if state is None:
+            return
+        span = self.tracer.start_span(
+            f"mcs.stage.{stage.name}",
+            context=self._trace.set_span_in_context(state["run"]),
+            attributes={
+                "mcs.stage": stage.name,
+                "mcs.agent_role": stage.agent_role,
+            },
+        )
+        state["stages"][stage.name] = span
+
+    def on_stage_end(self, run: RunInfo, stage, result) -> None:
+        state = run.data.get(self._key)
+        span = state and state["stages"].pop(stage.name, None)
+        if span is None:
+            return
+        stats = result.stats
+        span.set_attributes(
+            {
+                "mcs.wall_time": stats.wall_time,
+                "mcs.queue_time": stats.queue_time,
+                "mcs.prompt_tokens": stats.prompt_tokens,
+                "mcs.completion_tokens": stats.completion_tokens,
+                "mcs.retries": stats.retries,
+            }
+        )
+        span.end()
+
+    def on_error(
+        self, run: RunInfo, error: BaseException, stage=None
+    ) -> None:
+        state = run.data.get(self._key)
+        if state is None:
+            return
+        span = state["run"]
+        if stage is not None:
+            span = state["stages"].pop(stage.name, None) or span
+        span.record_exception(error)
+        self._set_error(span, str(error))
+        if span is not state["run"]:
+            span.end()
+
+    def on_run_end(self, run: RunInfo, output: Optional[str]) -> None:
+        state = run.data.pop(self._key, None)
+        if state is None:
+            return
+        if output is None:
+            self._set_error(state["run"], "run failed")
+        state["run"].end()
+
+    def _set_error(self, span: Any, description: str) -> None:
+        if not span.is_recording() or not span.status.is_ok:
+            # Keep the first, most specific error
+            return
+        span.set_status(
+            self._trace.Status(
+                self._trace.StatusCode.ERROR, description
+            )
+        )
@@ -0,0 +1,281 @@
+"""
+Read-only ICD-10-CM code index.
+
+The index is built offline from the CMS order file
+(``icd10cm_order_<year>.txt``) into a compact binary file:
+
+    header   "<8sIII"   magic, version, entry count, strings offset
+    records  "<7sBiIH"  code, flags, parent record, description
+                        offset, description length (one per code,
+                        sorted by code)
+    strings  UTF-8 descriptions
+
+At runtime the file is memory-mapped, so opening it costs one ``mmap``
+call and every process on the host (for example each uvicorn worker)
+shares the same pages through the OS page cache. Lookups binary-search
+the record table in place.
+
+Build:
+    python -m mcs.icd10_index build icd10cm_order_2025.txt icd10cm.idx
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from mcs.chunking import ICD10_CODE
+
+MAGIC = b"MCSICD10"
+VERSION = 1
+
+_HEADER = struct.Struct("<8sIII")
+_RECORD = struct.Struct("<7sBiIH")
+_CODE_WIDTH = 7
+_BILLABLE = 0x01
+
+# Environment variable naming the index used when a swarm is not given
+# one explicitly.
+INDEX_PATH_ENV = "MCS_ICD10_INDEX"
+
+
+@dataclass
+class ICD10Entry:
+    """One ICD-10-CM code."""
+
+    code: str
+    description: str
+    billable: bool
+    parent: Optional[str] = None
+
+
+def normalize_code(code: str) -> str:
+    """Upper-case a code and drop its dot: ``n18.30`` -> ``N1830``."""
+    return str(code).strip().upper().replace(".", "")
+
+
+def format_code(code: str) -> str:
+    """Dotted form of a code: ``N1830`` -> ``N18.30``."""
+    code = normalize_code(code)
+    return code if len(code) <= 3 else f"{code[:3]}.{code[3:]}"
+
+
+def parse_order_file(path: str) -> Iterator[ICD10Entry]:
+    """
+    Read entries from a CMS ICD-10-CM order file.
+
+    Each line holds a 5 digit order number, the undotted code, a 0/1
+    billable flag, a short description and a long description in fixed
+    columns; the long description is used.
+    """
+    with open(path, encoding="utf-8", errors="replace") as file:
+        for line in file:
+            if len(line) < 16:
+                continue
+            code = line[6:13].strip()
+            billable = line[14] == "1"
+            description = line[77:].strip() or line[16:76].strip()
+            if code:
+                yield ICD10Entry(
+                    code=format_code(code),
+                    description=description,
+                    billable=billable,
+                )
+
+
+def build_index(entries: Iterable[ICD10Entry], path: str) -> int:
+    """
+    Write ``entries`` to a binary index file at ``path``.
+
+    Parents are resolved to the longest shorter code present in the
+    input (``N18.30`` -> ``N18.3`` -> ``N18``). The file is written to a
+    temporary path and renamed, so readers never see a partial index.
+
+    Returns:
+        int: Number of codes written.
+    """
+    by_code: Dict[str, ICD10Entry] = {}
+    for entry in entries:
+        by_code[normalize_code(entry.code)] = entry
+    codes = sorted(by_code)
+    position = {code: index for index, code in enumerate(codes)}
+
+    records = bytearray()
+    strings = bytearray()
+    for code in codes:
+        entry = by_code[code]
+        parent = -1
+        for length in range(len(code) - 1, 2, -1):
+            if code[:length] in position:
+                parent = position[code[:length]]
+                break
+        description = entry.description.encode("utf-8")[:0xFFFF]
+        records += _RECORD.pack(
+            code.encode("ascii"),
+            _BILLABLE if entry.billable else 0,
+            parent,
+            len(strings),
+            len(description),
+        )
+        strings += description
+
+    strings_offset = _HEADER.size + len(records)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(
+            _HEADER.pack(MAGIC, VERSION, len(codes), strings_offset)
+        )
+        file.write(records)
+        file.write(strings)
+    os.replace(tmp_path, path)
+    return len(codes)
+
+
+class ICD10Index:
+    """
+    Memory-mapped ICD-10-CM lookup table.
+
+    Usage:
+        >>> index = ICD10Index("icd10cm.idx")
+        >>> index.lookup("N18.30")
+        ICD10Entry(code='N18.30', description='Chronic kidney disease, stage 3 unspecified', billable=True, parent='N18.3')
+    """
+
+    def __init__(self, path: str):
+        """
+        Map the index file at ``path``.
+
+        Raises:
+            ValueError: If the file is not an index of this version.
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(
+                file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        magic, version, self._count, self._strings = (
+            _HEADER.unpack_from(self._map, 0)
+        )
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(
+                f"{path} is not a version {VERSION} ICD-10 index"
+            )
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, code: str) -> bool:
+        return self._find(normalize_code(code)) >= 0
+
+    def _record_offset(self, position: int) -> int:
+        return _HEADER.size + position * _RECORD.size
+
+    def _find(self, code: str) -> int:
+        """Binary search for ``code``; the record position or -1."""
+        if not code or len(code) > _CODE_WIDTH:
+            return -1
+        key = code.encode("ascii", "replace").ljust(
+            _CODE_WIDTH, b"\0"
+        )
+        mapped = self._map
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            offset = self._record_offset(middle)
+            probe = mapped[offset : offset + _CODE_WIDTH]
+            if probe < key:
+                low = middle + 1
+            elif probe > key:
+                high = middle
+            else:
+                return middle
+        return -1
+
+    def _entry(self, position: int) -> ICD10Entry:
+        code, flags, parent, start, length = _RECORD.unpack_from(
+            self._map, self._record_offset(position)
+        )
+        start += self._strings
+        parent_code = None
+        if parent >= 0:
+            parent_code = _RECORD.unpack_from(
+                self._map, self._record_offset(parent)
+            )[0]
+        return ICD10Entry(
+            code=format_code(code.rstrip(b"\0").decode("ascii")),
+            description=self._map[start : start + length].decode(
+                "utf-8"
+            ),
+            billable=bool(flags & _BILLABLE),
+            parent=(
+                format_code(parent_code.rstrip(b"\0").decode("ascii"))
+                if parent_code
+                else None
+            ),
+        )
+
+    def lookup(self, code: str) -> Optional[ICD10Entry]:
+        """Return the entry for ``code`` (dotted or not), or None."""
+        position = self._find(normalize_code(code))
+        return self._entry(position) if position >= 0 else None
+
+    def close(self) -> None:
+        self._map.close()
+
+
+_open_indexes: Dict[str, ICD10Index] = {}
+_open_lock = threading.Lock()
+
+
+def open_index(path: Optional[str] = None) -> Optional[ICD10Index]:
+    """
+    Open the index at ``path``, or at ``$MCS_ICD10_INDEX`` when no path
+    is given. Indexes are opened once per process and shared. Returns
+    None when no index is configured.
+    """
+    path = path or os.environ.get(INDEX_PATH_ENV)
+    if not path:
+        return None
+    with _open_lock:
+        index = _open_indexes.get(path)
+        if index is None:
+            index = _open_indexes[path] = ICD10Index(path)
+        return index
+
+
+def find_codes(text: str) -> List[str]:
+    """Distinct ICD-10 codes mentioned in ``text``, in order."""
+    return list(dict.fromkeys(ICD10_CODE.findall(str(text or ""))))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m mcs.icd10_index",
+        description="Build or query an ICD-10-CM index.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build an index file")
+    build.add_argument("order_file", help="CMS icd10cm_order file")
+    build.add_argument("output", help="index file to write")
+    query = commands.add_parser("lookup", help="look codes up")
+    query.add_argument("index")
+    query.add_argument("codes", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_index(
+            parse_order_file(args.order_file), args.output
+        )
+        print(f"Wrote {count} codes to {args.output}")
+    else:
+        index = ICD10Index(args.index)
+        for code in args.codes:
+            print(index.lookup(code) or f"{code}: not found")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+import csv
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from mcs.labs import TEST_NAMES, LabResults
+
+INF = float("inf")
+
+
+@dataclass
+class LabRule:
+    """
+    A lab range indicative of a diagnosis: ``low <= value < high``.
+
+    Attributes:
+        test (str): Canonical lab test name (see ``mcs.labs.LAB_TESTS``).
+        low (float): Inclusive lower bound, in the test's canonical unit.
+        high (float): Exclusive upper bound.
+        code (str): ICD-10 code the range points to.
+        description (str): Diagnosis description.
+        sex (Optional[str]): ``male`` or ``female`` for sex-specific
+            thresholds, None for both.
+        defining (bool): Whether the range defines the code, as eGFR
+            defines the CKD stage. Only then does a measured value
+            outside it contradict the code; a treated diabetic's
+            normal HbA1c says nothing against E11.9.
+    """
+
+    test: str
+    low: float
+    high: float
+    code: str
+    description: str
+    sex: Optional[str] = None
+    defining: bool = False
+
+
+# Lab ranges with a direct diagnostic reading, in canonical units.
+# Combination codes (E11.22, D63.1) and CKD stages 1-2, which need
+# evidence of kidney damage besides the value, have no rules.
+DEFAULT_LAB_RULES: List[LabRule] = [
+    LabRule(
+        "egfr",
+        45,
+        60,
+        "N18.31",
+        "Chronic kidney disease, stage 3a",
+        defining=True,
+    ),
+    LabRule(
+        "egfr",
+        30,
+        45,
+        "N18.32",
+        "Chronic kidney disease, stage 3b",
+        defining=True,
+    ),
+    LabRule(
+        "egfr",
+        15,
+        30,
+        "N18.4",
+        "Chronic kidney disease, stage 4",
+        defining=True,
+    ),
+    LabRule(
+        "egfr",
+        0,
+        15,
+        "N18.5",
+        "Chronic kidney disease, stage 5",
+        defining=True,
+    ),
+    LabRule(
+        "egfr",
+        30,
+        60,
+        "N18.30",
+        "Chronic kidney disease, stage 3",
+        defining=True,
+    ),
+    LabRule("uacr", 30, INF, "R80.9", "Proteinuria, unspecified"),
+    LabRule("hba1c", 6.5, INF, "E11.9", "Type 2 diabetes mellitus"),
+    LabRule(
+        "hba1c",
+        9.0,
+        INF,
+        "E11.65",
+        "Type 2 diabetes with hyperglycemia",
+    ),
+    LabRule("hba1c", 5.7, 6.5, "R73.03", "Prediabetes"),
+    LabRule("glucose", 126, INF, "E11.9", "Type 2 diabetes mellitus"),
+    LabRule(
+        "glucose", 100, 126, "R73.01", "Impaired fasting glucose"
+    ),
+    LabRule("glucose", 0, 70, "E16.2", "Hypoglycemia, unspecified"),
+    LabRule("potassium", 5.1, INF, "E87.5", "Hyperkalemia"),
+    LabRule("potassium", 0, 3.5, "E87.6", "Hypokalemia"),
+    LabRule("sodium", 0, 135, "E87.1", "Hyponatremia"),
+    LabRule("sodium", 145.01, INF, "E87.0", "Hypernatremia"),
+    LabRule("bicarbonate", 0, 22, "E87.2", "Acidosis"),
+    LabRule("calcium", 10.51, INF, "E83.52", "Hypercalcemia"),
+    LabRule("calcium", 0, 8.5, "E83.51", "Hypocalcemia"),
+    LabRule("phosphorus", 4.51, INF, "E83.39", "Hyperphosphatemia"),
+    LabRule(
+        "pth",
+        65.01,
+        INF,
+        "N25.81",
+        "Secondary hyperparathyroidism of renal origin",
+    ),
+    LabRule("hemoglobin", 0, 13.5, "D64.9", "Anemia", sex="male"),
+    LabRule("hemoglobin", 0, 12.0, "D64.9", "Anemia", sex="female"),
+    LabRule("albumin", 0, 3.5, "E88.09", "Hypoalbuminemia"),
+    LabRule("ldl", 130, INF, "E78.00", "Pure hypercholesterolemia"),
+    LabRule("tsh", 4.01, INF, "E03.9", "Hypothyroidism"),
+    LabRule("tsh", 0, 0.4, "E05.90", "Thyrotoxicosis"),
+    LabRule("uric_acid", 7.01, INF, "E79.0", "Hyperuricemia"),
+    LabRule(
+        "creatinine",
+        1.36,
+        INF,
+        "R94.4",
+        "Abnormal results of kidney function studies",
+    ),
+    LabRule(
+        "bun", 23.01, INF, "R79.89", "Elevated blood urea nitrogen"
+    ),
+]
+
+
+@dataclass
+class LabDiagnosis:
+    """
+    A diagnosis supported or contradicted by the patient's labs.
+
+    Attributes:
+        code (str): ICD-10 code.
+        description (str): Diagnosis description.
+        supporting (bool): True when a lab value falls in one of the
+            code's ranges, False when the labs defining the code were
+            measured and none did.
+        evidence (List[str]): Lab values behind the verdict, as
+            ``test=value``.
+    """
+
+    code: str
+    description: str
+    supporting: bool
+    evidence: List[str] = field(default_factory=list)
+
+
+class LabDiagnosisIndex:
+    """
+    Interval index from lab values to the diagnoses they indicate.
+
+    The rules for each test are flattened offline into sorted elementary
+    intervals, each holding the rules that cover it. A query is then one
+    ``np.searchsorted`` per measured test plus a slice, independent of
+    the number of rules.
+
+    Usage:
+        >>> index = LabDiagnosisIndex()
+        >>> labs = evaluate_labs(extract_labs(documentation))
+        >>> supporting, contradicting = index.query(labs)
+    """
+
+    def __init__(self, rules: Optional[Sequence[LabRule]] = None):
+        self.rules: List[LabRule] = list(
+            DEFAULT_LAB_RULES if rules is None else rules
+        )
+        self._codes: Dict[str, List[int]] = {}
+        for number, rule in enumerate(self.rules):
+            self._codes.setdefault(rule.code, []).append(number)
+
+        # Per test: interval breakpoints, and a CSR layout of the rule
+        # numbers covering each elementary interval
+        self._breakpoints: Dict[int, np.ndarray] = {}
+        self._offsets: Dict[int, np.ndarray] = {}
+        self._members: Dict[int, np.ndarray] = {}
+        by_test: Dict[str, List[int]] = {}
+        for number, rule in enumerate(self.rules):
+            by_test.setdefault(rule.test, []).append(number)
+        for test, numbers in by_test.items():
+            self._build(TEST_NAMES.index(test), numbers)
+
+    def _build(self, test: int, numbers: List[int]) -> None:
+        bounds = sorted(
+            {
+                bound
+                for number in numbers
+                for bound in (
+                    self.rules[number].low,
+                    self.rules[number].high,
+                )
+                if np.isfinite(bound)
+            }
+        )
+        breakpoints = np.array(bounds, dtype=np.float64)
+        # Elementary interval i spans [breakpoints[i-1], breakpoints[i])
+        representatives = np.concatenate(([-INF], breakpoints))
+        offsets, members = [0], []
+        for value in representatives:
+            members.extend(
+                number
+                for number in numbers
+                if self.rules[number].low
+                <= value
+                < self.rules[number].high
+            )
+            offsets.append(len(members))
+        self._breakpoints[test] = breakpoints
+        self._offsets[test] = np.array(offsets, dtype=np.int64)
+        self._members[test] = np.array(members, dtype=np.int64)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "LabDiagnosisIndex":
+        """
+        Load rules from a CSV file with the columns
+        ``test,low,high,code,description[,sex][,defining]``. Empty
+        bounds are open-ended; ``defining`` is ``true`` or empty.
+        """
+        rules = []
+        with open(path, newline="") as file:
+            for row in csv.DictReader(file):
+                rules.append(
+                    LabRule(
+                        test=row["test"],
+                        low=float(row["low"] or -INF),
+                        high=float(row["high"] or INF),
+                        code=row["code"],
+                        description=row.get("description", ""),
+                        sex=row.get("sex") or None,
+                        defining=(row.get("defining") or "").lower()
+                        in ("1", "true", "yes"),
+                    )
+                )
+        return cls(rules)
+
+    def lookup(self, test: str, value: float) -> List[LabRule]:
+        """Rules whose range contains ``value`` for ``test``."""
+        index = TEST_NAMES.index(test)
+        if index not in self._breakpoints:
+            return []
+        segment = np.searchsorted(
+            self._breakpoints[index], value, side="right"
+        )
+        start, end = self._offsets[index][segment : segment + 2]
+        return [
+            self.rules[n] for n in self._members[index][start:end]
+        ]
+
+    def query(
+        self,
+        labs: LabResults,
+        sex: Optional[str] = None,
+        codes: Optional[Iterable[str]] = None,
+    ):
+        """
+        Diagnoses supported and contradicted by a patient's labs.
+        Censored results ("eGFR >60") give no exact value and are
+        ignored.
+
+        Args:
+            labs (LabResults): Extracted lab values.
+            sex (Optional[str]): Patient sex, to apply sex-specific
+                thresholds; sex-specific rules are skipped when unknown.
+            codes (Optional[Iterable[str]]): Diagnoses to check for
+                contradictions, typically the coder's codes. Defaults to
+                every indexed code. Only codes with defining rules can
+                be contradicted.
+
+        Returns:
+            Tuple[List[LabDiagnosis], List[LabDiagnosis]]: Supporting
+            and contradicting diagnoses.
+        """
+        matched: Dict[str, LabDiagnosis] = {}
+        measured: Dict[int, List[str]] = {}
+        exact = ~labs.censored
+        for test in np.unique(labs.tests[exact]):
+            test = int(test)
+            values = labs.values[exact & (labs.tests == test)]
+            name = TEST_NAMES[test]
+            measured[test] = [f"{name}={v:g}" for v in values]
+            if test not in self._breakpoints:
+                continue
+            segments = np.searchsorted(
+                self._breakpoints[test], values, side="right"
+            )
+            offsets, members = (
+                self._offsets[test],
+                self._members[test],
+            )
+            for value, segment in zip(values, segments):
+                for number in members[
+                    offsets[segment] : offsets[segment + 1]
+                ]:
+                    rule = self.rules[number]
+                    if rule.sex is not None and rule.sex != sex:
+                        continue
+                    diagnosis = matched.setdefault(
+                        rule.code,
+                        LabDiagnosis(
+                            rule.code,
+                            rule.description,
+                            supporting=True,
+                        ),
+                    )
+                    evidence = f"{name}={value:g}"
+                    if evidence not in diagnosis.evidence:
+                        diagnosis.evidence.append(evidence)
+
+        contradicting = []
+        for code in self._codes if codes is None else codes:
+            if code in matched:
+                continue
+            rules = [
+                self.rules[n]
+                for n in self._codes.get(code, [])
+                if self.rules[n].defining
+                and self.rules[n].sex in (None, sex)
+            ]
+            tests = {TEST_NAMES.index(rule.test) for rule in rules}
+            evidence = [
+                item
+                for test in sorted(tests)
+                for item in measured.get(test, [])
+            ]
+            if evidence:
+                contradicting.append(
+                    LabDiagnosis(
+                        code,
+                        rules[0].description,
+                        supporting=False,
+                        evidence=evidence,
+                    )
+                )
+        return list(matched.values()), contradicting
+
+
+def format_lab_diagnoses(supporting: List[LabDiagnosis]) -> str:
+    """Compact prompt context for the lab-supported diagnoses."""
+    if not supporting:
+        return ""
+    lines = [
+        "Diagnoses indicated by lab ranges (deterministic index):"
+    ]
+    for diagnosis in supporting:
+        lines.append(
+            f"- {diagnosis.code} {diagnosis.description} "
+            f"({', '.join(diagnosis.evidence[:3])})"
+        )
+    return "\n".join(lines) + "\n"
+
+
+_default_index: Optional[LabDiagnosisIndex] = None
+
+
+def default_lab_index() -> LabDiagnosisIndex:
+    """Shared index over ``DEFAULT_LAB_RULES``."""
+    global _default_index
+    if _default_index is None:
+        _default_index = LabDiagnosisIndex()
+    return _default_index
@@ -0,0 +1,514 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from mcs.candidates import trie_pattern
+
+# Canonical lab tests: name -> (display name, canonical unit, aliases).
+# Aliases are matched case-insensitively on word boundaries; longer
+# aliases win, so "albumin/creatinine ratio" is not read as creatinine.
+LAB_TESTS: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {
+    "egfr": (
+        "eGFR",
+        "mL/min/1.73m2",
+        ("egfr", "estimated gfr", "gfr"),
+    ),
+    "creatinine": (
+        "Creatinine",
+        "mg/dL",
+        ("serum creatinine", "creatinine", "scr", "cr"),
+    ),
+    "bun": (
+        "BUN",
+        "mg/dL",
+        ("bun", "blood urea nitrogen", "urea nitrogen"),
+    ),
+    "potassium": ("Potassium", "mmol/L", ("potassium", "k+")),
+    "sodium": ("Sodium", "mmol/L", ("sodium", "na+")),
+    "bicarbonate": (
+        "Bicarbonate",
+        "mmol/L",
+        ("bicarbonate", "hco3", "co2", "total co2"),
+    ),
+    "calcium": ("Calcium", "mg/dL", ("calcium", "total calcium")),
+    "phosphorus": (
+        "Phosphorus",
+        "mg/dL",
+        ("phosphorus", "phosphate", "phos"),
+    ),
+    "glucose": (
+        "Glucose",
+        "mg/dL",
+        ("glucose", "fasting glucose", "blood glucose", "fbg"),
+    ),
+    "hba1c": (
+        "HbA1c",
+        "%",
+        ("hba1c", "hemoglobin a1c", "a1c", "glycated hemoglobin"),
+    ),
+    "hemoglobin": ("Hemoglobin", "g/dL", ("hemoglobin", "hgb")),
+    "albumin": ("Albumin", "g/dL", ("albumin", "serum albumin")),
+    "uacr": (
+        "UACR",
+        "mg/g",
+        (
+            "uacr",
+            "acr",
+            "albumin/creatinine ratio",
+            "albumin-to-creatinine ratio",
+            "urine albumin",
+            "microalbuminuria",
+            "albuminuria",
+        ),
+    ),
+    "pth": ("PTH", "pg/mL", ("pth", "parathyroid hormone", "ipth")),
+    "ldl": ("LDL", "mg/dL", ("ldl", "ldl cholesterol", "ldl-c")),
+    "tsh": ("TSH", "mIU/L", ("tsh", "thyroid stimulating hormone")),
+    "uric_acid": ("Uric acid", "mg/dL", ("uric acid", "urate")),
+}
+
+# Unit conversions into each test's canonical unit:
+# (test, unit as written, lower-cased) -> (scale, offset)
+UNIT_CONVERSIONS: Dict[Tuple[str, str], Tuple[float, float]] = {
+    ("creatinine", "umol/l"): (1 / 88.4, 0.0),
+    ("creatinine", "µmol/l"): (1 / 88.4, 0.0),
+    ("bun", "mmol/l"): (2.8, 0.0),
+    ("glucose", "mmol/l"): (18.0, 0.0),
+    ("calcium", "mmol/l"): (4.008, 0.0),
+    ("phosphorus", "mmol/l"): (3.097, 0.0),
+    ("hba1c", "mmol/mol"): (0.0915, 2.15),
+    ("hemoglobin", "g/l"): (0.1, 0.0),
+    ("albumin", "g/l"): (0.1, 0.0),
+    ("uacr", "mg/mmol"): (8.84, 0.0),
+    ("ldl", "mmol/l"): (38.67, 0.0),
+    ("uric_acid", "umol/l"): (1 / 59.48, 0.0),
+    ("uric_acid", "µmol/l"): (1 / 59.48, 0.0),
+}
+
+SEXES = ("any", "male", "female")
+# Lower bounds of the age bands reference ranges are tabulated for
+AGE_BANDS = (0, 18, 65)
+
+# Reference ranges in canonical units:
+# (test, sex, first age band, last age band, low, high, critical low,
+#  critical high). Later rows override earlier ones, so general rows
+# come first and sex- or age-specific rows after them.
+REFERENCE_RANGES: List[
+    Tuple[str, str, int, int, float, float, float, float]
+] = [
+    ("egfr", "any", 0, 2, 90, np.inf, 15, np.inf),
+    ("egfr", "any", 2, 2, 60, np.inf, 15, np.inf),
+    ("creatinine", "any", 0, 0, 0.3, 0.7, 0, 4.0),
+    ("creatinine", "any", 1, 2, 0.59, 1.35, 0, 10.0),
+    ("creatinine", "male", 1, 2, 0.74, 1.35, 0, 10.0),
+    ("creatinine", "female", 1, 2, 0.59, 1.04, 0, 10.0),
+    ("bun", "any", 0, 0, 5, 18, 0, 100),
+    ("bun", "any", 1, 1, 7, 20, 0, 100),
+    ("bun", "any", 2, 2, 8, 23, 0, 100),
+    ("potassium", "any", 0, 0, 3.4, 4.7, 2.5, 6.5),
+    ("potassium", "any", 1, 2, 3.5, 5.0, 2.5, 6.5),
+    ("sodium", "any", 0, 2, 135, 145, 120, 160),
+    ("bicarbonate", "any", 0, 2, 22, 29, 10, 40),
+    ("calcium", "any", 0, 2, 8.5, 10.5, 6.5, 13.0),
+    ("phosphorus", "any", 0, 0, 4.0, 7.0, 1.0, 9.0),
+    ("phosphorus", "any", 1, 2, 2.5, 4.5, 1.0, 9.0),
+    ("glucose", "any", 0, 2, 70, 99, 40, 500),
+    ("hba1c", "any", 0, 2, 4.0, 5.6, 0, np.inf),
+    ("hemoglobin", "any", 0, 0, 11.5, 15.5, 7.0, 20.0),
+    ("hemoglobin", "any", 1, 2, 12.0, 17.5, 7.0, 20.0),
+    ("hemoglobin", "male", 1, 2, 13.5, 17.5, 7.0, 20.0),
+    ("hemoglobin", "female", 1, 2, 12.0, 15.5, 7.0, 20.0),
+    ("albumin", "any", 0, 2, 3.5, 5.0, 1.5, np.inf),
+    ("uacr", "any", 0, 2, 0, 30, 0, np.inf),
+    ("pth", "any", 0, 2, 15, 65, 0, np.inf),
+    ("ldl", "any", 0, 2, 0, 100, 0, np.inf),
+    ("tsh", "any", 0, 2, 0.4, 4.0, 0.01, 50),
+    ("uric_acid", "any", 0, 2, 2.4, 7.0, 0, 13.0),
+    ("uric_acid", "male", 0, 2, 3.4, 7.0, 0, 13.0),
+    ("uric_acid", "female", 0, 2, 2.4, 6.0, 0, 13.0),
+]
+
+FLAG_NORMAL = "N"
+FLAG_LOW = "L"
+FLAG_HIGH = "H"
+FLAG_CRITICAL_LOW = "LL"
+FLAG_CRITICAL_HIGH = "HH"
+FLAG_UNKNOWN = "?"
+_FLAGS = np.array(
+    [
+        FLAG_UNKNOWN,
+        FLAG_NORMAL,
+        FLAG_LOW,
+        FLAG_HIGH,
+        FLAG_CRITICAL_LOW,
+        FLAG_CRITICAL_HIGH,
+    ]
+)
+
+TEST_NAMES: Tuple[str, ...] = tuple(LAB_TESTS)
+_TEST_INDEX = {name: index for index, name in enumerate(TEST_NAMES)}
+
+
+def _build_reference_table() -> np.ndarray:
+    """
+    Dense [test, sex, age band, (low, high, critical low, critical
+    high)] table, so evaluating any number of results is one fancy
+    index instead of a per-result search.
+    """
+    table = np.full(
+        (len(TEST_NAMES), len(SEXES), len(AGE_BANDS), 4), np.nan
+    )
+    for test, sex, first, last, *bounds in REFERENCE_RANGES:
+        sexes = (
+            range(len(SEXES)) if sex == "any" else [SEXES.index(sex)]
+        )
+        for sex_index in sexes:
+            table[_TEST_INDEX[test], sex_index, first : last + 1] = (
+                bounds
+            )
+    return table
+
+
+def _alias_pattern() -> Tuple[str, Dict[str, str]]:
+    aliases: Dict[str, str] = {}
+    for test, (_, _, names) in LAB_TESTS.items():
+        for name in names:
+            aliases.setdefault(name, test)
+    return trie_pattern(aliases), aliases
+
+
+_REFERENCE_TABLE = _build_reference_table()
+_ALIASES, _ALIAS_TESTS = _alias_pattern()
+
+_UNITS = (
+    r"ml/min(?:/1\.73\s*m(?:2|²|\^2))?|mg/dl|mg/g|mg/mmol|mmol/mol"
+    r"|mmol/l|meq/l|[uµ]mol/l|g/dl|g/l|pg/ml|ng/ml|m?iu/l|[uµ]iu/ml|%"
+)
+
+_DURATION_UNITS = (
+    r"(?:seconds?|minutes?|hours?|hrs?|days?|weeks?|wks?|months?|mos?"
+    r"|years?|yrs?)"
+)
+
+# Dates ("2023-05-01", "05/01/23") and durations ("3 days ago") between
+# a test name and its value; they are skipped, never read as values
+_DATE_OR_DURATION = (
+    r"\d{4}-\d{1,2}-\d{1,2}|\d{1,2}/\d{1,2}/\d{2,4}"
+    r"|\d+\s*" + _DURATION_UNITS + r"\b(?:\s+ago)?"
+)
+
+# Doses: "20 meq tablet", "500 mg". Lab units such as "mg/dl" go on
+# with a slash and are not doses.
+_DOSE_UNITS = (
+    r"(?:mg|mcg|g|meq|mmol|units?|iu|tablets?|tabs?|capsules?|caps?"
+    r"|ml)(?![\w/])"
+)
+
+# "<test> [: | was | of | (serum) | (<date>) ...] [<|>] <value> [<unit>]"
+# on one line of lower-cased text. Like the candidate scan, the match
+# starts on the character before the test name so the regex engine
+# only enters the alias trie at word starts. Numbers glued to a letter
+# ("G3a", "x2") and numbers followed by a dose or duration unit are
+# not values.
+LAB_VALUE = re.compile(
+    r"[^\w+](?P<test>" + _ALIASES + r")(?![\w+])"
+    r"(?:[^\n\d<>]|" + _DATE_OR_DURATION + r"){0,20}?"
+    r"(?P<cmp>[<>]=?)?\s*"
+    r"(?<![a-z])(?P<value>\d+(?:\.\d+)?)(?![\d/])(?!\.\d)(?!-\d)"
+    r"(?!\s*" + _DURATION_UNITS + r"\b)"
+    r"(?!\s*" + _DOSE_UNITS + r")"
+    r"[ \t]*(?P<unit>" + _UNITS + r")?"
+)
+
+# Treatment targets quoted next to a lab name are not results
+_TARGET = re.compile(r"\b(?:target|goal|keep|aim)\b")
+
+# Words between a lab name and a number that make the name part of a
+# drug ("potassium chloride") or another measure ("creatinine
+# clearance", "GFR category")
+_NOT_A_RESULT = re.compile(
+    r"\b(?:chloride|carbonate|citrate|acetate|gluconate|sulfate"
+    r"|phosphate|polystyrene|supplements?|tablets?|clearance"
+    r"|category|stage)\b"
+)
+
+_AGE = re.compile(
+    r"\bage\s*:?\s*(\d{1,3})\b|\b(\d{1,3})[- ](?:year|yr)s?[- ]old\b"
+    r"|\b(\d{1,3})\s*y/?o\b",
+    re.IGNORECASE,
+)
+_SEX = re.compile(
+    r"\b(?:gender|sex)\s*:?\s*(male|female|m|f)\b|\b(male|female|man|woman)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class LabResults:
+    """
+    Lab values found in a document, stored column-wise.
+
+    Attributes:
+        tests (np.ndarray): Index into ``TEST_NAMES`` per result.
+        values (np.ndarray): Values in the test's canonical unit.
+        units (List[str]): Units as written in the document.
+        positions (np.ndarray): Character offset of each result.
+        comparators (np.ndarray): ``<``, ``<=``, ``>`` or ``>=`` for
+            censored results such as "eGFR >60", empty otherwise.
+        flags (np.ndarray): ``N``, ``L``, ``H``, ``LL``, ``HH`` or ``?``
+            per result, set by ``evaluate_labs``.
+        low (np.ndarray): Reference low bound used for each result.
+        high (np.ndarray): Reference high bound used for each result.
+    """
+
+    tests: np.ndarray
+    values: np.ndarray
+    units: List[str]
+    positions: np.ndarray
+    comparators: Optional[np.ndarray] = None
+    flags: Optional[np.ndarray] = None
+    low: Optional[np.ndarray] = None
+    high: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.tests)
+
+    @property
+    def censored(self) -> np.ndarray:
+        """Mask of the results only known to lie above or below a bound."""
+        if self.comparators is None:
+            return np.zeros(len(self), dtype=bool)
+        return self.comparators != ""
+
+    def rows(self, abnormal_only: bool = False) -> List[Dict]:
+        """Results as dicts, optionally only the flagged ones."""
+        indexes = range(len(self))
+        if abnormal_only and self.flags is not None:
+            indexes = np.flatnonzero(
+                (self.flags != FLAG_NORMAL)
+                & (self.flags != FLAG_UNKNOWN)
+            )
+        rows = []
+        for i in indexes:
+            test = TEST_NAMES[self.tests[i]]
+            rows.append(
+                {
+                    "test": test,
+                    "name": LAB_TESTS[test][0],
+                    "value": float(self.values[i]),
+                    "comparator": (
+                        str(self.comparators[i])
+                        if self.comparators is not None
+                        else ""
+                    ),
+                    "unit": LAB_TESTS[test][1],
+                    "position": int(self.positions[i]),
+                    "flag": (
+                        str(self.flags[i])
+                        if self.flags is not None
+                        else None
+                    ),
+                    "low": (
+                        float(self.low[i])
+                        if self.low is not None
+                        else None
+                    ),
+                    "high": (
+                        float(self.high[i])
+                        if self.high is not None
+                        else None
+                    ),
+                }
+            )
+        return rows
+
+
+def extract_labs(text: str) -> LabResults:
+    """
+    Pull (test, comparator, value, unit, position) tuples out of free
+    text and convert every value to its test's canonical unit. Dates
+    and durations next to a test name are not taken as its value.
+    """
+    tests, comparators, values, units, positions = [], [], [], [], []
+    lowered = " " + (text or "").lower()
+    for match in LAB_VALUE.finditer(lowered):
+        context = lowered[
+            max(match.start() - 24, 0) : match.start("value")
+        ]
+        if _TARGET.search(context) or _NOT_A_RESULT.search(
+            lowered[match.end("test") : match.start("value")]
+        ):
+            continue
+        tests.append(_TEST_INDEX[_ALIAS_TESTS[match.group("test")]])
+        comparators.append(match.group("cmp") or "")
+        values.append(match.group("value"))
+        units.append(match.group("unit") or "")
+        positions.append(match.start("test") - 1)
+
+    test_array = np.array(tests, dtype=np.int16)
+    value_array = np.array(values, dtype=np.float64)
+    if units:
+        conversions = np.array(
+            [
+                UNIT_CONVERSIONS.get(
+                    (TEST_NAMES[test], unit), (1.0, 0.0)
+                )
+                for test, unit in zip(tests, units)
+            ]
+        )
+        value_array = (
+            value_array * conversions[:, 0] + conversions[:, 1]
+        )
+    return LabResults(
+        tests=test_array,
+        values=value_array,
+        units=units,
+        positions=np.array(positions, dtype=np.int64),
+        comparators=np.array(comparators, dtype="<U2"),
+    )
+
+
+def parse_demographics(
+    text: str,
+) -> Tuple[Optional[int], Optional[str]]:
+    """Best-effort patient age and sex (``male``/``female``) from text."""
+    age = sex = None
+    match = _AGE.search(text or "")
+    if match:
+        age = int(next(group for group in match.groups() if group))
+    match = _SEX.search(text or "")
+    if match:
+        word = (match.group(1) or match.group(2)).lower()
+        sex = "female" if word in ("female", "f", "woman") else "male"
+    return age, sex
+
+
+def evaluate_labs(
+    labs: LabResults,
+    age: Optional[int] = None,
+    sex: Optional[str] = None,
+) -> LabResults:
+    """
+    Flag every result against its age- and sex-specific reference
+    range in one vectorized pass. Adults are assumed when the age is
+    unknown. A censored result ("<15", ">60") is only flagged when
+    every value it allows is out of range; otherwise it is ``?``.
+
+    Returns:
+        LabResults: ``labs`` with ``flags``, ``low`` and ``high`` set.
+    """
+    sex_index = SEXES.index(sex) if sex in SEXES else 0
+    band = (
+        int(
+            np.searchsorted(
+                AGE_BANDS, 18 if age is None else age, side="right"
+            )
+        )
+        - 1
+    )
+    bounds = _REFERENCE_TABLE[
+        labs.tests.astype(np.intp), sex_index, band
+    ]
+    low, high, critical_low, critical_high = bounds.T
+
+    values = labs.values
+    if labs.comparators is None:
+        below = above = np.zeros(len(labs), dtype=bool)
+    else:
+        below = np.char.startswith(labs.comparators, "<")
+        above = np.char.startswith(labs.comparators, ">")
+    codes = np.select(
+        [
+            np.isnan(low),
+            below & (values <= critical_low),
+            below & (values <= low),
+            above & (values >= critical_high),
+            above & (values >= high),
+            below | above,
+            values < critical_low,
+            values > critical_high,
+            values < low,
+            values > high,
+        ],
+        [0, 4, 2, 5, 3, 0, 4, 5, 2, 3],
+        default=1,
+    )
+    labs.flags = _FLAGS[codes]
+    labs.low = low
+    labs.high = high
+    return labs
+
+
+def _format_range(low: float, high: float) -> str:
+    if not np.isfinite(high):
+        return f">={low:g}"
+    if low <= 0:
+        return f"<={high:g}"
+    return f"{low:g}-{high:g}"
+
+
+def format_lab_flags(
+    labs: LabResults,
+    age: Optional[int] = None,
+    sex: Optional[str] = None,
+    limit: int = 40,
+) -> str:
+    """
+    Compact summary of the abnormal results for an agent prompt: one
+    line per test whose latest value is abnormal. Returns an empty
+    string when nothing is flagged.
+    """
+    if labs.flags is None or not len(labs):
+        return ""
+
+    latest: Dict[str, Dict] = {}
+    counts: Dict[str, int] = {}
+    for row in labs.rows():
+        latest[row["test"]] = row
+        if row["flag"] not in (FLAG_NORMAL, FLAG_UNKNOWN):
+            counts[row["test"]] = counts.get(row["test"], 0) + 1
+    abnormal = [
+        row
+        for row in latest.values()
+        if row["flag"] not in (FLAG_NORMAL, FLAG_UNKNOWN)
+    ]
+    if not abnormal:
+        return ""
+
+    patient = ", ".join(
+        part
+        for part in (f"age {age}" if age else "", sex or "")
+        if part
+    )
+    lines = [
+        "Abnormal lab results (deterministic reference-range check"
+        + (f"; {patient}" if patient else "")
+        + "):"
+    ]
+    for row in abnormal[:limit]:
+        repeats = (
+            f", {counts[row['test']]} abnormal results"
+            if counts[row["test"]] > 1
+            else ""
+        )
+        lines.append(
+            f"- {row['name']} {row['comparator']}{row['value']:g} "
+            f"{row['unit']} "
+            f"[{row['flag']}; ref {_format_range(row['low'], row['high'])}"
+            f"{repeats}]"
+        )
+    normal = len(labs) - sum(counts.values())
+    lines.append(
+        f"({normal} result{'' if normal == 1 else 's'} within range"
+        " omitted)"
+    )
+    return "\n".join(lines) + "\n"
+
+
+def lab_context(text: str) -> str:
+    """Extract, evaluate and format the lab flags of a document."""
+    age, sex = parse_demographics(text)
+    labs = evaluate_labs(extract_labs(text), age=age, sex=sex)
+    return format_lab_flags(labs, age=age, sex=sex)
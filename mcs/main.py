@@ -1,13 +1,103 @@
+import asyncio
+import contextvars
+import copy
+import inspect
 import json
 import os
+import queue
+import threading
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict
 from datetime import datetime, timedelta
-from typing import Any, Callable, Dict, List, Optional
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from dotenv import load_dotenv
+from pydantic import BaseModel, Field, PrivateAttr
 
-from pydantic import BaseModel
-from swarms import Agent
-from mcs.rag_api import ChromaQueryClient
+from mcs.agents import (
+    PIPELINE_ROLES,
+    AgentPool,
+    agent_call,
+    agent_registry,
+    default_agent_pool,
+)
+from mcs.batching import MicroBatcher
+from mcs.budget import BudgetTracker, RunBudget
+from mcs.cache import StageCache, stage_cache_key
+from mcs.checkpoint import (
+    CheckpointStore,
+    RunCheckpoint,
+    StageCheckpoint,
+    case_fingerprint,
+)
+from mcs.candidates import extract_candidates, format_candidates
+from mcs.chunking import (
+    DocumentChunk,
+    Page,
+    chunk_pages,
+    extract_icd10_findings,
+    format_findings,
+    merge_findings,
+    split_pages,
+)
+from mcs.confidence import EarlyExitPolicy
+from mcs.context import (
+    DEFAULT_STAGE_BUDGETS,
+    ContextPacker,
+    ContextSection,
+    estimate_tokens,
+)
+from mcs.extraction import MCSCode, merge_codes
+from mcs.hooks import HookSet, MCSHook, RunInfo
+from mcs.icd10_index import ICD10Index, open_index
+from mcs.lab_index import (
+    LabDiagnosis,
+    LabDiagnosisIndex,
+    default_lab_index,
+    format_lab_diagnoses,
+)
+from mcs.labs import (
+    evaluate_labs,
+    extract_labs,
+    format_lab_flags,
+    parse_demographics,
+)
+from mcs.metrics import (
+    MetricsRegistry,
+    StageStats,
+    current_stage_stats,
+    metrics_registry,
+)
+from mcs.patient_state import PatientState, PatientStateStore
+from mcs.router import CaseFeatures, ModelRoute, ModelRouter
+from mcs.pipeline import (
+    DEFAULT_PIPELINE,
+    Pipeline,
+    Stage,
+    arun_pipeline,
+    BypassStage,
+    run_pipeline,
+    specialist_pipeline,
+)
+from mcs.serialization import dumps, is_json_native
+from mcs.streaming import (
+    CHUNK_EVENT_TYPES,
+    MCSStreamEvent,
+    current_chunk,
+)
 
 from mcs.security import (
     KeyRotationPolicy,
@@ -15,6 +105,8 @@ from mcs.security import (
     secure_data,
 )
 
+load_dotenv()
+
 
 def patient_id_uu():
     return str(uuid.uuid4().hex)
@@ -24,401 +116,173 @@ def log_agent_data(data: Dict[str, Any]):
     pass
 
 
-chief_medical_officer = Agent(
-    agent_name="Chief Medical Officer",
-    system_prompt="""
-    You are the Chief Medical Officer coordinating a team of medical specialists for viral disease diagnosis.
-    Your responsibilities include:
-    - Gathering initial patient symptoms and medical history
-    - Coordinating with specialists to form differential diagnoses
-    - Synthesizing different specialist opinions into a cohesive diagnosis
-    - Ensuring all relevant symptoms and test results are considered
-    - Making final diagnostic recommendations
-    - Suggesting treatment plans based on team input
-    - Identifying when additional specialists need to be consulted
-    - For each diferrential diagnosis provide minimum lab ranges to meet that diagnosis or be indicative of that diagnosis minimum and maximum
-    
-    Format all responses with clear sections for:
-    - Initial Assessment (include preliminary ICD-10 codes for symptoms)
-    - Differential Diagnoses (with corresponding ICD-10 codes)
-    - Specialist Consultations Needed
-    - Recommended Next Steps
-    
-    
-    """,
-    model_name="groq/deepseek-r1-distill-llama-70b",
-    max_loops=1,
-    dynamic_temperature_enabled=True,
-)
+async def run_agent_async(agent: Any, task: str) -> Any:
+    """
+    Await a single agent call without blocking the event loop.
 
-# virologist = Agent(
-#     agent_name="Virologist",
-#     system_prompt="""You are a specialist in viral diseases. For each case, provide:
-
-#     Clinical Analysis:
-#     - Detailed viral symptom analysis
-#     - Disease progression timeline
-#     - Risk factors and complications
-
-#     Coding Requirements:
-#     - List relevant ICD-10 codes for:
-#         * Confirmed viral conditions
-#         * Suspected viral conditions
-#         * Associated symptoms
-#         * Complications
-#     - Include both:
-#         * Primary diagnostic codes
-#         * Secondary condition codes
-
-#     Document all findings using proper medical coding standards and include rationale for code selection.""",
-#     model_name="groq/deepseek-r1-distill-llama-70b",
-#     max_loops=1,
-#     dynamic_temperature_enabled=True,
-# )
-
-internist = Agent(
-    agent_name="Internist",
-    system_prompt="""
-    You are an Internal Medicine specialist responsible for comprehensive evaluation.
-    
-    For each case, provide:
-    
-    Clinical Assessment:
-    - System-by-system review
-    - Vital signs analysis
-    - Comorbidity evaluation
-    
-    Medical Coding:
-    - ICD-10 codes for:
-        * Primary conditions
-        * Secondary diagnoses
-        * Complications
-        * Chronic conditions
-        * Signs and symptoms
-    - Include hierarchical condition category (HCC) codes where applicable
-    
-    Document supporting evidence for each code selected.""",
-    model_name="groq/deepseek-r1-distill-llama-70b",
-    max_loops=1,
-    dynamic_temperature_enabled=True,
-)
+    Uses the agent's native ``arun`` coroutine when it has one and
+    otherwise runs the blocking ``run`` in a worker thread. Either way
+    the agent counts as busy until the call has really returned, even
+    when the awaiting task is cancelled.
 
-medical_coder = Agent(
-    agent_name="Medical Coder",
-    system_prompt="""
-    You are a highly experienced and certified medical coder with extensive knowledge of ICD-10 coding guidelines, clinical documentation standards, and compliance regulations. Your responsibility is to ensure precise, compliant, and well-documented coding for all clinical cases.
-
-    ### Primary Responsibilities:
-    1. **Review Clinical Documentation**: Analyze all available clinical records, including specialist inputs, physician notes, lab results, imaging reports, and discharge summaries.
-    2. **Assign Accurate ICD-10 Codes**: Identify and assign appropriate codes for primary diagnoses, secondary conditions, symptoms, and complications.
-    3. **Ensure Coding Compliance**: Follow the latest ICD-10-CM/PCS coding guidelines, payer-specific requirements, and organizational policies.
-    4. **Document Code Justification**: Provide clear, evidence-based rationale for each assigned code.
-
-    ### Detailed Coding Process:
-    - **Review Specialist Inputs**: Examine all relevant documentation to capture the full scope of the patient's condition and care provided.
-    - **Identify Diagnoses**: Determine the primary and secondary diagnoses, as well as any symptoms or complications, based on the documentation.
-    - **Assign ICD-10 Codes**: Select the most accurate and specific ICD-10 codes for each identified diagnosis or condition.
-    - **Document Supporting Evidence**: Record the documentation source (e.g., lab report, imaging, or physician note) for each code to justify its assignment.
-    - **Address Queries**: Note and flag any inconsistencies, missing information, or areas requiring clarification from providers.
-
-    ### Output Requirements:
-    Your response must be clear, structured, and compliant with professional standards. Use the following format:
-
-    1. **Primary Diagnosis Codes**:
-        - **ICD-10 Code**: [e.g., E11.9]
-        - **Description**: [e.g., Type 2 diabetes mellitus without complications]
-        - **Supporting Documentation**: [e.g., Physician's note dated MM/DD/YYYY]
-        
-    2. **Secondary Diagnosis Codes**:
-        - **ICD-10 Code**: [Code]
-        - **Description**: [Description]
-        - **Order of Clinical Significance**: [Rank or priority]
-
-    3. **Symptom Codes**:
-        - **ICD-10 Code**: [Code]
-        - **Description**: [Description]
-
-    4. **Complication Codes**:
-        - **ICD-10 Code**: [Code]
-        - **Description**: [Description]
-        - **Relevant Documentation**: [Source of information]
-
-    5. **Coding Notes**:
-        - Observations, clarifications, or any potential issues requiring provider input.
-
-    ### Additional Guidelines:
-    - Always prioritize specificity and compliance when assigning codes.
-    - For ambiguous cases, provide a brief note with reasoning and flag for clarification.
-    - Ensure the output format is clean, consistent, and ready for professional use.
-    """,
-    model_name="groq/deepseek-r1-distill-llama-70b",
-    max_loops=1,
-    dynamic_temperature_enabled=True,
-)
+    Args:
+        agent (Any): The agent to call.
+        task (str): The task passed to the agent.
 
-synthesizer = Agent(
-    agent_name="Diagnostic Synthesizer",
-    system_prompt="""You are responsible for creating the final diagnostic and coding assessment.
-    
-    Synthesis Requirements:
-    1. Integrate all specialist findings
-    2. Reconcile any conflicting diagnoses
-    3. Verify coding accuracy and completeness
-    
-    Final Report Sections:
-    1. Clinical Summary
-        - Primary diagnosis with ICD-10
-        - Secondary diagnoses with ICD-10
-        - Supporting evidence
-    2. Coding Summary
-        - Complete code list with descriptions
-        - Code hierarchy and relationships
-        - Supporting documentation
-    3. Recommendations
-        - Additional testing needed
-        - Follow-up care
-        - Documentation improvements needed
-    
-    Include confidence levels and evidence quality for all diagnoses and codes.""",
-    model_name="groq/deepseek-r1-distill-llama-70b",
-    max_loops=1,
-    dynamic_temperature_enabled=True,
-)
+    Returns:
+        Any: The agent's output.
+    """
+    arun = getattr(agent, "arun", None)
+    if arun is not None and inspect.iscoroutinefunction(arun):
+        # ``arun`` usually awaits ``run`` in a thread, which a cancel
+        # does not stop. Shielded, the call finishes (and stays marked)
+        # after a timed-out stage's task is cancelled.
+        call = asyncio.ensure_future(_arun_agent_tracked(agent, task))
+        call.add_done_callback(
+            lambda done: done.cancelled() or done.exception()
+        )
+        return await asyncio.shield(call)
+    return await asyncio.to_thread(_run_agent_tracked, agent, task)
 
-synthesizer = Agent(
-    agent_name="Hierarchical Summarization Agent",
-    system_prompt="""You are an expert in hierarchical summarization, skilled at condensing complex medical data into structured, efficient, and accurate summaries. Your task is to generate concise and well-organized summaries that prioritize the most important information while maintaining clarity and completeness.
-
-    ### Summarization Goals:
-    1. Extract and prioritize key insights from detailed medical data.
-    2. Present information hierarchically, starting with the most critical and broad insights before including finer details.
-    3. Ensure summaries are actionable, evidence-backed, and easy to understand by medical professionals.
-
-    ### Output Structure:
-    #### 1. Executive Summary:
-    - **Primary Focus**: State the main diagnosis or issue.
-    - **Key Supporting Evidence**: Highlight critical findings (e.g., lab results, imaging, symptoms).
-    - **ICD-10 Codes**: Include codes relevant to the primary diagnosis.
-
-    #### 2. Detailed Findings:
-    - **Secondary Issues**: List additional diagnoses or findings with brief explanations.
-    - **Supporting Details**: Provide summarized evidence for each finding.
-
-    #### 3. Action Plan:
-    - **Recommendations**: Outline immediate next steps (e.g., additional tests, treatments, follow-ups).
-    - **Unresolved Questions**: Highlight gaps in data or areas requiring further investigation.
-
-    ### Guidelines for Summarization:
-    - **Be Concise**: Use bullet points and short paragraphs for readability.
-    - **Prioritize Information**: Rank findings by clinical relevance and urgency.
-    - **Maintain Accuracy**: Ensure all summaries are backed by provided data and include confidence levels for findings.
-    - **Simplify Complex Data**: Translate medical jargon into clear and accessible language where appropriate.
-
-    
-    ### Output Style:
-    - Clear and professional tone.
-    - Consistent structure with easy-to-scan sections.
-    - Minimize redundancy while ensuring completeness.
-    """,
-    model_name="groq/deepseek-r1-distill-llama-70b",
-    max_loops=1,
-    dynamic_temperature_enabled=True,
-)
 
-summarizer_agent = Agent(
-    agent_name="Condensed Summarization Agent",
-    system_prompt="""You are an expert in creating concise and actionable summaries from tweets, short texts, and small reports. Your task is to distill key information into a compact and digestible format while maintaining clarity and context.
-
-    ### Summarization Goals:
-    1. Identify the most critical message or insight from the input text.
-    2. Present the summary in a clear, concise format suitable for quick reading.
-    3. Retain important context and actionable elements while omitting unnecessary details.
-
-    ### Output Structure:
-    #### 1. Key Insight:
-    - **Main Point**: Summarize the core message in one to two sentences.
-    - **Relevant Context**: Include key supporting details (if applicable).
-
-    #### 2. Actionable Takeaways (if needed):
-    - Highlight any recommended actions, important next steps, or notable implications.
-
-    ### Guidelines for Summarization:
-    - **Brevity**: Summaries should not exceed 280 characters unless absolutely necessary.
-    - **Clarity**: Avoid ambiguity or technical jargon; focus on accessibility.
-    - **Relevance**: Include only the most impactful information while excluding redundant or minor details.
-    - **Tone**: Match the tone of the original content (e.g., professional, casual, or informative).
-
-    ### Example Workflow:
-    1. Analyze the input for the primary message or intent.
-    2. Condense the content into a clear, actionable summary.
-    3. Format the output to ensure readability and coherence.
-
-    ### Output Style:
-    - Clear, concise, and easy to understand.
-    - Suitable for social media or quick report overviews.
-    """,
-    model_name="groq/deepseek-r1-distill-llama-70b",
-    max_loops=1,
-    dynamic_temperature_enabled=False,  # Keeps summaries consistently concise
-)
+async def _arun_agent_tracked(agent: Any, task: str) -> Any:
+    with agent_call(agent):
+        return await agent.arun(task)
 
-lab_matcher = Agent(
-    agent_name="Laboratory-Test-Matcher",
-    system_prompt="""
-    You are a specialist in laboratory medicine responsible for matching diagnoses with appropriate laboratory tests, providing reference ranges, and identifying the most suitable laboratory locations for patients.
-
-    Primary Responsibilities:
-    1. Match diagnoses to appropriate laboratory tests
-    2. Provide reference ranges and interpretation guidelines
-    3. Indicate test priorities and sequences
-    4. Specify collection requirements
-    5. Identify the most suitable laboratory locations for patients based on their location and diagnosis
-
-    For each case, provide:
-
-    Test Recommendations:
-    - Primary diagnostic tests
-    - Confirmatory tests
-    - Monitoring tests
-    - Differential diagnosis tests
-    
-    Test Details:
-    - Test names and codes (LOINC if applicable)
-    - Specimen requirements
-    - Reference ranges by:
-        * Age
-        * Sex
-        * Special conditions
-    - Critical values
-    
-    Clinical Correlation:
-    - Expected results for specific conditions
-    - Interfering factors
-    - Result interpretation guidelines
-    - Follow-up testing recommendations
-    
-    Laboratory Location Recommendations:
-    - Identify the nearest laboratory locations to the patient based on their address
-    - Provide information on laboratory hours, contact details, and any specific requirements for specimen collection
-    
-    Documentation Requirements:
-    - Medical necessity justification
-    - ICD-10 codes for coverage
-    - Frequency limitations
-    - Special authorization requirements
-    
-    Output Format:
-    1. Primary Test Panel
-        - Essential tests with rationale
-        - Reference ranges
-        - Expected results
-    2. Secondary Tests
-        - Confirmatory tests
-        - Monitoring tests
-    3. Specimen Requirements
-        - Collection instructions
-        - Processing notes
-    4. Interpretation Guidelines
-        - Result interpretation
-        - Clinical correlation
-    5. Laboratory Location Information
-        - Nearest laboratory locations to the patient
-        - Laboratory details (hours, contact, specimen collection requirements)
-    6. Coverage Documentation
-        - Required ICD-10 codes
-        - Medical necessity documentation
-        
-    Always specify:
-    - Test sensitivity and specificity when available
-    - Time considerations (STAT vs. routine)
-    - Cost considerations
-    - Alternative test options
-    """,
-    model_name="groq/deepseek-r1-distill-llama-70b",
-    max_loops=1,
-    dynamic_temperature_enabled=True,
-)
+
+def _run_agent_tracked(agent: Any, task: str) -> Any:
+    # Counted on the worker thread: cancelling the awaiting task does
+    # not stop the call, so the agent stays busy until it returns
+    with agent_call(agent):
+        return agent.run(task)
 
 
-treatment_agent = Agent(
-    agent_name="Treatment-Agent",
-    system_prompt="""
-    You are a specialist in treatment options, responsible for recommending the most effective and cost-efficient treatments for patients, considering both traditional and modern medicine approaches.
-
-    Primary Responsibilities:
-    1. Provide treatment recommendations for various diagnoses
-    2. Offer multiple treatment methods, including traditional and modern medicine approaches
-    3. Rank treatment options based on effectiveness and estimated cost
-    4. Consider patient-specific factors, such as age, health status, and allergies
-    5. Provide detailed treatment plans, including dosages, frequencies, and duration
-
-    For each case, provide:
-
-    Treatment Recommendations:
-    - Multiple treatment options, including traditional and modern medicine approaches
-    - Ranking of treatment options based on effectiveness and estimated cost
-    - Consideration of patient-specific factors, such as age, health status, and allergies
-    
-    Treatment Details:
-    - Detailed treatment plans, including dosages, frequencies, and duration
-    - Information on potential side effects and interactions
-    - Monitoring and follow-up requirements
-    
-    Cost Analysis:
-    - Estimated cost of each treatment option
-    - Breakdown of costs, including medication, hospitalization, and other expenses
-    
-    Patient Education:
-    - Clear explanations of treatment options and their benefits
-    - Instructions for self-care and lifestyle modifications
-    - Addressing patient concerns and questions
-    
-    Output Format:
-    1. Treatment Options
-        - Ranked list of treatment options with effectiveness and cost analysis
-        - Detailed treatment plans
-    2. Patient Education
-        - Clear explanations of treatment options and their benefits
-        - Instructions for self-care and lifestyle modifications
-    3. Cost Analysis
-        - Estimated cost of each treatment option
-        - Breakdown of costs
-    4. Monitoring and Follow-up
-        - Requirements for monitoring and follow-up care
-        - Scheduling and frequency of follow-up appointments
-    
-    Always specify:
-    - Evidence-based information to support treatment recommendations
-    - Consideration of patient preferences and values
-    - Alternative treatment options for patients with specific needs or restrictions
-    """,
-    model_name="groq/deepseek-r1-distill-llama-70b",
-    max_loops=1,
-    dynamic_temperature_enabled=True,
-    do_not_use_cluster_ops=True,
+# Shared agents kept for direct use, e.g. ``from mcs.main import
+# medical_coder``. They are built by the registry on first access;
+# MedicalCoderSwarm runs draw isolated instances from an AgentPool.
+_SHARED_AGENT_ROLES = (
+    "chief_medical_officer",
+    "internist",
+    "medical_coder",
+    "synthesizer",
+    "summarizer_agent",
+    "lab_matcher",
+    "treatment_agent",
 )
 
-# Create agent list
-agents = [
-    medical_coder,
-    synthesizer,
-    treatment_agent,
-]
+
+def __getattr__(name: str) -> Any:
+    if name in _SHARED_AGENT_ROLES:
+        return agent_registry.get(name)
+    if name == "agents":
+        # Create agent list
+        return [
+            agent_registry.get("medical_coder"),
+            agent_registry.get("synthesizer"),
+            agent_registry.get("treatment_agent"),
+        ]
+    raise AttributeError(
+        f"module {__name__!r} has no attribute {name!r}"
+    )
+
+
+def _timestamp() -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S")
 
 
 class MCSAgentOutputs(BaseModel):
-    agent_id: Optional[str] = str(uuid.uuid4().hex)
+    agent_id: Optional[str] = Field(
+        default_factory=lambda: uuid.uuid4().hex
+    )
     agent_name: Optional[str] = None
     agent_output: Optional[str] = None
-    timestamp: Optional[str] = time.strftime("%Y-%m-%d %H:%M:%S")
+    timestamp: Optional[str] = Field(default_factory=_timestamp)
+    wall_time: Optional[float] = None
+    queue_time: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    retries: Optional[int] = None
+
+
+class MCSCodeValidation(BaseModel):
+    code: str
+    valid: bool
+    billable: Optional[bool] = None
+    description: Optional[str] = None
+    parent: Optional[str] = None
+
+
+class MCSBudgetReport(BaseModel):
+    tokens: int
+    dollars: float
+    wall_time: float
+    exhausted: Optional[str] = None
+    skipped: Dict[str, str] = {}
+    downgraded: Dict[str, str] = {}
+
+
+class MCSRoutingReport(BaseModel):
+    tier: str
+    reason: str
+    features: CaseFeatures
+    stages: Dict[str, ModelRoute] = {}
+
+
+class MCSEarlyExit(BaseModel):
+    confident: bool
+    codes: List[str] = []
+    valid: Optional[float] = None
+    agreement: float = 0.0
+    self_reported: Optional[float] = None
+    reasons: List[str] = []
+    skipped: List[str] = []
 
 
 class MCSOutput(BaseModel):
-    run_id: Optional[str] = str(uuid.uuid4().hex)
+    run_id: Optional[str] = Field(
+        default_factory=lambda: uuid.uuid4().hex
+    )
     patient_id: Optional[str]
     agent_outputs: Optional[List[MCSAgentOutputs]] = None
     summary: Optional[str]
-    timestamp: Optional[str] = time.strftime("%Y-%m-%d %H:%M:%S")
+    codes: Optional[List[MCSCode]] = None
+    code_validations: Optional[List[MCSCodeValidation]] = None
+    lab_diagnoses: Optional[List[LabDiagnosis]] = None
+    budget: Optional[MCSBudgetReport] = None
+    routing: Optional[MCSRoutingReport] = None
+    early_exit: Optional[MCSEarlyExit] = None
+    timestamp: Optional[str] = Field(default_factory=_timestamp)
+    _version: int = PrivateAttr(default=0)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if not name.startswith("_"):
+            self.touch()
+
+    def touch(self) -> None:
+        """Mark the output changed, after mutating a field in place."""
+        self._version += 1
+
+    @property
+    def version(self) -> int:
+        """Changes with every assignment or ``touch``."""
+        return self._version
+
+
+class MCSBatchResult(BaseModel):
+    index: int
+    task: Optional[str] = None
+    output: Optional[str] = None
+    error: Optional[str] = None
+    duration: Optional[float] = None
+
+
+class StageResult(NamedTuple):
+    """Output of one pipeline stage and the agent that produced it."""
+
+    agent: Any
+    output: Any
+    stats: StageStats
 
 
 class MedicalCoderSwarm:
@@ -430,8 +294,8 @@ class MedicalCoderSwarm:
         self,
         name: str = "Medical-coding-diagnosis-swarm",
         description: str = "Comprehensive medical diagnosis and coding system",
-        agents: list = agents,
-        patient_id: str = "001",
+        agents: list = None,
+        patient_id: str = None,
         max_loops: int = 1,
         output_folder_path: str = "reports",
         patient_documentation: str = None,
@@ -442,12 +306,35 @@ class MedicalCoderSwarm:
         rag_on: bool = False,
         rag_url: str = None,
         rag_api_key: str = None,
+        batch_max_workers: int = 8,
+        agent_pool: AgentPool = None,
+        stage_cache: StageCache = None,
+        map_reduce: bool = False,
+        chunk_max_chars: int = 12000,
+        chunk_max_workers: int = 8,
+        stage_token_budgets: Dict[str, Optional[int]] = None,
+        patient_state: PatientStateStore = None,
+        candidate_extraction: bool = True,
+        lab_evaluation: bool = True,
+        lab_index: LabDiagnosisIndex = None,
+        icd10_index: Any = None,
+        pipeline: Pipeline = None,
+        fan_out: bool = False,
+        specialist_timeout: Optional[float] = 120.0,
+        max_retries: int = 0,
+        metrics: MetricsRegistry = None,
+        hooks: List[MCSHook] = None,
+        budget: RunBudget = None,
+        checkpoint_store: CheckpointStore = None,
+        batcher: MicroBatcher = None,
+        router: ModelRouter = None,
+        early_exit: EarlyExitPolicy = None,
         *args,
         **kwargs,
     ):
         self.name = name
         self.description = description
-        self.agents = agents
+        self.agents = agents or list(PIPELINE_ROLES)
         self.patient_id = patient_id
         self.max_loops = max_loops
         self.output_folder_path = output_folder_path
@@ -459,11 +346,46 @@ class MedicalCoderSwarm:
         self.rag_on = rag_on
         self.rag_url = rag_url
         self.rag_api_key = rag_api_key
+        self.batch_max_workers = batch_max_workers
+        self.agent_pool = agent_pool or default_agent_pool
+        self.stage_cache = stage_cache
+        self.map_reduce = map_reduce
+        self.chunk_max_chars = chunk_max_chars
+        self.chunk_max_workers = chunk_max_workers
+        self.patient_state = patient_state
+        self.candidate_extraction = candidate_extraction
+        self.lab_evaluation = lab_evaluation
+        self.lab_index = lab_index or default_lab_index()
+        self.icd10_index = (
+            icd10_index
+            if isinstance(icd10_index, ICD10Index)
+            else open_index(icd10_index)
+        )
+        self.fan_out = fan_out
+        self.max_retries = max_retries
+        self.metrics = metrics or metrics_registry
+        self.hooks = HookSet(hooks or [])
+        self.budget = budget
+        self.checkpoint_store = checkpoint_store
+        self.batcher = batcher
+        self.router = router
+        self.early_exit = early_exit
+        self.specialist_timeout = specialist_timeout
+        if pipeline is None and fan_out:
+            pipeline = specialist_pipeline(timeout=specialist_timeout)
+        self.pipeline = pipeline or DEFAULT_PIPELINE
+        self.stage_token_budgets = {
+            **DEFAULT_STAGE_BUDGETS,
+            **(stage_token_budgets or {}),
+        }
+        self._event_sink: Optional[
+            Callable[[MCSStreamEvent], None]
+        ] = None
         self.agent_outputs = []
-        self.patient_id = patient_id_uu()
+        self.patient_id = patient_id or patient_id_uu()
 
         self.output_file_path = (
-            f"medical_diagnosis_report_{patient_id}.md",
+            f"medical_diagnosis_report_{self.patient_id}.md",
         )
 
         # Initialize with production configuration
@@ -476,6 +398,20 @@ class MedicalCoderSwarm:
             ),
             auto_rotate=True,
         )
+        # Cached stage outputs and patient state hold patient text;
+        # stores handed in without their own handler are encrypted with
+        # the swarm's
+        if (
+            self.stage_cache is not None
+            and self.stage_cache.disk is not None
+            and self.stage_cache.disk.secure_handler is None
+        ):
+            self.stage_cache.disk.secure_handler = self.secure_handler
+        if (
+            self.patient_state is not None
+            and self.patient_state.secure_handler is None
+        ):
+            self.patient_state.secure_handler = self.secure_handler
 
         # Output schema
         self.output_schema = MCSOutput(
@@ -483,68 +419,1199 @@ class MedicalCoderSwarm:
         )
 
     def rag_query(self, query: str):
+        from mcs.rag_api import ChromaQueryClient
+
         client = ChromaQueryClient(
             api_key=self.rag_api_key, base_url=self.rag_url
         )
 
         return client.query(query)
 
-    def _run(
-        self, task: str = None, img: str = None, *args, **kwargs
-    ):
-        """ """
-        print("Running the medical coding and diagnosis system.")
+    def _pack(
+        self, stage: str, sections: List[ContextSection]
+    ) -> str:
+        """Pack prompt sections into the token budget of a stage."""
+        budget = self.stage_token_budgets.get(stage)
+        packed = ContextPacker(budget).pack(sections)
+        if packed.trimmed or packed.dropped:
+            print(
+                f"Packed {stage} input into {budget} tokens "
+                f"(trimmed: {packed.trimmed}, dropped: {packed.dropped})"
+            )
+        return packed.text
 
-        try:
-            log_agent_data(self.to_dict())
+    def _build_case_info(
+        self,
+        task: str = None,
+        documentation: str = None,
+        db_data: str = "",
+    ) -> str:
+        """
+        Assemble the case prompt handed to the first agent, trimmed to
+        the coder's token budget. The task and patient header are always
+        kept; the candidate shortlist and lab flags outrank
+        documentation, which outranks retrieved RAG context.
+        """
+        if documentation is None:
+            documentation = self.patient_documentation
+        case_text = f"{task or ''}\n{documentation or ''}"
+        candidates = lab_flags = ""
+        if self.candidate_extraction:
+            candidates = format_candidates(
+                extract_candidates(case_text)
+            )
+        if self.lab_evaluation:
+            lab_flags = self._lab_context(case_text)
+        return self._pack(
+            "medical_coder",
+            [
+                ContextSection("rag_context", str(db_data or "")),
+                ContextSection(
+                    "patient_header",
+                    f"Patient Information: {self.patient_id} \n Timestamp: {datetime.now()} \n ",
+                    required=True,
+                ),
+                ContextSection(
+                    "patient_documentation",
+                    f"Patient Documentation {documentation} \n ",
+                    priority=1,
+                ),
+                ContextSection(
+                    "icd10_candidates", candidates, priority=2
+                ),
+                ContextSection("lab_flags", lab_flags, priority=2),
+                ContextSection(
+                    "task", f"Task: {task} ", required=True
+                ),
+            ],
+        )
 
-            if self.rag_on is True:
-                db_data = self.rag_query(task)
+    def _evaluate_labs(self, text: str):
+        """Extract and flag the labs in ``text``; (labs, age, sex)."""
+        age, sex = parse_demographics(text)
+        return evaluate_labs(extract_labs(text), age, sex), age, sex
 
-            case_info = f"Patient Information: {self.patient_id} \n Timestamp: {datetime.now()} \n Patient Documentation {self.patient_documentation} \n Task: {task} "
+    def _lab_context(self, text: str) -> str:
+        """Abnormal labs and the diagnoses their ranges indicate."""
+        labs, age, sex = self._evaluate_labs(text)
+        supporting, _ = self.lab_index.query(labs, sex=sex, codes=())
+        return format_lab_flags(
+            labs, age=age, sex=sex
+        ) + format_lab_diagnoses(supporting)
 
-            if self.rag_on:
-                case_info = f"{db_data}{case_info}"
+    def _check_codes_against_labs(self, task: str) -> None:
+        """
+        Record which diagnoses the patient's labs support, and which of
+        the extracted codes they contradict.
+        """
+        if not self.lab_evaluation:
+            return
+        labs, _, sex = self._evaluate_labs(
+            f"{task or ''}\n{self.patient_documentation or ''}"
+        )
+        supporting, contradicting = self.lab_index.query(
+            labs,
+            sex=sex,
+            codes=[
+                code.code for code in self.output_schema.codes or []
+            ],
+        )
+        self.output_schema.lab_diagnoses = supporting + contradicting
+
+    def _handoff(self, stage: str, source: Any, output: Any) -> str:
+        """Prompt passing one agent's output to the next stage."""
+        return self._pack(
+            stage,
+            [
+                ContextSection(
+                    "source",
+                    f"From {source.agent_name} ",
+                    required=True,
+                ),
+                ContextSection("output", str(output)),
+            ],
+        )
+
+    def _uses_chunked_coding(self) -> bool:
+        """
+        Whether the coder stage runs over page-aware chunks: always when
+        per-patient state is kept, otherwise only for map-reduce runs
+        whose documentation does not fit in a single coder call.
+        """
+        if self.patient_state is not None:
+            return bool(self.patient_documentation)
+        documentation = self.patient_documentation or ""
+        return (
+            self.map_reduce
+            and len(documentation) > self.chunk_max_chars
+        )
 
-            medical_coder_output = medical_coder.run(case_info)
+    def _chunk_task(
+        self,
+        task: str,
+        chunk: DocumentChunk,
+        total: int,
+        db_data: str,
+    ) -> str:
+        """Coder prompt for one documentation chunk."""
+        documentation = (
+            f"(part {chunk.index + 1} of {total}, {chunk.page_range})\n"
+            f"{chunk.text}"
+        )
+        return (
+            f"{self._build_case_info(task, documentation, db_data)}\n"
+            "Code only what this part of the record documents and cite "
+            "the [Page N] marker supporting every code."
+        )
 
-            # Append output to schema
-            self.output_schema.agent_outputs.append(
-                MCSAgentOutputs(
-                    agent_name=medical_coder.agent_name,
-                    agent_output=medical_coder_output,
+    def _coder_pool(self, model_name: Optional[str]) -> AgentPool:
+        """Pool of coder agents for chunks, on ``model_name`` if set."""
+        if model_name is None:
+            return self.agent_pool.sub_pool(("medical_coder",))
+        return self.agent_pool.sub_pool(
+            ("medical_coder",), model_name=model_name
+        )
+
+    def _code_chunks(
+        self,
+        task: str,
+        chunks: List[DocumentChunk],
+        db_data: str = "",
+        model_name: Optional[str] = None,
+    ) -> List[Any]:
+        """
+        Map step: code every chunk in parallel, each on its own coder
+        agent. Returns the coder outputs in chunk order.
+        """
+        coder_pool = self._coder_pool(model_name)
+
+        def code(chunk: DocumentChunk) -> str:
+            current_chunk.set(chunk.index)
+            with coder_pool.lease() as agent_set:
+                return self._call_agent(
+                    agent_set["medical_coder"],
+                    self._chunk_task(
+                        task, chunk, len(chunks), db_data
+                    ),
+                )
+
+        # Worker threads do not inherit context variables; carry the
+        # stage's stats over so chunk calls are counted against it
+        contexts = [contextvars.copy_context() for _ in chunks]
+        with ThreadPoolExecutor(
+            max_workers=self.chunk_max_workers
+        ) as executor:
+            return list(
+                executor.map(
+                    lambda context, chunk: context.run(code, chunk),
+                    contexts,
+                    chunks,
                 )
             )
 
-            # Next agent
-            synthesizer_output = synthesizer.run(
-                f"From {medical_coder.agent_name} {medical_coder_output}"
+    async def _acode_chunks(
+        self,
+        task: str,
+        chunks: List[DocumentChunk],
+        db_data: str = "",
+        model_name: Optional[str] = None,
+    ) -> List[Any]:
+        """Async counterpart of ``_code_chunks``."""
+        coder_pool = self._coder_pool(model_name)
+        semaphore = asyncio.Semaphore(self.chunk_max_workers)
+
+        async def code(chunk: DocumentChunk) -> str:
+            current_chunk.set(chunk.index)
+            async with semaphore:
+                with coder_pool.lease() as agent_set:
+                    return await self._acall_agent(
+                        agent_set["medical_coder"],
+                        self._chunk_task(
+                            task, chunk, len(chunks), db_data
+                        ),
+                    )
+
+        return list(await asyncio.gather(*(code(c) for c in chunks)))
+
+    def _pending_pages(
+        self, task: str
+    ) -> Tuple[Optional[PatientState], List[Any], List[Page]]:
+        """
+        Split the documentation into pages already coded for this
+        patient and pages that still need the coder.
+        """
+        pages = split_pages(self.patient_documentation or "")
+        if self.patient_state is None:
+            return None, [], pages
+
+        state = self.patient_state.load(self.patient_id)
+        state.prune(pages)
+        reused, pending = state.partition(pages, task)
+        print(
+            f"Incremental coding for patient {self.patient_id}: "
+            f"{len(pages) - len(pending)} pages reused, "
+            f"{len(pending)} pages to code."
+        )
+        return state, reused, pending
+
+    def _merge_coded_pages(
+        self,
+        task: str,
+        state: Optional[PatientState],
+        reused: List[Any],
+        chunks: List[DocumentChunk],
+        outputs: List[Any],
+    ) -> str:
+        """Store newly coded chunks and reduce them with reused ones."""
+        if state is not None:
+            pages = split_pages(self.patient_documentation or "")
+            state.add(chunks, pages, task, outputs)
+            self.patient_state.save(state)
+            chunks = [coded.to_chunk() for coded in reused] + chunks
+            outputs = [coded.output for coded in reused] + outputs
+        return self._reduce_chunk_outputs(chunks, outputs)
+
+    def _code_documentation(
+        self,
+        agent: Any,
+        task: str,
+        db_data: str = "",
+        model_name: Optional[str] = None,
+    ) -> str:
+        """
+        Code the documentation chunk by chunk and merge the findings.
+        With ``patient_state`` set, only new or changed pages are sent
+        to the coder and stored results cover the rest. ``agent`` is
+        the stage's coder, whose stage events carry the merged output.
+        """
+        self._emit("stage_started", agent)
+        state, reused, pending = self._pending_pages(task)
+        chunks = chunk_pages(pending, max_chars=self.chunk_max_chars)
+        outputs = self._code_chunks(task, chunks, db_data, model_name)
+        output = self._merge_coded_pages(
+            task, state, reused, chunks, outputs
+        )
+        self._emit("token", agent, data=output)
+        self._emit("stage_finished", agent, output=output)
+        return output
+
+    async def _acode_documentation(
+        self,
+        agent: Any,
+        task: str,
+        db_data: str = "",
+        model_name: Optional[str] = None,
+    ) -> str:
+        """Async counterpart of ``_code_documentation``."""
+        self._emit("stage_started", agent)
+        state, reused, pending = await asyncio.to_thread(
+            self._pending_pages, task
+        )
+        chunks = chunk_pages(pending, max_chars=self.chunk_max_chars)
+        outputs = await self._acode_chunks(
+            task, chunks, db_data, model_name
+        )
+        output = await asyncio.to_thread(
+            self._merge_coded_pages,
+            task,
+            state,
+            reused,
+            chunks,
+            outputs,
+        )
+        self._emit("token", agent, data=output)
+        self._emit("stage_finished", agent, output=output)
+        return output
+
+    def _reduce_chunk_outputs(
+        self, chunks: List[DocumentChunk], outputs: List[Any]
+    ) -> str:
+        """Merge and deduplicate chunk findings, keeping page references."""
+        order = sorted(
+            range(len(chunks)), key=lambda i: chunks[i].first_page
+        )
+        findings = merge_findings(
+            finding
+            for i in order
+            for finding in extract_icd10_findings(
+                outputs[i], chunks[i]
+            )
+        )
+        return format_findings(findings)
+
+    def _record_output(
+        self, agent: Any, output: Any, stats: StageStats = None
+    ) -> None:
+        """Append an agent's output to the output schema."""
+        measured = stats.as_dict() if stats is not None else {}
+        self.output_schema.agent_outputs.append(
+            MCSAgentOutputs(
+                agent_name=agent.agent_name,
+                agent_output=output,
+                **measured,
+            )
+        )
+        self.output_schema.touch()
+
+    def _validate_codes(self) -> None:
+        """
+        Check every ICD-10 code extracted from the agents' answers (so
+        not the codes they only considered in their reasoning) against
+        the code index and record the result on the output schema.
+        Does nothing when no index is configured.
+        """
+        if self.icd10_index is None:
+            return
+        codes = list(
+            dict.fromkeys(
+                code.code for code in self.output_schema.codes or []
+            )
+        )
+        validations = []
+        for code in codes:
+            entry = self.icd10_index.lookup(code)
+            if entry is None:
+                validations.append(
+                    MCSCodeValidation(code=code, valid=False)
+                )
+                continue
+            validations.append(
+                MCSCodeValidation(
+                    code=code,
+                    valid=True,
+                    billable=entry.billable,
+                    description=entry.description,
+                    parent=entry.parent,
+                )
+            )
+        invalid = [v.code for v in validations if not v.valid]
+        if invalid:
+            print(
+                f"Codes not found in the ICD-10-CM index: {', '.join(invalid)}"
             )
-            self.output_schema.agent_outputs.append(
-                MCSAgentOutputs(
-                    agent_name=synthesizer.agent_name,
-                    agent_output=synthesizer_output,
+        self.output_schema.code_validations = validations
+
+    def _emit(self, event_type: str, agent: Any = None, **fields):
+        """
+        Send a stream event when a ``run_stream`` consumer is attached.
+        Events of chunk calls are sent as chunk events.
+        """
+        if self._event_sink is not None:
+            chunk = current_chunk.get()
+            if chunk is not None:
+                event_type = CHUNK_EVENT_TYPES.get(
+                    event_type, event_type
+                )
+                fields["chunk"] = chunk
+            self._event_sink(
+                MCSStreamEvent(
+                    type=event_type,
+                    agent_name=getattr(agent, "agent_name", None),
+                    **fields,
                 )
             )
 
-            # Next agent
-            treatment_agent_output = treatment_agent.run(
-                f"From {synthesizer.agent_name} {synthesizer_output}"
+    def _invoke_agent(self, agent: Any, task: str) -> Any:
+        """
+        Call an agent, forwarding its tokens as stream events when a
+        consumer is attached and the agent can stream. Other calls go
+        through ``self.batcher`` when one is set, to be sent to the
+        provider together with other runs' calls.
+        """
+        if self._event_sink is None:
+            if self.batcher is not None:
+                return self.batcher.call(agent, task)
+            return agent.run(task)
+
+        run_stream = getattr(agent, "run_stream", None)
+        if run_stream is None:
+            output = agent.run(task)
+            self._emit("token", agent, data=str(output))
+            return output
+
+        chunks = []
+        for chunk in run_stream(task):
+            chunks.append(chunk)
+            self._emit("token", agent, data=chunk)
+        return "".join(chunks)
+
+    async def _ainvoke_agent(self, agent: Any, task: str) -> Any:
+        """Async counterpart of ``_invoke_agent``."""
+        if self._event_sink is None:
+            if self.batcher is not None:
+                return await self.batcher.acall(agent, task)
+            return await run_agent_async(agent, task)
+
+        arun_stream = getattr(agent, "arun_stream", None)
+        if arun_stream is None:
+            output = await run_agent_async(agent, task)
+            self._emit("token", agent, data=str(output))
+            return output
+
+        chunks = []
+        async for chunk in arun_stream(task):
+            chunks.append(chunk)
+            self._emit("token", agent, data=chunk)
+        return "".join(chunks)
+
+    def _invoke_measured(self, agent: Any, task: str) -> Any:
+        """
+        Invoke an agent, retrying failed calls up to ``max_retries``
+        times, and count its tokens against the current stage.
+        """
+        stats = current_stage_stats.get()
+        for attempt in range(self.max_retries + 1):
+            try:
+                with agent_call(agent):
+                    output = self._invoke_agent(agent, task)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                print(
+                    f"Retrying {agent.agent_name} after an error: {e}"
+                )
+                if stats is not None:
+                    stats.add_retry()
+        if stats is not None:
+            stats.add_call(
+                estimate_tokens(task), estimate_tokens(str(output))
             )
-            self.output_schema.agent_outputs.append(
-                MCSAgentOutputs(
-                    agent_name=treatment_agent.agent_name,
-                    agent_output=treatment_agent_output,
+        return output
+
+    async def _ainvoke_measured(self, agent: Any, task: str) -> Any:
+        """Async counterpart of ``_invoke_measured``."""
+        stats = current_stage_stats.get()
+        for attempt in range(self.max_retries + 1):
+            try:
+                with agent_call(agent):
+                    output = await self._ainvoke_agent(agent, task)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                print(
+                    f"Retrying {agent.agent_name} after an error: {e}"
                 )
+                if stats is not None:
+                    stats.add_retry()
+        if stats is not None:
+            stats.add_call(
+                estimate_tokens(task), estimate_tokens(str(output))
+            )
+        return output
+
+    def _call_agent(self, agent: Any, task: str) -> Any:
+        """Run one agent, served from ``stage_cache`` when possible."""
+        self._emit("stage_started", agent)
+
+        if self.stage_cache is None:
+            output = self._invoke_measured(agent, task)
+        else:
+            key = stage_cache_key(task, agent)
+            output = self.stage_cache.get(key)
+            if output is not None:
+                self._emit("token", agent, data=str(output))
+            else:
+                output = self._invoke_measured(agent, task)
+                if output is not None:
+                    self.stage_cache.set(key, output)
+
+        self._emit("stage_finished", agent, output=str(output))
+        return output
+
+    async def _acall_agent(self, agent: Any, task: str) -> Any:
+        """Async counterpart of ``_call_agent``."""
+        self._emit("stage_started", agent)
+
+        if self.stage_cache is None:
+            output = await self._ainvoke_measured(agent, task)
+        else:
+            key = stage_cache_key(task, agent)
+            output = self.stage_cache.get(key)
+            if output is not None:
+                self._emit("token", agent, data=str(output))
+            else:
+                output = await self._ainvoke_measured(agent, task)
+                if output is not None:
+                    self.stage_cache.set(key, output)
+
+        self._emit("stage_finished", agent, output=str(output))
+        return output
+
+    def _fork(self) -> "MedicalCoderSwarm":
+        """
+        Return a shallow copy of the swarm with its own output schema.
+
+        The copy shares configuration and the secure handler but keeps
+        its agent outputs separate, so several cases can run at once.
+        """
+        fork = copy.copy(self)
+        fork._serialized = {}
+        fork.agent_outputs = []
+        fork._event_sink = None
+        fork.output_schema = MCSOutput(
+            patient_id=self.patient_id, agent_outputs=[], summary=""
+        )
+        return fork
+
+    def _adopt_output(self, fork: "MedicalCoderSwarm") -> None:
+        """Make the output of a run on ``fork`` the swarm's own."""
+        self.output_schema = fork.output_schema
+        self.agent_outputs = fork.agent_outputs
+
+    def _stage_enabled(self, stage: Stage) -> bool:
+        """Whether the swarm's configuration turns ``stage`` on."""
+        return stage.enabled_by is None or bool(
+            getattr(self, stage.enabled_by, False)
+        )
+
+    @contextmanager
+    def _lease_agents(self, pipeline: Pipeline) -> Iterator[Dict]:
+        """
+        Lease an agent set covering every role of ``pipeline``, topping
+        up the pool's set with roles it does not include.
+        """
+        with self.agent_pool.lease() as agent_set:
+            missing = tuple(
+                role
+                for role in pipeline.roles
+                if role not in agent_set
+            )
+            if not missing:
+                yield agent_set
+                return
+            with self.agent_pool.sub_pool(missing).lease() as extra:
+                yield {**agent_set, **extra}
+
+    def _stage_task(
+        self,
+        stage: Stage,
+        inputs: Dict[str, StageResult],
+        case_info: str,
+    ) -> str:
+        """
+        Prompt for a stage: the case for a root stage, otherwise the
+        outputs of the stages it depends on.
+        """
+        if not inputs:
+            return case_info
+        if len(inputs) == 1:
+            ((source, output, _),) = inputs.values()
+            return self._handoff(stage.name, source, output)
+        sections = []
+        for name, (source, output, _) in inputs.items():
+            sections.append(
+                ContextSection(
+                    f"{name}_source",
+                    f"From {source.agent_name} ",
+                    required=True,
+                )
+            )
+            sections.append(
+                ContextSection(f"{name}_output", str(output))
             )
+        return self._pack(stage.name, sections)
 
-            if self.summarization is True:
-                output = summarizer_agent.run(treatment_agent_output)
+    @staticmethod
+    def _stage_ready(
+        ready_at: Dict[str, float],
+    ) -> Callable[[Stage], None]:
+        """Scheduler callback noting when each stage's inputs are ready."""
+
+        def ready(stage: Stage) -> None:
+            ready_at[stage.name] = time.perf_counter()
+
+        return ready
+
+    def _route_stages(
+        self, task: str, pipeline: Pipeline
+    ) -> Dict[str, ModelRoute]:
+        """
+        With a router, score the case, pick the model of every stage
+        and record the choice on the output schema.
+        """
+        if self.router is None:
+            return {}
+        features = self.router.score(
+            f"{task or ''}\n{self.patient_documentation or ''}"
+        )
+        tier, reason = self.router.table.case_tier(features)
+        routes = self.router.plan(
+            features, [stage.name for stage in pipeline.order]
+        )
+        self.output_schema.routing = MCSRoutingReport(
+            tier=tier, reason=reason, features=features, stages=routes
+        )
+        return routes
+
+    def _check_early_exit(
+        self, stage: Stage, inputs: Dict[str, StageResult], task: str
+    ) -> None:
+        """
+        With an early-exit policy, check the coder's output before a
+        stage the policy may bypass, and raise ``BypassStage`` when the
+        coder is confident enough to go without it.
+        """
+        policy = self.early_exit
+        if policy is None or stage.name not in policy.stages:
+            return
+        source = inputs.get(policy.source)
+        if source is None:
+            return
+        check = policy.check(
+            source.output,
+            f"{task or ''}\n{self.patient_documentation or ''}",
+            self.icd10_index,
+        )
+        report = self.output_schema.early_exit
+        if report is None:
+            report = self.output_schema.early_exit = MCSEarlyExit(
+                **asdict(check)
+            )
+        if not check.confident:
+            return
+        report.skipped.append(stage.name)
+        self.output_schema.touch()
+        raise BypassStage(
+            f"{policy.source} is confident "
+            f"({check.self_reported:.2f}, agreement "
+            f"{check.agreement:.2f})"
+        )
+
+    @contextmanager
+    def _stage_agent(
+        self,
+        stage: Stage,
+        agents: Dict[str, Any],
+        budget: Optional[BudgetTracker],
+        route: Optional[ModelRoute] = None,
+    ) -> Iterator[Any]:
+        """
+        The agent to run ``stage`` with: one on the stage's fallback
+        model when the run's budget is running low, else one on the
+        model the router chose, else the leased one. Raises
+        ``SkipStage`` when the budget is spent.
+        """
+        leased = agents[stage.agent_role]
+        model = budget.plan(stage) if budget is not None else None
+        if model is not None:
+            print(
+                f"Running stage {stage.name} on {model} to save budget"
+            )
+        elif route is not None and route.model != getattr(
+            leased, "model_name", None
+        ):
+            model = route.model
+        else:
+            yield leased
+            return
+        pool = self.agent_pool.sub_pool(
+            (stage.agent_role,), model_name=model
+        )
+        with pool.lease() as fallback:
+            yield fallback[stage.agent_role]
+
+    @contextmanager
+    def _measure_stage(
+        self,
+        run: RunInfo,
+        stage: Stage,
+        ready_at: Dict[str, float],
+        budget: Optional[BudgetTracker] = None,
+        agent: Any = None,
+    ) -> Iterator[StageStats]:
+        """
+        Time a stage and make its stats current, so the agent calls it
+        makes add their tokens and retries. The stats are recorded in
+        ``self.metrics``, and charged to ``budget``, when the stage
+        ends, successful or not, unless the run finished without it.
+        """
+        start = time.perf_counter()
+        stats = StageStats(
+            queue_time=start - ready_at.get(stage.name, start)
+        )
+        token = current_stage_stats.set(stats)
+        try:
+            yield stats
+        finally:
+            current_stage_stats.reset(token)
+            stats.wall_time = time.perf_counter() - start
+            if not run.finished:
+                stats.observe(self.metrics, stage.name)
+                if budget is not None:
+                    budget.charge(
+                        getattr(agent, "model_name", None), stats
+                    )
+
+    def _stage_failed(
+        self, run: RunInfo
+    ) -> Callable[[Stage, BaseException], None]:
+        """
+        Scheduler callback reporting an optional stage the run
+        continues without.
+        """
+
+        def failed(stage: Stage, error: BaseException) -> None:
+            print(
+                f"Stage {stage.name} failed, continuing without it: {error}"
+            )
+            self._report_error(run, error, stage)
+
+        return failed
+
+    @staticmethod
+    def _stage_skipped(
+        budget: Optional[BudgetTracker],
+    ) -> Callable[[Stage, str], None]:
+        """
+        Scheduler callback noting a stage left out of the run. The
+        budget records the stages it skipped itself; stages skipped
+        because those were are added to its report here.
+        """
+
+        def skipped(stage: Stage, reason: str) -> None:
+            print(f"Stage {stage.name} skipped: {reason}")
+            if (
+                budget is not None
+                and stage.name not in budget.skipped
+                and any(d in budget.skipped for d in stage.depends_on)
+            ):
+                budget.skip(stage, reason)
+
+        return skipped
+
+    def _finish(
+        self,
+        pipeline: Pipeline,
+        results: Dict[str, StageResult],
+        task: str,
+        budget: Optional[BudgetTracker] = None,
+    ) -> str:
+        """
+        Store the stage outputs on the output schema in pipeline order,
+        extract and check their codes, and return the schema as JSON.
+        """
+        for stage in pipeline.order:
+            if stage.name not in results:
+                continue
+            agent, output, stats = results[stage.name]
+            if stage.target == "summary":
                 self.output_schema.summary = output
+            else:
+                self._record_output(agent, output, stats)
+
+        self.output_schema.codes = merge_codes(
+            [
+                (
+                    results[stage.name].agent.agent_name,
+                    results[stage.name].output,
+                )
+                for stage in pipeline.order
+                if stage.emits_codes and stage.name in results
+            ]
+        )
+        self._validate_codes()
+        self._check_codes_against_labs(task)
+        if budget is not None:
+            self.output_schema.budget = MCSBudgetReport(
+                tokens=budget.tokens,
+                dollars=budget.dollars,
+                wall_time=budget.seconds,
+                exhausted=budget.exhausted(),
+                skipped=budget.skipped,
+                downgraded=budget.downgraded,
+            )
+        return self.output_schema.model_dump_json(indent=4)
+
+    def _start_checkpoint(
+        self, run: RunInfo, resume: Optional[str]
+    ) -> Optional[RunCheckpoint]:
+        """
+        Give the run its id and, with a checkpoint store, the
+        checkpoint its completed stages are saved to: a new one, or the
+        stored one of the run being resumed. A run is only resumed for
+        the patient, documentation and task it was started for.
+        """
+        if resume is not None:
+            run.run_id = resume
+        self.output_schema.run_id = run.run_id
+        if self.checkpoint_store is None:
+            if resume is not None:
+                raise ValueError(
+                    "Resuming a run needs a checkpoint_store"
+                )
+            return None
+        checkpoint = None
+        if resume is not None:
+            checkpoint = self.checkpoint_store.load(resume)
+            if checkpoint is None:
+                print(
+                    f"No checkpoint for run {resume}, running it from the start"
+                )
+        case_hash = case_fingerprint(
+            self.patient_id, self.patient_documentation
+        )
+        if checkpoint is None:
+            return RunCheckpoint(
+                run_id=run.run_id,
+                task=run.task,
+                patient_id=self.patient_id,
+                case_hash=case_hash,
+            )
+        if checkpoint.case_hash != case_hash:
+            raise ValueError(
+                f"Run {resume} was started for a different patient "
+                "or documentation"
+            )
+        if run.task is None:
+            run.task = checkpoint.task
+        elif run.task != checkpoint.task:
+            raise ValueError(
+                f"Run {resume} was started for a different task"
+            )
+        return checkpoint
+
+    def _restore_stage(
+        self,
+        stage: Stage,
+        agents: Dict[str, Any],
+        checkpoint: Optional[RunCheckpoint],
+    ) -> Optional[StageResult]:
+        """
+        The result of ``stage`` from the checkpoint of the run being
+        resumed, None if the stage has to run.
+        """
+        if checkpoint is None or stage.name not in checkpoint.stages:
+            return None
+        saved = checkpoint.stages[stage.name]
+        return StageResult(
+            agents[stage.agent_role],
+            saved.output,
+            StageStats(**saved.stats),
+        )
+
+    def _save_stage(
+        self,
+        run: RunInfo,
+        checkpoint: Optional[RunCheckpoint],
+        stage: Stage,
+        result: StageResult,
+    ) -> None:
+        """
+        Checkpoint a completed stage so a resumed run skips it. A stage
+        that completes after the run finished is not saved: the run's
+        checkpoint may already be deleted.
+        """
+        if checkpoint is None:
+            return
+        with run.lock:
+            if not run.finished:
+                self._write_stage(checkpoint, stage, result)
+
+    def _write_stage(
+        self,
+        checkpoint: RunCheckpoint,
+        stage: Stage,
+        result: StageResult,
+    ) -> None:
+        agent, output, stats = result
+        try:
+            self.checkpoint_store.save_stage(
+                checkpoint,
+                stage.name,
+                StageCheckpoint(
+                    agent_name=getattr(agent, "agent_name", None),
+                    output=None if output is None else str(output),
+                    stats=stats.as_dict(),
+                ),
+            )
+        except OSError as e:
+            print(f"Could not checkpoint stage {stage.name}: {e}")
+
+    def _end_checkpoint(
+        self,
+        run: RunInfo,
+        checkpoint: Optional[RunCheckpoint],
+        ok: bool,
+    ) -> None:
+        """Drop a completed run's checkpoint; point at a failed one."""
+        if checkpoint is None:
+            return
+        if ok:
+            self.checkpoint_store.delete(run.run_id)
+        elif checkpoint.stages:
+            print(
+                f"Run {run.run_id} failed after {len(checkpoint.stages)} "
+                f"stages; resume it with run(resume={run.run_id!r})"
+            )
+
+    def add_hook(self, hook: MCSHook) -> None:
+        """Register a hook called at every run and stage boundary."""
+        self.hooks.add(hook)
+
+    def _report_error(
+        self, run: RunInfo, error: BaseException, stage: Stage = None
+    ) -> None:
+        """Send an error to the hooks' ``on_error``, once."""
+        if not self.hooks or any(e is error for e in run.errors):
+            return
+        run.errors.append(error)
+        self.hooks.fire("on_error", run, error, stage)
+
+    async def _areport_error(
+        self, run: RunInfo, error: BaseException, stage: Stage = None
+    ) -> None:
+        """Async counterpart of ``_report_error``."""
+        if not self.hooks or any(e is error for e in run.errors):
+            return
+        run.errors.append(error)
+        await self.hooks.afire("on_error", run, error, stage)
+
+    def _execute(
+        self,
+        task: str = None,
+        img: str = None,
+        *args,
+        resume: str = None,
+        **kwargs,
+    ) -> str:
+        """
+        Run the pipeline for one task and return the output schema as
+        JSON. Errors are raised to the caller.
+
+        Stages run as soon as the stages they depend on have finished,
+        so independent stages overlap. The agents come from
+        ``self.agent_pool``, so concurrent runs never share
+        conversation memory. With ``resume``, stages the run already
+        completed are taken from its checkpoint.
+        """
+        run = RunInfo(self, task)
+        checkpoint = self._start_checkpoint(run, resume)
+        self.hooks.fire("on_run_start", run)
+        try:
+            output = self._execute_pipeline(run, checkpoint)
+        except Exception as e:
+            self._report_error(run, e)
+            self.hooks.fire("on_run_end", run, None)
+            self._end_checkpoint(run, checkpoint, ok=False)
+            raise
+        self._end_checkpoint(run, checkpoint, ok=True)
+        self.hooks.fire("on_run_end", run, output)
+        return output
+
+    def _execute_pipeline(
+        self, run: RunInfo, checkpoint: Optional[RunCheckpoint] = None
+    ) -> str:
+        task = run.task
+        db_data = self.rag_query(task) if self.rag_on is True else ""
+
+        case_info = self._build_case_info(task, db_data=db_data)
+        pipeline = self.pipeline.active(self._stage_enabled)
+        routes = self._route_stages(task, pipeline)
+        ready_at: Dict[str, float] = {}
+        budget = (
+            BudgetTracker(self.budget)
+            if self.budget is not None
+            else None
+        )
+        with self._lease_agents(pipeline) as agents:
+
+            def execute(stage: Stage, inputs: Dict[str, StageResult]):
+                restored = self._restore_stage(
+                    stage, agents, checkpoint
+                )
+                if restored is not None:
+                    return restored
+                self._check_early_exit(stage, inputs, task)
+                route = routes.get(stage.name)
+                with self._stage_agent(
+                    stage, agents, budget, route
+                ) as agent:
+                    if not run.finished:
+                        self.hooks.fire("on_stage_start", run, stage)
+                    try:
+                        with self._measure_stage(
+                            run, stage, ready_at, budget, agent
+                        ) as stats:
+                            if (
+                                stage.chunked
+                                and self._uses_chunked_coding()
+                            ):
+                                output = self._code_documentation(
+                                    agent,
+                                    task,
+                                    db_data,
+                                    getattr(route, "model", None),
+                                )
+                            else:
+                                output = self._call_agent(
+                                    agent,
+                                    self._stage_task(
+                                        stage, inputs, case_info
+                                    ),
+                                )
+                    except Exception as e:
+                        if not run.finished:
+                            self._report_error(run, e, stage)
+                        raise
+                    result = StageResult(agent, output, stats)
+                    self._save_stage(run, checkpoint, stage, result)
+                    if not run.finished:
+                        self.hooks.fire(
+                            "on_stage_end", run, stage, result
+                        )
+                    return result
+
+            try:
+                results = run_pipeline(
+                    pipeline,
+                    execute,
+                    on_failure=self._stage_failed(run),
+                    on_ready=self._stage_ready(ready_at),
+                    on_skip=self._stage_skipped(budget),
+                )
+            finally:
+                run.finish()
+
+        return self._finish(pipeline, results, task, budget)
+
+    async def _aexecute(
+        self,
+        task: str = None,
+        img: str = None,
+        *args,
+        resume: str = None,
+        **kwargs,
+    ) -> str:
+        """
+        Async counterpart of ``_execute``. Every agent call is awaited,
+        so the event loop stays free while the swarm waits on the LLM.
+        """
+        run = RunInfo(self, task)
+        checkpoint = await asyncio.to_thread(
+            self._start_checkpoint, run, resume
+        )
+        await self.hooks.afire("on_run_start", run)
+        try:
+            output = await self._aexecute_pipeline(run, checkpoint)
+        except Exception as e:
+            await self._areport_error(run, e)
+            await self.hooks.afire("on_run_end", run, None)
+            self._end_checkpoint(run, checkpoint, ok=False)
+            raise
+        await asyncio.to_thread(
+            self._end_checkpoint, run, checkpoint, True
+        )
+        await self.hooks.afire("on_run_end", run, output)
+        return output
+
+    async def _aexecute_pipeline(
+        self, run: RunInfo, checkpoint: Optional[RunCheckpoint] = None
+    ) -> str:
+        task = run.task
+        db_data = (
+            await asyncio.to_thread(self.rag_query, task)
+            if self.rag_on is True
+            else ""
+        )
+
+        case_info = self._build_case_info(task, db_data=db_data)
+        pipeline = self.pipeline.active(self._stage_enabled)
+        routes = self._route_stages(task, pipeline)
+        ready_at: Dict[str, float] = {}
+        budget = (
+            BudgetTracker(self.budget)
+            if self.budget is not None
+            else None
+        )
+        with self._lease_agents(pipeline) as agents:
+
+            async def execute(
+                stage: Stage, inputs: Dict[str, StageResult]
+            ):
+                restored = self._restore_stage(
+                    stage, agents, checkpoint
+                )
+                if restored is not None:
+                    return restored
+                self._check_early_exit(stage, inputs, task)
+                route = routes.get(stage.name)
+                with self._stage_agent(
+                    stage, agents, budget, route
+                ) as agent:
+                    if not run.finished:
+                        await self.hooks.afire(
+                            "on_stage_start", run, stage
+                        )
+                    try:
+                        with self._measure_stage(
+                            run, stage, ready_at, budget, agent
+                        ) as stats:
+                            if (
+                                stage.chunked
+                                and self._uses_chunked_coding()
+                            ):
+                                output = (
+                                    await self._acode_documentation(
+                                        agent,
+                                        task,
+                                        db_data,
+                                        getattr(route, "model", None),
+                                    )
+                                )
+                            else:
+                                output = await self._acall_agent(
+                                    agent,
+                                    self._stage_task(
+                                        stage, inputs, case_info
+                                    ),
+                                )
+                    except Exception as e:
+                        if not run.finished:
+                            await self._areport_error(run, e, stage)
+                        raise
+                    result = StageResult(agent, output, stats)
+                    await asyncio.to_thread(
+                        self._save_stage,
+                        run,
+                        checkpoint,
+                        stage,
+                        result,
+                    )
+                    if not run.finished:
+                        await self.hooks.afire(
+                            "on_stage_end", run, stage, result
+                        )
+                    return result
+
+            try:
+                results = await arun_pipeline(
+                    pipeline,
+                    execute,
+                    on_failure=self._stage_failed(run),
+                    on_ready=self._stage_ready(ready_at),
+                    on_skip=self._stage_skipped(budget),
+                )
+            finally:
+                run.finish()
+
+        return self._finish(pipeline, results, task, budget)
+
+    def _run(
+        self, task: str = None, img: str = None, *args, **kwargs
+    ):
+        """ """
+        print("Running the medical coding and diagnosis system.")
+
+        try:
+            log_agent_data(self.to_dict())
+
+            output = self._execute(task, img, *args, **kwargs)
 
             log_agent_data(self.to_dict())
 
-            return self.output_schema.model_dump_json(indent=4)
+            return output
 
         except Exception as e:
             log_agent_data(self.to_dict())
@@ -552,15 +1619,159 @@ class MedicalCoderSwarm:
                 f"An error occurred during the diagnosis process: {e}"
             )
 
-    def run(self, task: str = None, img: str = None, *args, **kwargs):
+    def run(
+        self,
+        task: str = None,
+        img: str = None,
+        *args,
+        resume: str = None,
+        **kwargs,
+    ):
+        """
+        Run the medical coding and diagnosis system.
+
+        Args:
+            task (str): The patient case.
+            resume (str): Id of a failed run to resume (needs a
+                ``checkpoint_store``); its completed stages are not run
+                again. ``task`` may be omitted to reuse the run's task.
+        """
         try:
-            return self._run(task, img, *args, **kwargs)
+            return self._run(
+                task, img, *args, resume=resume, **kwargs
+            )
         except Exception as e:
             log_agent_data(self.to_dict())
             print(
                 f"An error occurred during the diagnosis process: {e}"
             )
 
+    async def _arun(
+        self, task: str = None, img: str = None, *args, **kwargs
+    ):
+        """Async counterpart of ``_run``."""
+        print("Running the medical coding and diagnosis system.")
+
+        try:
+            log_agent_data(self.to_dict())
+
+            output = await self._aexecute(task, img, *args, **kwargs)
+
+            log_agent_data(self.to_dict())
+
+            return output
+
+        except Exception as e:
+            log_agent_data(self.to_dict())
+            print(
+                f"An error occurred during the diagnosis process: {e}"
+            )
+
+    async def arun(
+        self,
+        task: str = None,
+        img: str = None,
+        *args,
+        resume: str = None,
+        **kwargs,
+    ):
+        """
+        Run the medical coding and diagnosis system without blocking
+        the event loop. ``resume`` works as in ``run``.
+        """
+        try:
+            return await self._arun(
+                task, img, *args, resume=resume, **kwargs
+            )
+        except Exception as e:
+            log_agent_data(self.to_dict())
+            print(
+                f"An error occurred during the diagnosis process: {e}"
+            )
+
+    def run_stream(
+        self, task: str = None, img: str = None, *args, **kwargs
+    ) -> Iterator[MCSStreamEvent]:
+        """
+        Run the swarm and yield events as it progresses.
+
+        Yields ``stage_started``, ``token`` and ``stage_finished`` events
+        for every agent, then a ``run_finished`` event carrying the full
+        output JSON, or an ``error`` event if the run failed. The token
+        chunks of a stage concatenate to its output.
+
+        The run executes on a fork of the swarm, so concurrent streams
+        and runs on the same swarm never see each other's events; its
+        output schema becomes the swarm's when the run finishes.
+        """
+        events: "queue.Queue" = queue.Queue()
+        done = object()
+        fork = self._fork()
+        fork._event_sink = events.put
+
+        def worker():
+            try:
+                output = fork._execute(task, img, *args, **kwargs)
+                self._adopt_output(fork)
+                events.put(
+                    MCSStreamEvent(type="run_finished", output=output)
+                )
+            except Exception as e:
+                print(
+                    f"An error occurred during the diagnosis process: {e}"
+                )
+                events.put(MCSStreamEvent(type="error", data=str(e)))
+            finally:
+                events.put(done)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+        while True:
+            event = events.get()
+            if event is done:
+                break
+            yield event
+
+    async def arun_stream(
+        self, task: str = None, img: str = None, *args, **kwargs
+    ) -> AsyncIterator[MCSStreamEvent]:
+        """Async counterpart of ``run_stream``."""
+        events: asyncio.Queue = asyncio.Queue()
+        done = object()
+        fork = self._fork()
+        fork._event_sink = events.put_nowait
+
+        async def produce():
+            try:
+                output = await fork._aexecute(
+                    task, img, *args, **kwargs
+                )
+                self._adopt_output(fork)
+                events.put_nowait(
+                    MCSStreamEvent(type="run_finished", output=output)
+                )
+            except Exception as e:
+                print(
+                    f"An error occurred during the diagnosis process: {e}"
+                )
+                events.put_nowait(
+                    MCSStreamEvent(type="error", data=str(e))
+                )
+            finally:
+                events.put_nowait(done)
+
+        runner = asyncio.create_task(produce())
+
+        try:
+            while True:
+                event = await events.get()
+                if event is done:
+                    break
+                yield event
+        finally:
+            if not runner.done():
+                runner.cancel()
+
     def secure_run(
         self, task: str = None, img: str = None, *args, **kwargs
     ):
@@ -630,36 +1841,140 @@ class MedicalCoderSwarm:
             print(f"An error occurred during the secure run: {e}")
             return "An error occurred during the diagnosis process. Please check the logs for more information."
 
+    def _run_batch_case(
+        self, index: int, task: str, img: str = None, *args, **kwargs
+    ) -> MCSBatchResult:
+        """Run one case of a batch on its own fork of the swarm."""
+        start = time.perf_counter()
+        try:
+            output = self._fork()._execute(task, img, *args, **kwargs)
+            return MCSBatchResult(
+                index=index,
+                task=task,
+                output=output,
+                duration=time.perf_counter() - start,
+            )
+        except Exception as e:
+            print(
+                f"An error occurred while processing case {index}: {e}"
+            )
+            return MCSBatchResult(
+                index=index,
+                task=task,
+                error=f"{type(e).__name__}: {e}",
+                duration=time.perf_counter() - start,
+            )
+
+    async def _arun_batch_case(
+        self,
+        semaphore: asyncio.Semaphore,
+        index: int,
+        task: str,
+        img: str = None,
+        *args,
+        **kwargs,
+    ) -> MCSBatchResult:
+        """Async counterpart of ``_run_batch_case``."""
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                output = await self._fork()._aexecute(
+                    task, img, *args, **kwargs
+                )
+                return MCSBatchResult(
+                    index=index,
+                    task=task,
+                    output=output,
+                    duration=time.perf_counter() - start,
+                )
+            except Exception as e:
+                print(
+                    f"An error occurred while processing case {index}: {e}"
+                )
+                return MCSBatchResult(
+                    index=index,
+                    task=task,
+                    error=f"{type(e).__name__}: {e}",
+                    duration=time.perf_counter() - start,
+                )
+
     def batched_run(
         self,
         tasks: List[str] = None,
         imgs: List[str] = None,
         *args,
+        max_workers: int = None,
         **kwargs,
-    ):
+    ) -> List[MCSBatchResult]:
         """
         Run the medical coding and diagnosis system for multiple tasks.
+
+        Cases run concurrently on a thread pool, each on its own fork of
+        the swarm. A failing case is recorded on its result and does not
+        abort the rest of the batch.
+
+        Args:
+            tasks (List[str]): The case descriptions to process.
+            imgs (List[str]): Optional images, one per task.
+            max_workers (int): Number of cases in flight at once.
+                Defaults to ``self.batch_max_workers``.
+
+        Returns:
+            List[MCSBatchResult]: One result per task, in input order.
         """
-        # logger.add(
-        #     "medical_coding_diagnosis_system.log", rotation="10 MB"
-        # )
+        tasks = tasks or []
+        imgs = imgs or [None] * len(tasks)
+        max_workers = max_workers or self.batch_max_workers
 
-        try:
-            print(
-                "Running the medical coding and diagnosis system for multiple tasks."
-            )
-            outputs = []
-            for task, img in zip(tasks, imgs):
-                case_info = f"Patient Information: {self.patient_id} \n Timestamp: {datetime.now()} \n Patient Documentation {self.patient_documentation} \n Task: {task}"
-                output = self.run(case_info, img, *args, **kwargs)
-                outputs.append(output)
+        print(
+            "Running the medical coding and diagnosis system for multiple tasks."
+        )
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    self._run_batch_case,
+                    index,
+                    task,
+                    img,
+                    *args,
+                    **kwargs,
+                )
+                for index, (task, img) in enumerate(zip(tasks, imgs))
+            ]
+            return [future.result() for future in futures]
 
-            return outputs
-        except Exception as e:
-            print(
-                f"An error occurred during the diagnosis process: {e}"
+    async def abatched_run(
+        self,
+        tasks: List[str] = None,
+        imgs: List[str] = None,
+        *args,
+        max_workers: int = None,
+        **kwargs,
+    ) -> List[MCSBatchResult]:
+        """
+        Run the medical coding and diagnosis system for multiple tasks
+        concurrently on the event loop.
+
+        Behaves like ``batched_run``, with ``max_workers`` bounding the
+        number of cases awaiting the agents at once.
+        """
+        tasks = tasks or []
+        imgs = imgs or [None] * len(tasks)
+        semaphore = asyncio.Semaphore(
+            max_workers or self.batch_max_workers
+        )
+
+        print(
+            "Running the medical coding and diagnosis system for multiple tasks."
+        )
+        return await asyncio.gather(
+            *(
+                self._arun_batch_case(
+                    semaphore, index, task, img, *args, **kwargs
+                )
+                for index, (task, img) in enumerate(zip(tasks, imgs))
             )
-            return "An error occurred during the diagnosis process. Please check the logs for more information."
+        )
 
     def _serialize_callable(
         self, attr_value: Callable
@@ -680,7 +1995,16 @@ class MedicalCoderSwarm:
             "doc": getattr(attr_value, "__doc__", None),
         }
 
-    def _serialize_attr(self, attr_name: str, attr_value: Any) -> Any:
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        # Assigning an attribute marks its serialized form dirty
+        serialized = self.__dict__.get("_serialized")
+        if serialized is not None:
+            serialized.pop(name, None)
+
+    def _serialize_attr(
+        self, attr_name: str, attr_value: Any
+    ) -> Tuple[Any, bool]:
         """
         Serializes an individual attribute, handling non-serializable objects.
 
@@ -689,35 +2013,88 @@ class MedicalCoderSwarm:
             attr_value (Any): The value of the attribute.
 
         Returns:
-            Any: The serialized value of the attribute.
+            Tuple[Any, bool]: The serialized value of the attribute, and
+            whether it stays valid until the attribute is reassigned.
+            Containers and models can change in place, so they are
+            serialized again on every call; the output schema is the
+            exception, as it tracks its own changes (see ``to_dict``).
         """
         try:
+            if isinstance(attr_value, MCSOutput):
+                return attr_value.model_dump(mode="json"), True
             if callable(attr_value):
-                return self._serialize_callable(attr_value)
+                return self._serialize_callable(attr_value), True
             elif hasattr(attr_value, "to_dict"):
                 return (
-                    attr_value.to_dict()
+                    attr_value.to_dict(),
+                    False,
                 )  # Recursive serialization for nested objects
-            else:
-                json.dumps(
-                    attr_value
-                )  # Attempt to serialize to catch non-serializable objects
-                return attr_value
+            elif isinstance(attr_value, BaseModel):
+                return attr_value.model_dump(mode="json"), False
+            elif is_json_native(attr_value):
+                return attr_value, not isinstance(
+                    attr_value, (list, tuple, dict)
+                )
         except (TypeError, ValueError):
-            return f"<Non-serializable: {type(attr_value).__name__}>"
+            pass
+        return (
+            f"<Non-serializable: {type(attr_value).__name__}>",
+            True,
+        )
 
     def to_dict(self) -> Dict[str, Any]:
         """
         Converts all attributes of the class, including callables, into a dictionary.
         Handles non-serializable attributes by converting them or skipping them.
 
+        Serialized attributes are cached until they are reassigned, so
+        repeated calls during a run only redo the mutable ones. The
+        output schema is cached until its ``version`` changes. Cached
+        dicts are kept as JSON text and decoded on every call, so the
+        returned dict is the caller's to change.
+
         Returns:
             Dict[str, Any]: A dictionary representation of the class attributes.
         """
-        return {
-            attr_name: self._serialize_attr(attr_name, attr_value)
-            for attr_name, attr_value in self.__dict__.items()
-        }
+        serialized = self.__dict__.get("_serialized")
+        if serialized is None:
+            serialized = self.__dict__["_serialized"] = {}
+
+        result = {}
+        for attr_name, attr_value in self.__dict__.items():
+            if attr_name == "_serialized":
+                continue
+            version = (
+                attr_value.version
+                if isinstance(attr_value, MCSOutput)
+                else None
+            )
+            cached = serialized.get(attr_name)
+            if cached is not None and cached[0] == version:
+                _, value, encoded = cached
+                result[attr_name] = (
+                    json.loads(value) if encoded else value
+                )
+                continue
+            value, cacheable = self._serialize_attr(
+                attr_name, attr_value
+            )
+            if cacheable:
+                encoded = isinstance(value, dict)
+                serialized[attr_name] = (
+                    version,
+                    dumps(value) if encoded else value,
+                    encoded,
+                )
+            result[attr_name] = value
+        return result
+
+    def to_json(self) -> str:
+        """
+        ``to_dict`` encoded as JSON, through orjson when it is
+        installed.
+        """
+        return dumps(self.to_dict())
 
     @secure_data(encrypt=True)
     def save_patient_data(self, patient_id: str, case_data: str):
@@ -0,0 +1,274 @@
+import bisect
+import threading
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Seconds; covers cached stages through slow reasoning models
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    20.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+    600.0,
+)
+
+TOKEN_BUCKETS: Tuple[float, ...] = tuple(
+    float(2**exponent) for exponent in range(5, 18)
+)
+
+COUNT_BUCKETS: Tuple[float, ...] = (0, 1, 2, 3, 5, 10)
+
+
+class Histogram:
+    """
+    Thread-safe cumulative histogram with fixed bucket bounds.
+
+    Quantiles are estimated by linear interpolation inside the bucket
+    holding the requested rank, as Prometheus' ``histogram_quantile``
+    does.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated ``q``-quantile, None before any observation."""
+        with self._lock:
+            counts, total = list(self._counts), self.count
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if seen + count >= rank and count:
+                if index == len(self.buckets):
+                    # Overflow bucket: the best bound known
+                    return self.buckets[-1]
+                low = self.buckets[index - 1] if index else 0.0
+                high = self.buckets[index]
+                return low + (high - low) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def snapshot(self) -> Dict:
+        """Count, sum, cumulative buckets and p50/p95/p99."""
+        with self._lock:
+            counts, total, value_sum = (
+                list(self._counts),
+                self.count,
+                self.sum,
+            )
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets, counts):
+            running += count
+            cumulative[f"{bound:g}"] = running
+        cumulative["+Inf"] = total
+        return {
+            "count": total,
+            "sum": value_sum,
+            "buckets": cumulative,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class MetricsRegistry:
+    """
+    In-process registry of labelled histograms.
+
+    Usage:
+        >>> registry = MetricsRegistry()
+        >>> registry.observe("mcs_stage_wall_seconds", 1.2, stage="synthesizer")
+        >>> registry.snapshot()["mcs_stage_wall_seconds"]
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[
+            str, Dict[Tuple[Tuple[str, str], ...], Histogram]
+        ] = {}
+        self._buckets: Dict[str, Sequence[float]] = {}
+
+    def histogram(
+        self,
+        name: str,
+        buckets: Optional[Sequence[float]] = None,
+        **labels: str,
+    ) -> Histogram:
+        """The histogram for ``name`` and ``labels``, created on first use."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                bounds = self._buckets.setdefault(
+                    name, buckets or LATENCY_BUCKETS
+                )
+                histogram = series[key] = Histogram(bounds)
+            return histogram
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        buckets: Optional[Sequence[float]] = None,
+        **labels: str,
+    ) -> None:
+        self.histogram(name, buckets, **labels).observe(value)
+
+    def snapshot(self) -> Dict[str, List[Dict]]:
+        """Every series as JSON-ready dicts, grouped by metric name."""
+        with self._lock:
+            series = {
+                name: list(by_labels.items())
+                for name, by_labels in self._histograms.items()
+            }
+        return {
+            name: [
+                {"labels": dict(key), **histogram.snapshot()}
+                for key, histogram in items
+            ]
+            for name, items in series.items()
+        }
+
+    def to_prometheus(self) -> str:
+        """Render every histogram in the Prometheus text format."""
+        lines = []
+        for name, items in self.snapshot().items():
+            lines.append(f"# TYPE {name} histogram")
+            for item in items:
+                labels = item["labels"]
+                for bound, count in item["buckets"].items():
+                    lines.append(
+                        f"{name}_bucket"
+                        f"{_labels({**labels, 'le': bound})} {count}"
+                    )
+                lines.append(
+                    f"{name}_sum{_labels(labels)} {item['sum']}"
+                )
+                lines.append(
+                    f"{name}_count{_labels(labels)} {item['count']}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{key}="{str(value)}"'
+        for key, value in sorted(labels.items())
+    )
+    return "{" + pairs + "}"
+
+
+@dataclass
+class StageStats:
+    """
+    Measurements of one pipeline stage, accumulated over every agent
+    call it makes (one, or one per chunk for the chunked coder).
+
+    Attributes:
+        wall_time (float): Seconds from the stage starting to its
+            output being ready.
+        queue_time (float): Seconds the stage waited after its inputs
+            were ready before it started.
+        prompt_tokens (int): Estimated tokens sent to the agents.
+        completion_tokens (int): Estimated tokens they returned.
+        retries (int): Agent calls repeated after an error.
+    """
+
+    wall_time: float = 0.0
+    queue_time: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    retries: int = 0
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def as_dict(self) -> Dict[str, float]:
+        """The measurements, without the lock."""
+        return dict(
+            wall_time=self.wall_time,
+            queue_time=self.queue_time,
+            prompt_tokens=self.prompt_tokens,
+            completion_tokens=self.completion_tokens,
+            retries=self.retries,
+        )
+
+    def add_call(self, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    def add_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def observe(self, registry: MetricsRegistry, stage: str) -> None:
+        """Record the stage in ``registry``."""
+        registry.observe(
+            "mcs_stage_wall_seconds", self.wall_time, stage=stage
+        )
+        registry.observe(
+            "mcs_stage_queue_seconds", self.queue_time, stage=stage
+        )
+        registry.observe(
+            "mcs_stage_prompt_tokens",
+            self.prompt_tokens,
+            TOKEN_BUCKETS,
+            stage=stage,
+        )
+        registry.observe(
+            "mcs_stage_completion_tokens",
+            self.completion_tokens,
+            TOKEN_BUCKETS,
+            stage=stage,
+        )
+        registry.observe(
+            "mcs_stage_retries",
+            self.retries,
+            COUNT_BUCKETS,
+            stage=stage,
+        )
+
+
+# Stats of the stage running in the current thread or task, so nested
+# agent calls (e.g. per-chunk coder calls) are attributed to it.
+current_stage_stats: ContextVar[Optional[StageStats]] = ContextVar(
+    "current_stage_stats", default=None
+)
+
+# Registry shared by every MedicalCoderSwarm in the process unless one
+# is passed explicitly; the API apps expose it.
+metrics_registry = MetricsRegistry()
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from cryptography.fernet import InvalidToken
+
+from mcs.chunking import DocumentChunk, Page
+from mcs.security import DecryptionError, IntegrityError
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def page_fingerprint(page: Page) -> str:
+    """
+    Hash of a page's document, number and whitespace-normalized text.
+    """
+    text = _WHITESPACE.sub(" ", page.text).strip()
+    return hashlib.sha256(
+        f"{page.document}:{page.number}\n{text}".encode()
+    ).hexdigest()
+
+
+def task_fingerprint(task: Any) -> str:
+    """Hash of the normalized task the pages were coded for."""
+    text = _WHITESPACE.sub(" ", str(task or "")).strip()
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+@dataclass
+class CodedChunk:
+    """A chunk of pages that has been through the coder, and its output."""
+
+    first_page: int
+    last_page: int
+    page_hashes: List[str]
+    task_hash: str
+    output: str
+    coded_at: str = field(
+        default_factory=lambda: datetime.now().isoformat()
+    )
+
+    @property
+    def key(self) -> Tuple[str, ...]:
+        """What the chunk was coded from: its task and pages."""
+        return (self.task_hash, *self.page_hashes)
+
+    def to_chunk(self, index: int = 0) -> DocumentChunk:
+        return DocumentChunk(
+            index=index,
+            first_page=self.first_page,
+            last_page=self.last_page,
+            text="",
+        )
+
+
+@dataclass
+class PatientState:
+    """
+    Everything already coded for one patient.
+
+    ``loaded`` holds the keys of the chunks the state was loaded with,
+    so a save can tell chunks it pruned from chunks another run added
+    since.
+    """
+
+    patient_id: str
+    chunks: List[CodedChunk] = field(default_factory=list)
+    updated_at: Optional[str] = None
+    loaded: Set[Tuple[str, ...]] = field(
+        default_factory=set, repr=False, compare=False
+    )
+
+    def partition(
+        self, pages: List[Page], task: Any
+    ) -> Tuple[List[CodedChunk], List[Page]]:
+        """
+        Split the current pages into stored chunks that can be reused
+        as-is and pages that still need coding.
+
+        A stored chunk is reused only when every page it covered is still
+        present and unchanged and it was coded for the same task. All
+        other pages, new or changed, are returned for coding.
+        """
+        current = {page_fingerprint(page) for page in pages}
+        task_hash = task_fingerprint(task)
+
+        reused = [
+            chunk
+            for chunk in self.chunks
+            if chunk.task_hash == task_hash
+            and chunk.page_hashes
+            and all(h in current for h in chunk.page_hashes)
+        ]
+        covered = {h for chunk in reused for h in chunk.page_hashes}
+        pending = [
+            page
+            for page in pages
+            if page_fingerprint(page) not in covered
+        ]
+        return reused, pending
+
+    def add(
+        self,
+        chunks: List[DocumentChunk],
+        pages: List[Page],
+        task: Any,
+        outputs: List[Any],
+    ) -> List[CodedChunk]:
+        """Record newly coded chunks and return them."""
+        hashes = {
+            (page.document, page.number): page_fingerprint(page)
+            for page in pages
+        }
+        task_hash = task_fingerprint(task)
+        coded = [
+            CodedChunk(
+                first_page=chunk.first_page,
+                last_page=chunk.last_page,
+                page_hashes=[
+                    hashes[key]
+                    for key in chunk.page_keys
+                    if key in hashes
+                ],
+                task_hash=task_hash,
+                output=str(output),
+            )
+            for chunk, output in zip(chunks, outputs)
+            if output is not None
+        ]
+        self.chunks.extend(coded)
+        self.updated_at = datetime.now().isoformat()
+        return coded
+
+    def prune(self, pages: List[Page]) -> None:
+        """Forget chunks covering pages that are no longer in the record."""
+        current = {page_fingerprint(page) for page in pages}
+        self.chunks = [
+            chunk
+            for chunk in self.chunks
+            if all(h in current for h in chunk.page_hashes)
+        ]
+
+
+class PatientStateStore:
+    """
+    Directory of per-patient JSON state files.
+
+    Usage:
+        >>> store = PatientStateStore(".mcs_patient_state")
+        >>> swarm = MedicalCoderSwarm(patient_id="P-1", patient_state=store)
+    """
+
+    def __init__(
+        self,
+        directory: str = ".mcs_patient_state",
+        secure_handler: Any = None,
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            directory (str): Where state files are kept.
+            secure_handler (Any): Optional SecureDataHandler that
+                encrypts state files at rest. A MedicalCoderSwarm given
+                a store without one sets its own.
+        """
+        self.directory = directory
+        self.secure_handler = secure_handler
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, patient_id: str) -> str:
+        name = hashlib.sha256(str(patient_id).encode()).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def load(self, patient_id: str) -> PatientState:
+        """Load a patient's state, or an empty state for a new patient."""
+        state = self._read(patient_id)
+        state.loaded = {chunk.key for chunk in state.chunks}
+        return state
+
+    def _read(self, patient_id: str) -> PatientState:
+        try:
+            with open(self._path(patient_id)) as file:
+                data: Dict[str, Any] = json.load(file)
+            if self.secure_handler is not None:
+                data = self.secure_handler.decrypt_data(
+                    data["encrypted"]
+                )
+        except (
+            FileNotFoundError,
+            ValueError,
+            KeyError,
+            DecryptionError,
+            IntegrityError,
+            InvalidToken,
+        ):
+            # Like a cache miss: state written with another key or
+            # without encryption is coded again
+            return PatientState(patient_id=patient_id)
+        return PatientState(
+            patient_id=data["patient_id"],
+            chunks=[CodedChunk(**chunk) for chunk in data["chunks"]],
+            updated_at=data.get("updated_at"),
+        )
+
+    def save(self, state: PatientState) -> None:
+        """
+        Atomically write a patient's state.
+
+        Runs for the same patient load, code and save concurrently.
+        Under the store's lock the stored state is read again and the
+        chunks other runs added since ``state`` was loaded are kept, so
+        the last save does not discard them.
+        """
+        path = self._path(state.patient_id)
+        with self._lock:
+            seen = state.loaded | {
+                chunk.key for chunk in state.chunks
+            }
+            for chunk in self._read(state.patient_id).chunks:
+                if chunk.key not in seen:
+                    state.chunks.append(chunk)
+                    seen.add(chunk.key)
+            state.loaded = {chunk.key for chunk in state.chunks}
+
+            data: Dict[str, Any] = {
+                "patient_id": state.patient_id,
+                "chunks": [asdict(chunk) for chunk in state.chunks],
+                "updated_at": state.updated_at,
+            }
+            if self.secure_handler is not None:
+                data = {
+                    "encrypted": self.secure_handler.encrypt_data(
+                        data
+                    )
+                }
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(fd, "w") as file:
+                json.dump(data, file)
+            os.replace(tmp_path, path)
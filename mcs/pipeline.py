@@ -0,0 +1,478 @@
+import asyncio
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass, replace
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+
+class SkipStage(Exception):
+    """
+    Raised by a stage to leave it out of the run without failing it,
+    e.g. when the run's budget is spent. Stages whose inputs were all
+    skipped are skipped too.
+    """
+
+
+class BypassStage(SkipStage):
+    """
+    Raised by a stage to leave it out of the run and hand its own
+    inputs to its dependents in its place, e.g. when the coder is
+    confident enough that the synthesizer pass adds nothing.
+    """
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One agent call of the swarm pipeline.
+
+    Attributes:
+        name (str): Unique stage name; other stages refer to it in
+            ``depends_on``.
+        role (Optional[str]): Agent role to run (see
+            ``mcs.agents.AGENT_CONFIGS``). Defaults to ``name``.
+        depends_on (Tuple[str, ...]): Stages whose outputs this stage
+            reads. A stage with no dependencies receives the case
+            prompt; otherwise it receives its dependencies' outputs.
+        enabled_by (Optional[str]): Name of a swarm attribute that must
+            be truthy for the stage to run, e.g. ``summarization``.
+        target (str): Where the output is stored on the output schema:
+            ``agent_outputs`` or ``summary``.
+        chunked (bool): Code the documentation chunk by chunk when the
+            swarm is configured for it (the coder stage).
+        emits_codes (bool): The stage's ICD-10 codes are merged into
+            ``codes`` on the output schema.
+        timeout (Optional[float]): Seconds the stage may run before it
+            is treated as failed.
+        required (bool): Whether a failure aborts the run. A failed
+            optional stage is left out and its dependents run on their
+            other inputs.
+    """
+
+    name: str
+    role: Optional[str] = None
+    depends_on: Tuple[str, ...] = ()
+    enabled_by: Optional[str] = None
+    target: str = "agent_outputs"
+    chunked: bool = False
+    emits_codes: bool = False
+    timeout: Optional[float] = None
+    required: bool = True
+
+    @property
+    def agent_role(self) -> str:
+        return self.role or self.name
+
+
+class Pipeline:
+    """
+    Stages of the swarm and their data dependencies, as a DAG.
+
+    Stages whose dependencies are satisfied run concurrently, so a run
+    takes as long as its critical path rather than the sum of its
+    stages.
+
+    Usage:
+        >>> pipeline = DEFAULT_PIPELINE.with_stage(
+        >>>     Stage("lab_matcher", depends_on=("synthesizer",))
+        >>> )
+        >>> swarm = MedicalCoderSwarm(pipeline=pipeline)
+    """
+
+    def __init__(self, stages: Iterable[Stage]):
+        self.stages: Tuple[Stage, ...] = tuple(stages)
+        self._by_name: Dict[str, Stage] = {}
+        for stage in self.stages:
+            if stage.name in self._by_name:
+                raise ValueError(f"Duplicate stage: {stage.name}")
+            if stage.target not in ("agent_outputs", "summary"):
+                raise ValueError(
+                    f"Unknown target for stage {stage.name}: "
+                    f"{stage.target}"
+                )
+            self._by_name[stage.name] = stage
+        for stage in self.stages:
+            for dependency in stage.depends_on:
+                if dependency not in self._by_name:
+                    raise ValueError(
+                        f"Stage {stage.name} depends on unknown stage "
+                        f"{dependency}"
+                    )
+        self.order: Tuple[Stage, ...] = self._topological_order()
+
+    def _topological_order(self) -> Tuple[Stage, ...]:
+        order: List[Stage] = []
+        placed = set()
+        remaining = list(self.stages)
+        while remaining:
+            ready = [
+                stage
+                for stage in remaining
+                if all(d in placed for d in stage.depends_on)
+            ]
+            if not ready:
+                names = ", ".join(stage.name for stage in remaining)
+                raise ValueError(f"Pipeline has a cycle: {names}")
+            for stage in ready:
+                order.append(stage)
+                placed.add(stage.name)
+            remaining = [s for s in remaining if s.name not in placed]
+        return tuple(order)
+
+    def __getitem__(self, name: str) -> Stage:
+        return self._by_name[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def __len__(self) -> int:
+        return len(self.stages)
+
+    @property
+    def roles(self) -> Tuple[str, ...]:
+        """Agent roles used by the pipeline, in stage order."""
+        return tuple(dict.fromkeys(s.agent_role for s in self.order))
+
+    def with_stage(self, stage: Stage) -> "Pipeline":
+        """A new pipeline with ``stage`` added."""
+        return Pipeline(self.stages + (stage,))
+
+    def without_stage(self, name: str) -> "Pipeline":
+        """
+        A new pipeline without ``name``; stages that depended on it
+        are rewired to its own dependencies.
+        """
+        removed = self[name]
+        stages = []
+        for stage in self.stages:
+            if stage.name == name:
+                continue
+            if name in stage.depends_on:
+                depends_on = tuple(
+                    dict.fromkeys(
+                        d
+                        for dependency in stage.depends_on
+                        for d in (
+                            removed.depends_on
+                            if dependency == name
+                            else (dependency,)
+                        )
+                    )
+                )
+                stage = replace(stage, depends_on=depends_on)
+            stages.append(stage)
+        return Pipeline(stages)
+
+    def active(self, enabled: Callable[[Stage], bool]) -> "Pipeline":
+        """
+        The stages that will run: those ``enabled`` accepts and whose
+        dependencies all run.
+        """
+        kept: Dict[str, Stage] = {}
+        for stage in self.order:
+            if enabled(stage) and all(
+                d in kept for d in stage.depends_on
+            ):
+                kept[stage.name] = stage
+        return Pipeline(kept.values())
+
+
+# The swarm's default chain. Each stage reads the previous one, so it
+# runs sequentially; stages added next to an existing one (e.g. a
+# lab_matcher reading the synthesizer) run in parallel with it.
+DEFAULT_PIPELINE = Pipeline(
+    [
+        Stage("medical_coder", chunked=True, emits_codes=True),
+        Stage(
+            "synthesizer",
+            depends_on=("medical_coder",),
+            emits_codes=True,
+        ),
+        Stage("treatment_agent", depends_on=("synthesizer",)),
+        Stage(
+            "summarizer_agent",
+            depends_on=("treatment_agent",),
+            enabled_by="summarization",
+            target="summary",
+        ),
+    ]
+)
+
+
+class _Schedule:
+    """
+    Bookkeeping shared by ``run_pipeline`` and ``arun_pipeline``: which
+    stages can start, their inputs, deadlines, and how a failure is
+    handled.
+    """
+
+    def __init__(
+        self,
+        pipeline: Pipeline,
+        on_failure: Optional[Callable[[Stage, BaseException], None]],
+        on_ready: Optional[Callable[[Stage], None]] = None,
+        on_skip: Optional[Callable[[Stage, str], None]] = None,
+    ):
+        self.on_ready = on_ready
+        self.on_skip = on_skip
+        self.pending = list(pipeline.order)
+        self.settled = set()
+        self.skipped = set()
+        self.inputs: Dict[str, Dict[str, Any]] = {}
+        self.bypassed: Dict[str, Dict[str, Any]] = {}
+        self.results: Dict[str, Any] = {}
+        self.running: Dict[Any, Stage] = {}
+        self.deadlines: Dict[Any, float] = {}
+        self.on_failure = on_failure
+
+    def ready(self) -> List[Tuple[Stage, Dict[str, Any]]]:
+        """
+        Stages whose dependencies have all settled, with the inputs
+        that succeeded; a bypassed dependency contributes its own
+        inputs. A stage none of whose inputs succeeded is settled
+        without running: skipped if they were all skipped, failed
+        otherwise.
+        """
+        ready = []
+        for stage in list(self.pending):
+            if not all(d in self.settled for d in stage.depends_on):
+                continue
+            self.pending.remove(stage)
+            inputs = {}
+            for d in stage.depends_on:
+                if d in self.results:
+                    inputs[d] = self.results[d]
+                elif d in self.bypassed:
+                    inputs.update(self.bypassed[d])
+            if stage.depends_on and not inputs:
+                if all(d in self.skipped for d in stage.depends_on):
+                    self.skip(
+                        stage, f"inputs of {stage.name} were skipped"
+                    )
+                    continue
+                self.fail(
+                    stage,
+                    RuntimeError(
+                        f"Stage {stage.name} has no successful inputs"
+                    ),
+                )
+                continue
+            if self.on_ready is not None:
+                self.on_ready(stage)
+            self.inputs[stage.name] = inputs
+            ready.append((stage, inputs))
+        return ready
+
+    def start(self, handle: Any, stage: Stage) -> None:
+        self.running[handle] = stage
+        if stage.timeout is not None:
+            self.deadlines[handle] = time.monotonic() + stage.timeout
+
+    def wait_time(self) -> Optional[float]:
+        """Seconds until the nearest deadline, None without one."""
+        if not self.deadlines:
+            return None
+        return max(min(self.deadlines.values()) - time.monotonic(), 0)
+
+    def finish(self, handle: Any, result: Callable[[], Any]) -> None:
+        stage = self.running.pop(handle)
+        self.deadlines.pop(handle, None)
+        try:
+            self.results[stage.name] = result()
+        except BypassStage as bypass:
+            self.bypassed[stage.name] = self.inputs[stage.name]
+            self.skip(stage, str(bypass))
+            return
+        except SkipStage as skip:
+            self.skip(stage, str(skip))
+            return
+        except Exception as error:
+            self.fail(stage, error)
+            return
+        self.settled.add(stage.name)
+
+    def expire(self) -> List[Any]:
+        """Fail the stages past their deadline; returns their handles."""
+        now = time.monotonic()
+        expired = [h for h, t in self.deadlines.items() if t <= now]
+        for handle in expired:
+            stage = self.running.pop(handle)
+            del self.deadlines[handle]
+            self.fail(
+                stage,
+                TimeoutError(
+                    f"Stage {stage.name} timed out after "
+                    f"{stage.timeout:g}s"
+                ),
+            )
+        return expired
+
+    def skip(self, stage: Stage, reason: str) -> None:
+        self.settled.add(stage.name)
+        self.skipped.add(stage.name)
+        if self.on_skip is not None:
+            self.on_skip(stage, reason)
+
+    def fail(self, stage: Stage, error: BaseException) -> None:
+        if stage.required:
+            raise error
+        self.settled.add(stage.name)
+        if self.on_failure is not None:
+            self.on_failure(stage, error)
+
+    @property
+    def done(self) -> bool:
+        return not self.pending and not self.running
+
+
+def run_pipeline(
+    pipeline: Pipeline,
+    execute: Callable[[Stage, Dict[str, Any]], Any],
+    max_workers: Optional[int] = None,
+    on_failure: Optional[
+        Callable[[Stage, BaseException], None]
+    ] = None,
+    on_ready: Optional[Callable[[Stage], None]] = None,
+    on_skip: Optional[Callable[[Stage, str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Run every stage of ``pipeline`` on a thread pool, each as soon as
+    its dependencies have settled.
+
+    Args:
+        pipeline (Pipeline): Stages to run.
+        execute (Callable): Called as ``execute(stage, inputs)`` where
+            ``inputs`` maps each successful dependency to its result.
+        max_workers (Optional[int]): Threads; defaults to the number of
+            stages.
+        on_failure (Optional[Callable]): Called with the stage and the
+            error when an optional stage fails or times out.
+        on_ready (Optional[Callable]): Called with each stage when its
+            inputs are ready, just before it is submitted.
+        on_skip (Optional[Callable]): Called with the stage and the
+            reason when a stage raises ``SkipStage`` (or
+            ``BypassStage``) or all its inputs were skipped.
+
+    Returns:
+        Dict[str, Any]: Result of every successful stage, by name. A
+        required stage that fails or times out raises; stages not yet
+        started are cancelled. A timed-out call cannot be interrupted:
+        its thread finishes in the background and its result is
+        discarded.
+    """
+    if not len(pipeline):
+        return {}
+    schedule = _Schedule(pipeline, on_failure, on_ready, on_skip)
+    executor = ThreadPoolExecutor(
+        max_workers=max_workers or len(pipeline)
+    )
+    try:
+        while not schedule.done:
+            for stage, inputs in schedule.ready():
+                schedule.start(
+                    executor.submit(execute, stage, inputs), stage
+                )
+            if not schedule.running:
+                continue
+            done, _ = wait(
+                schedule.running,
+                timeout=schedule.wait_time(),
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                schedule.finish(future, future.result)
+            schedule.expire()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return schedule.results
+
+
+async def arun_pipeline(
+    pipeline: Pipeline,
+    execute: Callable[[Stage, Dict[str, Any]], Awaitable[Any]],
+    on_failure: Optional[
+        Callable[[Stage, BaseException], None]
+    ] = None,
+    on_ready: Optional[Callable[[Stage], None]] = None,
+    on_skip: Optional[Callable[[Stage, str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Async counterpart of ``run_pipeline``; stages are tasks and
+    timed-out stages are cancelled.
+    """
+    schedule = _Schedule(pipeline, on_failure, on_ready, on_skip)
+    try:
+        while not schedule.done:
+            for stage, inputs in schedule.ready():
+                schedule.start(
+                    asyncio.ensure_future(execute(stage, inputs)),
+                    stage,
+                )
+            if not schedule.running:
+                continue
+            done, _ = await asyncio.wait(
+                schedule.running,
+                timeout=schedule.wait_time(),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in done:
+                schedule.finish(task, task.result)
+            for task in schedule.expire():
+                task.cancel()
+    finally:
+        for task in schedule.running:
+            task.cancel()
+    return schedule.results
+
+
+SPECIALIST_ROLES: Tuple[str, ...] = (
+    "chief_medical_officer",
+    "internist",
+    "lab_matcher",
+)
+
+
+def specialist_pipeline(
+    specialists: Tuple[str, ...] = SPECIALIST_ROLES,
+    timeout: Optional[float] = 120.0,
+    base: Pipeline = DEFAULT_PIPELINE,
+    reader: str = "synthesizer",
+) -> Pipeline:
+    """
+    ``base`` with specialists consulted on the case in parallel with
+    the coder, and ``reader`` combining the coder's and specialists'
+    outputs.
+
+    Specialists are optional stages: one that fails or exceeds
+    ``timeout`` seconds is left out and the reader proceeds with the
+    others.
+    """
+    stages = []
+    for stage in base.stages:
+        if stage.name == reader:
+            stage = replace(
+                stage,
+                depends_on=stage.depends_on + tuple(specialists),
+            )
+        stages.append(stage)
+    stages.extend(
+        Stage(role, timeout=timeout, required=False)
+        for role in specialists
+    )
+    return Pipeline(stages)
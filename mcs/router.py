@@ -0,0 +1,229 @@
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from mcs.candidates import extract_candidates
+from mcs.context import estimate_tokens
+from mcs.labs import evaluate_labs, extract_labs, parse_demographics
+
+TIERS: Tuple[str, ...] = ("small", "medium", "large")
+
+# Model of each tier; the large tier is the swarm's default model
+DEFAULT_TIER_MODELS: Dict[str, str] = {
+    "small": "groq/llama-3.1-8b-instant",
+    "medium": "groq/llama-3.3-70b-versatile",
+    "large": "groq/deepseek-r1-distill-llama-70b",
+}
+
+# Largest value of each case feature a tier accepts. A case goes to the
+# first tier whose limits it fits, and to the large tier otherwise.
+DEFAULT_TIER_LIMITS: Dict[str, Dict[str, int]] = {
+    "small": {
+        "tokens": 1500,
+        "problems": 2,
+        "labs": 8,
+        "candidates": 3,
+    },
+    "medium": {
+        "tokens": 12000,
+        "problems": 6,
+        "labs": 30,
+        "candidates": 12,
+    },
+}
+
+# (lowest, highest) tier per stage name. The summary only restates the
+# earlier stages, so it never needs the large model.
+DEFAULT_STAGE_TIERS: Dict[str, Tuple[str, str]] = {
+    "summarizer_agent": ("small", "medium"),
+}
+
+
+@dataclass
+class CaseFeatures:
+    """
+    What the router knows about a case, all computed locally.
+
+    Attributes:
+        chars (int): Length of the task and documentation.
+        tokens (int): Estimated tokens of the same text.
+        problems (int): Distinct ICD-10 categories (three-character
+            codes) among the candidate codes.
+        labs (int): Lab results found in the text.
+        abnormal_labs (int): Lab results outside their reference range.
+        candidates (int): Candidate ICD-10 codes.
+    """
+
+    chars: int
+    tokens: int
+    problems: int
+    labs: int
+    abnormal_labs: int
+    candidates: int
+
+
+@dataclass
+class ModelRoute:
+    """
+    The model a stage was routed to.
+
+    Attributes:
+        tier (str): ``small``, ``medium`` or ``large``.
+        model (str): Model name the stage's agent runs on.
+        reason (str): Which features decided the tier.
+    """
+
+    tier: str
+    model: str
+    reason: str
+
+
+def score_case(text: str) -> CaseFeatures:
+    """Features of a case's task and documentation."""
+    candidates = extract_candidates(text)
+    age, sex = parse_demographics(text)
+    labs = evaluate_labs(extract_labs(text), age, sex)
+    return CaseFeatures(
+        chars=len(text),
+        tokens=estimate_tokens(text),
+        problems=len({c.code.split(".")[0] for c in candidates}),
+        labs=len(labs),
+        abnormal_labs=len(labs.rows(abnormal_only=True)),
+        candidates=len(candidates),
+    )
+
+
+@dataclass
+class RoutingTable:
+    """
+    How cases map to model tiers, and tiers to models.
+
+    Args:
+        models (Dict[str, str]): Model of each tier.
+        limits (Dict[str, Dict[str, int]]): Largest value of each
+            ``CaseFeatures`` field the small and medium tiers accept.
+            Features a tier does not list are not limited.
+        stage_tiers (Dict[str, Tuple[str, str]]): Lowest and highest
+            tier per stage name.
+        stage_models (Dict[str, Dict[str, str]]): Per-stage overrides
+            of ``models``, by stage name and tier.
+
+    Usage:
+        >>> table = RoutingTable(
+        >>>     stage_tiers={"medical_coder": ("medium", "large")},
+        >>>     stage_models={"summarizer_agent": {"small": "gpt-4o-mini"}},
+        >>> )
+        >>> swarm = MedicalCoderSwarm(router=ModelRouter(table))
+    """
+
+    models: Dict[str, str] = field(
+        default_factory=lambda: dict(DEFAULT_TIER_MODELS)
+    )
+    limits: Dict[str, Dict[str, int]] = field(
+        default_factory=lambda: {
+            tier: dict(limits)
+            for tier, limits in DEFAULT_TIER_LIMITS.items()
+        }
+    )
+    stage_tiers: Dict[str, Tuple[str, str]] = field(
+        default_factory=lambda: dict(DEFAULT_STAGE_TIERS)
+    )
+    stage_models: Dict[str, Dict[str, str]] = field(
+        default_factory=dict
+    )
+
+    def __post_init__(self):
+        tiers = [*self.models, *self.limits]
+        for models in self.stage_models.values():
+            tiers.extend(models)
+        for bounds in self.stage_tiers.values():
+            tiers.extend(bounds)
+        for tier in tiers:
+            if tier not in TIERS:
+                raise ValueError(f"Unknown model tier: {tier}")
+        if "large" in self.limits:
+            raise ValueError(
+                "The large tier takes every case; it has no limits"
+            )
+
+    def case_tier(self, features: CaseFeatures) -> Tuple[str, str]:
+        """The tier a case fits, and why."""
+        values = asdict(features)
+        exceeded: List[str] = []
+        for tier in TIERS[:-1]:
+            limits = self.limits.get(tier)
+            if limits is None:
+                continue
+            over = [
+                f"{name} {values[name]} > {limit}"
+                for name, limit in limits.items()
+                if values[name] > limit
+            ]
+            if not over:
+                fits = ", ".join(
+                    f"{name} {values[name]} <= {limit}"
+                    for name, limit in limits.items()
+                )
+                return tier, f"fits {tier}: {fits}"
+            exceeded = over
+        return "large", "exceeds medium: " + ", ".join(exceeded)
+
+    def model(self, stage: str, tier: str) -> Optional[str]:
+        return self.stage_models.get(stage, {}).get(
+            tier, self.models.get(tier)
+        )
+
+
+class ModelRouter:
+    """
+    Picks a small, medium or large model for each stage of a run from
+    cheap, local features of the case: its length, the problems and
+    candidate codes the lexicon finds, and its lab results.
+
+    Args:
+        table (RoutingTable): Tier limits and models; the defaults
+            when omitted.
+
+    Usage:
+        >>> swarm = MedicalCoderSwarm(router=ModelRouter())
+        >>> swarm.run(case)  # routes are in the output's ``routing``
+    """
+
+    def __init__(self, table: RoutingTable = None):
+        self.table = table or RoutingTable()
+
+    def score(self, text: str) -> CaseFeatures:
+        return score_case(text)
+
+    def route(
+        self, features: CaseFeatures, stage: str
+    ) -> Optional[ModelRoute]:
+        """
+        The model tier for ``stage`` on a case, None when the table
+        has no model for it (the stage keeps its configured model).
+        """
+        tier, reason = self.table.case_tier(features)
+        lowest, highest = self.table.stage_tiers.get(
+            stage, (TIERS[0], TIERS[-1])
+        )
+        if TIERS.index(tier) < TIERS.index(lowest):
+            tier, reason = lowest, f"{reason}; {stage} needs {lowest}"
+        elif TIERS.index(tier) > TIERS.index(highest):
+            tier, reason = (
+                highest,
+                f"{reason}; {stage} is capped at {highest}",
+            )
+        model = self.table.model(stage, tier)
+        if model is None:
+            return None
+        return ModelRoute(tier=tier, model=model, reason=reason)
+
+    def plan(
+        self, features: CaseFeatures, stages: List[str]
+    ) -> Dict[str, ModelRoute]:
+        """Routes of every stage the table has a model for."""
+        routes = {}
+        for stage in stages:
+            route = self.route(features, stage)
+            if route is not None:
+                routes[stage] = route
+        return routes
@@ -118,8 +118,12 @@ class SecureDataHandler:
         """Initialize encryption keys"""
         with self._keys_lock:
             if not self._load_existing_keys():
-                # Generate initial key
-                self._generate_new_key(master_key, is_primary=True)
+                # Generate initial key. Keys are derived from the master
+                # key hash, as on reload and rotation, so a restarted
+                # process can read what this one encrypts.
+                self._generate_new_key(
+                    self.master_key_hash, is_primary=True
+                )
 
     def _generate_new_key(
         self, master_key: str, is_primary: bool = False
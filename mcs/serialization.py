@@ -0,0 +1,42 @@
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def is_json_native(value: Any) -> bool:
+    """
+    Whether ``value`` is made only of JSON types.
+
+    A type walk, so checking a large document string is O(1) instead of
+    encoding it just to see whether encoding fails.
+    """
+    if isinstance(value, _SCALARS):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(is_json_native(item) for item in value)
+    if isinstance(value, dict):
+        return all(
+            isinstance(key, str) and is_json_native(item)
+            for key, item in value.items()
+        )
+    return False
+
+
+def dumps(value: Any) -> str:
+    """
+    Encode ``value`` as compact JSON, through orjson when it is
+    installed and the standard library otherwise.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(value).decode()
+        except TypeError:
+            # Non-str keys, integers over 64 bits, ... take the slow path
+            pass
+    return json.dumps(value)
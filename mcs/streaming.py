@@ -0,0 +1,63 @@
+import time
+from contextvars import ContextVar
+from typing import Dict, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+StreamEventType = Literal[
+    "stage_started",
+    "token",
+    "stage_finished",
+    "chunk_started",
+    "chunk_token",
+    "chunk_finished",
+    "run_finished",
+    "error",
+]
+
+# Map-reduce runs code the documentation in parallel chunks. Their
+# calls report under chunk event types so the stage events of the coder
+# still describe the stage as a whole.
+CHUNK_EVENT_TYPES: Dict[str, str] = {
+    "stage_started": "chunk_started",
+    "token": "chunk_token",
+    "stage_finished": "chunk_finished",
+}
+
+# Index of the documentation chunk coded in the current thread or task
+current_chunk: ContextVar[Optional[int]] = ContextVar(
+    "current_chunk", default=None
+)
+
+
+class MCSStreamEvent(BaseModel):
+    """
+    A single event emitted by ``MedicalCoderSwarm.run_stream``.
+
+    Attributes:
+        type (str): One of ``stage_started``, ``token``,
+            ``stage_finished``, ``chunk_started``, ``chunk_token``,
+            ``chunk_finished``, ``run_finished`` or ``error``.
+        agent_name (str): Agent the event belongs to, for stage and
+            chunk events.
+        chunk (int): Index of the documentation chunk, for chunk
+            events.
+        data (str): Token text for ``token`` and ``chunk_token``
+            events, the message for ``error`` events.
+        output (str): Full stage output for ``stage_finished``, the
+            chunk's output for ``chunk_finished``, the final MCSOutput
+            JSON for ``run_finished``.
+        timestamp (float): Unix time the event was created.
+    """
+
+    type: StreamEventType
+    agent_name: Optional[str] = None
+    chunk: Optional[int] = None
+    data: Optional[str] = None
+    output: Optional[str] = None
+    timestamp: float = Field(default_factory=time.time)
+
+
+def format_sse(event: MCSStreamEvent) -> str:
+    """Encode an event as a Server-Sent Events message."""
+    return f"event: {event.type}\ndata: {event.model_dump_json()}\n\n"
@@ -0,0 +1,68 @@
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from mcs.agents import AGENT_CONFIGS, AgentPool, create_agent
+
+
+def test_create_agent_applies_overrides():
+    agent = create_agent("medical_coder", model_name="gpt-4o-mini")
+
+    assert (
+        agent.agent_name == AGENT_CONFIGS["medical_coder"][
+            "agent_name"
+        ]
+    )
+    assert agent.model_name == "gpt-4o-mini"
+
+
+def test_pool_recycles_sets_with_fresh_memory():
+    pool = AgentPool(roles=("medical_coder",), size=1)
+
+    with pool.lease() as agent_set:
+        coder = agent_set["medical_coder"]
+        baseline = len(coder.short_memory.conversation_history)
+        coder.short_memory.add(
+            role="User", content="patient 42 secrets"
+        )
+
+    assert pool.idle == 1
+    with pool.lease() as agent_set:
+        assert agent_set["medical_coder"] is coder
+        assert "patient 42" not in coder.short_memory.get_str()
+        assert (
+            len(coder.short_memory.conversation_history) == baseline
+        )
+
+
+def test_concurrent_leases_never_share_agents():
+    pool = AgentPool(agent_factory=lambda role: object())
+    # Every lease is held until all eight are, so they overlap
+    held = threading.Barrier(8)
+
+    def lease_ids(_):
+        with pool.lease() as agent_set:
+            ids = {id(agent) for agent in agent_set.values()}
+            held.wait(timeout=5)
+            return ids
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        leased = list(executor.map(lease_ids, range(8)))
+
+    assert all(leased)
+    assert len(set().union(*leased)) == sum(map(len, leased))
+    assert pool.idle <= 8
+
+
+def test_import_mcs_is_lazy():
+    code = (
+        "import sys, mcs\n"
+        "assert 'swarms' not in sys.modules\n"
+        "assert 'mcs.main' not in sys.modules\n"
+        "import mcs.main as m\n"
+        "assert 'swarms' not in sys.modules\n"
+        "m.medical_coder\n"
+        "assert m.agent_registry.built == ('medical_coder',)\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
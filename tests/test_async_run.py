@@ -0,0 +1,195 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from mcs.agents import AgentPool
+from mcs.main import MedicalCoderSwarm
+
+
+class EchoAgent:
+    """Stand-in agent that echoes its input after a short await."""
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str):
+        if "boom" in task:
+            raise RuntimeError("provider error")
+        return f"{self.agent_name}: {task}"
+
+    async def arun(self, task: str):
+        await asyncio.sleep(0.05)
+        return self.run(task)
+
+
+def _swarm(tmp_path, **kwargs):
+    os.environ.setdefault("MASTER_KEY", "test_master_key")
+    return MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=EchoAgent),
+        **kwargs,
+    )
+
+
+def test_arun_matches_run(tmp_path):
+    swarm = _swarm(tmp_path, summarization=True)
+
+    output = json.loads(asyncio.run(swarm.arun("Assess eGFR 59")))
+
+    assert [o["agent_name"] for o in output["agent_outputs"]] == [
+        "medical_coder",
+        "synthesizer",
+        "treatment_agent",
+    ]
+    assert output["summary"].startswith("summarizer_agent")
+
+
+def test_abatched_run_is_concurrent_and_ordered(tmp_path):
+    swarm = _swarm(tmp_path)
+    tasks = [f"case {i}" for i in range(20)]
+
+    async def timed():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        outputs = await swarm.abatched_run(tasks)
+        return outputs, loop.time() - start
+
+    outputs, elapsed = asyncio.run(timed())
+
+    # Three sequential 50 ms stages; serial execution would take 3 s.
+    assert elapsed < 1.0
+    assert len(outputs) == len(tasks)
+    for task, result in zip(tasks, outputs):
+        coder = json.loads(result.output)["agent_outputs"][0]
+        assert f"Task: {task}" in coder["agent_output"]
+    assert swarm.output_schema.agent_outputs == []
+
+
+def test_batched_run_isolates_failures(tmp_path):
+    swarm = _swarm(tmp_path)
+    tasks = ["case 0", "boom", "case 2"]
+
+    results = swarm.batched_run(tasks, max_workers=3)
+
+    assert [r.index for r in results] == [0, 1, 2]
+    assert results[1].output is None
+    assert "provider error" in results[1].error
+    for result in (results[0], results[2]):
+        assert result.error is None
+        assert result.duration >= 0
+        outputs = json.loads(result.output)["agent_outputs"]
+        # The task is wrapped in the case header exactly once.
+        assert outputs[0]["agent_output"].count("Task:") == 1
+
+
+class StreamingAgent(EchoAgent):
+    def run_stream(self, task: str):
+        for word in self.run(task).split(" "):
+            yield word + " "
+
+
+def test_run_stream_yields_stage_and_token_events(tmp_path):
+    os.environ.setdefault("MASTER_KEY", "test_master_key")
+    swarm = MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=StreamingAgent),
+    )
+
+    events = list(swarm.run_stream("eGFR 59"))
+
+    assert events[0].type == "stage_started"
+    assert events[0].agent_name == "medical_coder"
+    assert events[-1].type == "run_finished"
+    _stage_outputs_match_tokens(events)
+
+
+def _stage_outputs_match_tokens(events):
+    finished = [e for e in events if e.type == "stage_finished"]
+    assert [e.agent_name for e in finished] == [
+        "medical_coder",
+        "synthesizer",
+        "treatment_agent",
+    ]
+    for stage in finished:
+        tokens = "".join(
+            e.data
+            for e in events
+            if e.type == "token" and e.agent_name == stage.agent_name
+        )
+        assert tokens == stage.output
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_map_reduce_stream_reports_chunks_apart(tmp_path, use_async):
+    os.environ.setdefault("MASTER_KEY", "test_master_key")
+    swarm = MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=StreamingAgent),
+        patient_documentation="\f".join(
+            f"Visit {i}: eGFR 5{i}, HbA1c 8.{i}%." for i in range(4)
+        ),
+        map_reduce=True,
+        chunk_max_chars=40,
+    )
+
+    if use_async:
+
+        async def collect():
+            return [e async for e in swarm.arun_stream("Code record")]
+
+        events = asyncio.run(collect())
+    else:
+        events = list(swarm.run_stream("Code record"))
+
+    assert events[-1].type == "run_finished"
+    assert [e.type for e in events].count("stage_started") == 3
+    _stage_outputs_match_tokens(events)
+    chunks = [e for e in events if e.type == "chunk_finished"]
+    assert sorted(e.chunk for e in chunks) == [0, 1, 2, 3]
+    for chunk in chunks:
+        tokens = "".join(
+            e.data
+            for e in events
+            if e.type == "chunk_token" and e.chunk == chunk.chunk
+        )
+        assert tokens == chunk.output
+
+
+def test_arun_stream_reports_errors(tmp_path):
+    swarm = _swarm(tmp_path)
+
+    async def collect():
+        return [event async for event in swarm.arun_stream("boom")]
+
+    events = asyncio.run(collect())
+
+    assert events[0].type == "stage_started"
+    assert events[-1].type == "error"
+    assert "provider error" in events[-1].data
+
+
+def test_concurrent_streams_on_one_swarm_stay_separate(tmp_path):
+    swarm = _swarm(tmp_path)
+
+    async def collect(task):
+        return [event async for event in swarm.arun_stream(task)]
+
+    async def main():
+        return await asyncio.gather(
+            collect("case alpha"), collect("case beta")
+        )
+
+    alpha, beta = asyncio.run(main())
+
+    for events, own, other in (
+        (alpha, "alpha", "beta"),
+        (beta, "beta", "alpha"),
+    ):
+        tokens = "".join(e.data for e in events if e.type == "token")
+        assert own in tokens
+        assert other not in tokens
+        assert events[-1].type == "run_finished"
+    assert swarm._event_sink is None
+    assert len(swarm.output_schema.agent_outputs) == 3
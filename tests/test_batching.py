@@ -0,0 +1,144 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from mcs.agents import AgentPool
+from mcs.batching import (
+    BatchRequest,
+    MicroBatcher,
+    StubBatchProvider,
+)
+from mcs.main import MedicalCoderSwarm
+from mcs.metrics import MetricsRegistry
+
+os.environ.setdefault("MASTER_KEY", "test_master_key")
+
+
+class UnusedAgent:
+    """Agents are only described to the provider, never called."""
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+        self.model_name = "stub-model"
+        self.system_prompt = f"You are the {agent_name}."
+
+    def run(self, task: str) -> str:
+        raise AssertionError("called outside the batcher")
+
+
+def request(prompt, agent_name="medical_coder", model="stub-model"):
+    return BatchRequest(
+        agent_name=agent_name, model=model, prompt=prompt
+    )
+
+
+def test_results_fan_back_out_to_their_callers():
+    provider = StubBatchProvider()
+    batcher = MicroBatcher(
+        provider, window=0.05, metrics=MetricsRegistry()
+    )
+
+    futures = [batcher.submit(request(f"case {i}")) for i in range(5)]
+
+    assert [f.result(timeout=5) for f in futures] == [
+        f"medical_coder: case {i}" for i in range(5)
+    ]
+    assert provider.batches == [5]
+    batcher.close()
+
+
+def test_batches_are_per_stage_and_model():
+    provider = StubBatchProvider()
+    batcher = MicroBatcher(provider, window=0.05)
+
+    futures = [
+        batcher.submit(request("a")),
+        batcher.submit(request("b", agent_name="synthesizer")),
+        batcher.submit(request("c", model="small")),
+        batcher.submit(request("d")),
+    ]
+    for future in futures:
+        future.result(timeout=5)
+
+    assert sorted(provider.batches) == [1, 1, 2]
+    batcher.close()
+
+
+def test_full_batches_do_not_wait_for_the_window():
+    provider = StubBatchProvider()
+    batcher = MicroBatcher(provider, window=30, max_batch=3)
+
+    start = time.perf_counter()
+    futures = [batcher.submit(request(str(i))) for i in range(3)]
+    for future in futures:
+        future.result(timeout=5)
+
+    assert time.perf_counter() - start < 1
+    assert provider.batches == [3]
+    pending = batcher.submit(request("last"))
+    # Closing sends what is still waiting
+    batcher.close()
+    assert pending.result(timeout=5) == "medical_coder: last"
+
+
+def test_per_request_and_batch_failures():
+    def respond(batch_request):
+        if batch_request.prompt == "bad":
+            return ValueError("rejected")
+        return "ok"
+
+    batcher = MicroBatcher(StubBatchProvider(respond), window=0.01)
+    good, bad = batcher.submit(request("good")), batcher.submit(
+        request("bad")
+    )
+    assert good.result(timeout=5) == "ok"
+    with pytest.raises(ValueError):
+        bad.result(timeout=5)
+
+    def fail(batch_request):
+        raise RuntimeError("provider down")
+
+    batcher = MicroBatcher(StubBatchProvider(fail), window=0.01)
+    with pytest.raises(RuntimeError, match="provider down"):
+        batcher.submit(request("x")).result(timeout=5)
+
+
+def test_concurrent_cases_share_provider_requests(tmp_path):
+    provider = StubBatchProvider(latency=0.01)
+    registry = MetricsRegistry()
+    batcher = MicroBatcher(provider, window=0.05, metrics=registry)
+    swarm = MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=UnusedAgent),
+        batcher=batcher,
+    )
+    tasks = [f"Case {i}: eGFR 5{i}" for i in range(8)]
+
+    results = swarm.batched_run(tasks=tasks)
+
+    for task, result in zip(tasks, results):
+        output = json.loads(result.output)
+        assert task in output["agent_outputs"][0]["agent_output"]
+    # 3 stages x 8 cases in far fewer than 24 provider requests
+    assert sum(provider.batches) == 24
+    assert len(provider.batches) < 12
+    sizes = registry.snapshot()["mcs_llm_batch_size"]
+    assert {s["labels"]["stage"] for s in sizes} == {
+        "medical_coder",
+        "synthesizer",
+        "treatment_agent",
+    }
+
+    outputs = asyncio.run(swarm.abatched_run(tasks=tasks))
+    assert all(result.error is None for result in outputs)
+    batcher.close()
+
+
+def test_submit_after_close_fails():
+    batcher = MicroBatcher(StubBatchProvider())
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit(request("late"))
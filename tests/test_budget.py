@@ -0,0 +1,108 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from mcs.agents import AgentPool
+from mcs.budget import BudgetTracker, RunBudget
+from mcs.main import MedicalCoderSwarm
+from mcs.metrics import StageStats
+from mcs.pipeline import DEFAULT_PIPELINE, SkipStage
+
+os.environ.setdefault("MASTER_KEY", "test_master_key")
+
+
+class ModelAgent:
+    """Answers with ~400 tokens, naming the model it runs on."""
+
+    def __init__(self, agent_name: str, model_name: str = "large"):
+        self.agent_name = agent_name
+        self.model_name = model_name
+
+    def run(self, task: str) -> str:
+        return f"{self.model_name} " + "finding " * 400
+
+
+def make_swarm(tmp_path, budget, **kwargs):
+    return MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=ModelAgent),
+        budget=budget,
+        **kwargs,
+    )
+
+
+def test_exhausted_budget_skips_optional_stages(tmp_path):
+    swarm = make_swarm(
+        tmp_path, RunBudget(max_tokens=500), summarization=True
+    )
+
+    output = json.loads(swarm.run("Assess eGFR 59"))
+
+    names = [o["agent_name"] for o in output["agent_outputs"]]
+    # Required stages run regardless of the budget
+    assert names == ["medical_coder", "synthesizer"]
+    report = output["budget"]
+    assert report["exhausted"] == "tokens"
+    assert report["tokens"] > 500
+    assert report["skipped"] == {
+        "treatment_agent": "tokens budget exhausted",
+        "summarizer_agent": "inputs of summarizer_agent were skipped",
+    }
+    assert output["summary"] == ""
+
+
+def test_low_budget_downgrades_to_fallback_model(tmp_path):
+    budget = RunBudget(
+        max_tokens=10_000,
+        downgrade_at=0.1,
+        fallback_models={"treatment_agent": "small"},
+    )
+    swarm = make_swarm(tmp_path, budget)
+
+    output = json.loads(asyncio.run(swarm.arun("Assess eGFR 59")))
+
+    treatment = output["agent_outputs"][-1]
+    assert treatment["agent_name"] == "treatment_agent"
+    assert treatment["agent_output"].startswith("small ")
+    assert output["budget"]["downgraded"] == {
+        "treatment_agent": "small"
+    }
+    assert output["budget"]["skipped"] == {}
+
+
+def test_runs_within_budget_are_unchanged(tmp_path):
+    swarm = make_swarm(tmp_path, RunBudget(max_dollars=1.0))
+
+    output = json.loads(swarm.run("Assess eGFR 59"))
+
+    assert len(output["agent_outputs"]) == 3
+    assert 0 < output["budget"]["dollars"] < 1.0
+    assert output["budget"]["exhausted"] is None
+
+    swarm = make_swarm(tmp_path, None)
+    assert json.loads(swarm.run("Assess eGFR 59"))["budget"] is None
+
+
+def test_tracker_prices_and_wall_time():
+    budget = RunBudget(
+        max_dollars=0.01,
+        max_seconds=0.0,
+        prices={"cheap": (1.0, 2.0)},
+    )
+    tracker = BudgetTracker(budget)
+    tracker.charge(
+        "cheap", StageStats(prompt_tokens=1000, completion_tokens=500)
+    )
+
+    assert tracker.tokens == 1500
+    assert tracker.dollars == pytest.approx(0.002)
+    assert tracker.exhausted() == "wall_time"
+    # Required stages always run, optional ones are skipped
+    assert tracker.plan(DEFAULT_PIPELINE["synthesizer"]) is None
+    with pytest.raises(SkipStage):
+        tracker.plan(DEFAULT_PIPELINE["treatment_agent"])
+    assert tracker.skipped == {
+        "treatment_agent": "wall_time budget exhausted"
+    }
@@ -0,0 +1,132 @@
+import os
+import time
+
+from mcs.agents import AgentPool
+from mcs.cache import DiskCache, LRUCache, StageCache, stage_cache_key
+from mcs.main import MedicalCoderSwarm
+
+
+class CountingAgent:
+    calls = 0
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+        self.system_prompt = f"You are {agent_name}"
+        self.model_name = "test-model"
+
+    def run(self, task: str):
+        CountingAgent.calls += 1
+        return f"{self.agent_name} handled {len(task)} chars"
+
+
+def test_key_ignores_timestamp_but_not_patient_id():
+    agent = CountingAgent("coder")
+    first = (
+        "Patient Information: a1 \n Timestamp: 2025-01-01 10:00:00 \n"
+        " Patient Documentation eGFR 59 \n Task: code it "
+    )
+    second = (
+        "Patient Information: a1 \n Timestamp: 2025-06-30 23:59:59 \n"
+        " Patient Documentation   eGFR 59 \n Task: code it"
+    )
+
+    assert stage_cache_key(first, agent) == stage_cache_key(
+        second, agent
+    )
+    assert stage_cache_key(first, agent) != stage_cache_key(
+        second.replace("a1", "b2"), agent
+    )
+    assert stage_cache_key(first, agent) != stage_cache_key(
+        first.replace("59", "29"), agent
+    )
+
+    agent.model_name = "other-model"
+    assert stage_cache_key(first, agent) != stage_cache_key(
+        second, CountingAgent("coder")
+    )
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_disk_cache_evicts_by_size(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=600)
+    for index in range(10):
+        cache.set(f"{index:02d}" + "0" * 62, "x" * 100)
+        time.sleep(0.01)
+
+    assert cache.size <= 600
+    assert cache.get("09" + "0" * 62) == "x" * 100
+    assert cache.get("00" + "0" * 62) is None
+
+    reopened = DiskCache(str(tmp_path), max_bytes=600)
+    assert reopened.size == cache.size
+
+
+def test_swarm_rerun_is_served_from_cache(tmp_path):
+    os.environ.setdefault("MASTER_KEY", "test_master_key")
+    cache = StageCache(directory=str(tmp_path / "cache"))
+
+    def run_case(patient_id="p1"):
+        swarm = MedicalCoderSwarm(
+            patient_id=patient_id,
+            key_storage_path=str(tmp_path / "keys"),
+            agent_pool=AgentPool(agent_factory=CountingAgent),
+            stage_cache=cache,
+            patient_documentation="eGFR 59, HbA1c 8.2%",
+        )
+        return swarm.run("Code this case")
+
+    CountingAgent.calls = 0
+    first = run_case()
+    assert CountingAgent.calls == 3
+
+    second = run_case()
+    assert CountingAgent.calls == 3
+    assert cache.hits == 3
+
+    # A fresh process only has the disk tier to go on
+    handler = MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys")
+    ).secure_handler
+    cold = StageCache(
+        directory=str(tmp_path / "cache"), secure_handler=handler
+    )
+    assert cold.get(next(iter(cache.memory._entries))) is not None
+    assert first is not None and second is not None
+
+    # The swarm encrypted the disk tier it was given
+    for path, _, _ in cache.disk._entries():
+        with open(path) as file:
+            assert "handled" not in file.read()
+
+    # Another patient with the same documentation is not served the
+    # coder's output for the first one; later stages never see the
+    # patient id, so theirs are still shared
+    run_case("p2")
+    assert CountingAgent.calls == 4
+
+
+def test_encrypted_disk_cache(tmp_path):
+    os.environ.setdefault("MASTER_KEY", "test_master_key")
+    swarm = MedicalCoderSwarm(key_storage_path=str(tmp_path / "keys"))
+    cache = DiskCache(
+        str(tmp_path / "cache"), secure_handler=swarm.secure_handler
+    )
+    key = "ab" + "0" * 62
+    cache.set(key, "N18.30 for patient p1")
+
+    with open(cache._path(key)) as file:
+        assert "p1" not in file.read()
+    assert cache.get(key) == "N18.30 for patient p1"
+    # Entries written encrypted are misses without the key
+    assert DiskCache(str(tmp_path / "cache")).get(key) is None
@@ -0,0 +1,106 @@
+import os
+
+from mcs.agents import AgentPool
+from mcs.candidates import (
+    CandidateExtractor,
+    extract_candidates,
+    format_candidates,
+)
+from mcs.main import MedicalCoderSwarm
+
+os.environ.setdefault("MASTER_KEY", "test_master_key")
+
+
+class RecordingAgent:
+    prompts = []
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str) -> str:
+        RecordingAgent.prompts.append((self.agent_name, task))
+        return f"{self.agent_name} done"
+
+
+def test_lexicon_prefers_longest_term():
+    candidates = extract_candidates(
+        "History of CKD stage 3a and anemia of CKD."
+    )
+    codes = {c.code: c for c in candidates}
+
+    assert "N18.31" in codes
+    assert "D63.1" in codes
+    assert "N18.9" not in codes
+    assert "D64.9" not in codes
+
+
+def test_explicit_codes_rank_first_and_need_word_boundaries():
+    candidates = extract_candidates(
+        "Hypertension, HTN. Assessment: E11.22. Ref XE11.9 ignored."
+    )
+
+    assert candidates[0].code == "E11.22"
+    assert candidates[0].source == "explicit"
+    assert candidates[1].code == "I10"
+    assert candidates[1].count == 2
+    assert candidates[1].terms == ["hypertension", "htn"]
+    assert "E11.9" not in {c.code for c in candidates}
+
+
+def test_explicit_chapter_u_codes_are_candidates():
+    candidates = extract_candidates("Assessment: U07.1, then U09.9.")
+
+    assert [c.code for c in candidates] == ["U07.1", "U09.9"]
+
+
+def test_terms_do_not_match_inside_words():
+    assert extract_candidates("prehypertension, gouty") == []
+
+
+def test_custom_lexicon_from_json(tmp_path):
+    path = tmp_path / "lexicon.json"
+    path.write_text(
+        '{"Z00.00": {"description": "General exam",'
+        ' "synonyms": ["annual physical"]}}'
+    )
+    extractor = CandidateExtractor.from_json(str(path))
+
+    (candidate,) = extractor.extract("Annual Physical today")
+    assert candidate.code == "Z00.00"
+    assert candidate.description == "General exam"
+    assert candidate.first_offset == 0
+
+
+def test_format_candidates_limits_the_shortlist():
+    candidates = extract_candidates("ckd, htn, t2dm, gout")
+
+    assert format_candidates([]) == ""
+    text = format_candidates(candidates, limit=2)
+    assert text.count("\n- ") == 2
+
+
+def test_coder_prompt_carries_the_shortlist(tmp_path):
+    RecordingAgent.prompts = []
+    swarm = MedicalCoderSwarm(
+        patient_id="P-1",
+        patient_documentation="Known type 2 diabetes and HTN.",
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=RecordingAgent),
+    )
+    swarm.run("Code this visit")
+
+    coder_prompt = dict(RecordingAgent.prompts)["medical_coder"]
+    assert "Candidate ICD-10 codes" in coder_prompt
+    assert "E11.9" in coder_prompt
+    assert "I10" in coder_prompt
+
+
+def test_candidate_extraction_can_be_disabled(tmp_path):
+    swarm = MedicalCoderSwarm(
+        patient_documentation="Known type 2 diabetes.",
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=RecordingAgent),
+        candidate_extraction=False,
+    )
+
+    assert "Candidate ICD-10" not in swarm._build_case_info("task")
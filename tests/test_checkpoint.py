@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+import time
+from datetime import timedelta
+
+from mcs.agents import AgentPool
+from mcs.checkpoint import (
+    CheckpointStore,
+    RunCheckpoint,
+    StageCheckpoint,
+)
+from mcs.main import MCSAgentOutputs, MCSOutput, MedicalCoderSwarm
+
+os.environ.setdefault("MASTER_KEY", "test_master_key")
+
+
+class FailingTreatmentAgent:
+    """The treatment agent fails while ``failing`` is set."""
+
+    failing = True
+    calls = {}
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str) -> str:
+        calls = FailingTreatmentAgent.calls
+        calls[self.agent_name] = calls.get(self.agent_name, 0) + 1
+        if self.agent_name == "treatment_agent" and self.failing:
+            raise RuntimeError("provider error")
+        return f"{self.agent_name} output"
+
+
+def make_swarm(tmp_path):
+    FailingTreatmentAgent.failing = True
+    FailingTreatmentAgent.calls = {}
+    return MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=FailingTreatmentAgent),
+        checkpoint_store=CheckpointStore(
+            str(tmp_path / "checkpoints")
+        ),
+    )
+
+
+def test_failed_run_resumes_at_first_incomplete_stage(
+    tmp_path, capsys
+):
+    swarm = make_swarm(tmp_path)
+
+    assert swarm.run("Assess eGFR 59") is None
+    run_id = swarm.output_schema.run_id
+    checkpoint = swarm.checkpoint_store.load(run_id)
+    assert list(checkpoint.stages) == ["medical_coder", "synthesizer"]
+    assert f"resume it with run(resume='{run_id}')" in (
+        capsys.readouterr().out
+    )
+
+    FailingTreatmentAgent.failing = False
+    output = json.loads(swarm.run(resume=run_id))
+
+    assert output["run_id"] == run_id
+    assert [o["agent_output"] for o in output["agent_outputs"]] == [
+        "medical_coder output",
+        "synthesizer output",
+        "treatment_agent output",
+    ]
+    # Only the failed stage was paid for twice
+    assert FailingTreatmentAgent.calls == {
+        "medical_coder": 1,
+        "synthesizer": 1,
+        "treatment_agent": 2,
+    }
+    assert swarm.checkpoint_store.load(run_id) is None
+
+
+def test_async_resume(tmp_path):
+    swarm = make_swarm(tmp_path)
+
+    assert asyncio.run(swarm.arun("Assess eGFR 59")) is None
+    run_id = swarm.output_schema.run_id
+
+    FailingTreatmentAgent.failing = False
+    output = json.loads(
+        asyncio.run(swarm.arun("Assess eGFR 59", resume=run_id))
+    )
+
+    assert len(output["agent_outputs"]) == 3
+    assert FailingTreatmentAgent.calls["synthesizer"] == 1
+
+
+def test_resume_rejects_a_different_task(tmp_path, capsys):
+    swarm = make_swarm(tmp_path)
+    swarm.run("Assess eGFR 59")
+    run_id = swarm.output_schema.run_id
+
+    assert swarm.run("Another case", resume=run_id) is None
+    assert (
+        "was started for a different task" in capsys.readouterr().out
+    )
+
+
+def test_resume_rejects_another_patient_or_documentation(
+    tmp_path, capsys
+):
+    def swarm_for(patient_id, documentation):
+        return MedicalCoderSwarm(
+            patient_id=patient_id,
+            patient_documentation=documentation,
+            key_storage_path=str(tmp_path / "keys"),
+            agent_pool=AgentPool(agent_factory=FailingTreatmentAgent),
+            checkpoint_store=CheckpointStore(
+                str(tmp_path / "checkpoints")
+            ),
+        )
+
+    FailingTreatmentAgent.failing = True
+    first = swarm_for("p1", "eGFR 59")
+    first.run("Assess CKD")
+    run_id = first.output_schema.run_id
+    capsys.readouterr()
+
+    FailingTreatmentAgent.failing = False
+    assert swarm_for("p2", "eGFR 59").run(resume=run_id) is None
+    assert swarm_for("p1", "eGFR 29").run(resume=run_id) is None
+    assert (
+        capsys.readouterr().out.count(
+            "was started for a different patient or documentation"
+        )
+        == 2
+    )
+
+    output = json.loads(swarm_for("p1", "eGFR 59").run(resume=run_id))
+    assert output["run_id"] == run_id
+
+
+def test_encrypted_checkpoints_round_trip(tmp_path):
+    swarm = make_swarm(tmp_path)
+    store = CheckpointStore(
+        str(tmp_path / "encrypted"),
+        secure_handler=swarm.secure_handler,
+    )
+    checkpoint = RunCheckpoint(run_id="run-1", task="Assess eGFR 59")
+
+    store.save_stage(
+        checkpoint,
+        "medical_coder",
+        StageCheckpoint(agent_name="medical_coder", output="N18.30"),
+    )
+
+    (name,) = os.listdir(store.directory)
+    with open(os.path.join(store.directory, name)) as file:
+        assert "N18.30" not in file.read()
+    loaded = store.load("run-1")
+    assert loaded.task == "Assess eGFR 59"
+    assert loaded.stages["medical_coder"].output == "N18.30"
+
+
+def test_prune_removes_stale_checkpoints(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints"))
+    store.save_stage(
+        RunCheckpoint(run_id="old"), "a", StageCheckpoint("a", "x")
+    )
+    path = store._path("old")
+    stale = time.time() - 7200
+    os.utime(path, (stale, stale))
+    store.save_stage(
+        RunCheckpoint(run_id="new"), "a", StageCheckpoint("a", "x")
+    )
+
+    assert store.prune(timedelta(hours=1)) == 1
+    assert store.load("old") is None
+    assert store.load("new") is not None
+
+
+def test_output_ids_and_timestamps_are_per_instance():
+    first = MCSOutput(patient_id="P-1", summary="")
+    second = MCSOutput(patient_id="P-1", summary="")
+    assert first.run_id != second.run_id
+    assert MCSAgentOutputs().agent_id != MCSAgentOutputs().agent_id
@@ -0,0 +1,125 @@
+import os
+import re
+import threading
+import time
+
+from mcs.agents import AgentPool
+from mcs.chunking import (
+    ICD10Finding,
+    chunk_pages,
+    extract_icd10_findings,
+    merge_findings,
+    split_pages,
+)
+from mcs.main import MedicalCoderSwarm
+
+
+def test_split_pages_prefers_form_feeds_then_markers():
+    assert [p.number for p in split_pages("one\ftwo\f\fthree")] == [
+        1,
+        2,
+        4,
+    ]
+
+    pages = split_pages(
+        "intake\nPage 3 of 9\nbody\n--- Page 4 ---\nmore"
+    )
+    assert [p.number for p in pages] == [0, 3, 4]
+    assert pages[1].text.strip() == "body"
+
+    pseudo = split_pages("line\n" * 100, fallback_page_chars=50)
+    assert all(len(p.text) <= 50 for p in pseudo)
+
+
+def test_chunk_pages_respects_budget_and_keeps_markers():
+    pages = split_pages(
+        "\f".join(f"note {i} " * 20 for i in range(30))
+    )
+    chunks = chunk_pages(pages, max_chars=500)
+
+    assert all(len(c.text) <= 500 for c in chunks)
+    assert chunks[0].first_page == 1
+    assert chunks[-1].last_page == 30
+    assert "[Page 1]" in chunks[0].text
+
+
+def test_findings_merge_with_page_references():
+    output = (
+        "1. **Primary Diagnosis Codes**:\n"
+        "   - **ICD-10 Code**: N18.3\n"
+        "   - **Description**: Chronic kidney disease, stage 3\n"
+        "   - **Supporting Documentation**: lab report, page 12\n"
+        "   - E11.22 Type 2 diabetes with CKD (pages 3-4)\n"
+        "   - I10 Essential hypertension\n"
+    )
+    chunk = chunk_pages(split_pages("a\fb\fc"), max_chars=100)[0]
+
+    findings = extract_icd10_findings(output, chunk)
+    merged = merge_findings(
+        findings + [ICD10Finding("N18.3", "CKD 3", [40])]
+    )
+
+    by_code = {f.code: f for f in merged}
+    assert by_code["N18.3"].description.startswith("Chronic kidney")
+    assert by_code["N18.3"].pages == [12, 40]
+    assert by_code["E11.22"].pages == [3, 4]
+    assert by_code["I10"].pages == [1, 2, 3]
+
+
+def test_findings_skip_reasoning_and_keep_chapter_u_codes():
+    output = (
+        "<think>Maybe J12.82 or U07.1? J12.82 is not documented."
+        "</think>\n"
+        "- U07.1 COVID-19 (page 2)\n"
+        "- U09.9 Post COVID-19 condition\n"
+    )
+
+    findings = extract_icd10_findings(output)
+
+    assert [f.code for f in findings] == ["U07.1", "U09.9"]
+    assert findings[0].pages == [2]
+
+
+class PageCoder:
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str):
+        with PageCoder.lock:
+            PageCoder.active += 1
+            PageCoder.peak = max(PageCoder.peak, PageCoder.active)
+        time.sleep(0.02)
+        with PageCoder.lock:
+            PageCoder.active -= 1
+        pages = re.findall(r"\[Page (\d+)\]", task)
+        if self.agent_name != "medical_coder":
+            return f"{self.agent_name} done"
+        return "\n".join(
+            f"- N18.3 CKD stage 3 (page {p})" for p in pages
+        )
+
+
+def test_swarm_map_reduce_codes_chunks_in_parallel(tmp_path):
+    os.environ.setdefault("MASTER_KEY", "test_master_key")
+    documentation = "\f".join(
+        f"eGFR 45 noted on visit {i}. " * 40 for i in range(40)
+    )
+    swarm = MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=PageCoder),
+        patient_documentation=documentation,
+        map_reduce=True,
+        chunk_max_chars=4000,
+        chunk_max_workers=4,
+    )
+
+    swarm.run("Code the full record")
+
+    coder_output = swarm.output_schema.agent_outputs[0].agent_output
+    assert coder_output.count("N18.3") == 1
+    assert "(pages: 1-40)" in coder_output
+    assert 1 < PageCoder.peak <= 4
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import os
+
+from mcs.agents import AgentPool
+from mcs.budget import RunBudget
+from mcs.confidence import EarlyExitPolicy, parse_confidence
+from mcs.main import MedicalCoderSwarm
+
+os.environ.setdefault("MASTER_KEY", "test_master_key")
+
+CASE = "45-year-old male, eGFR 52 ml/min, CKD stage 3."
+
+CONFIDENT = (
+    "1. **Primary Diagnosis Codes**:\n"
+    "    - **ICD-10 Code**: N18.30\n"
+    "6. **Confidence**: 0.92\n"
+)
+
+
+class CoderAgent:
+    """The coder answers with ``output``; other stages name their input."""
+
+    output = CONFIDENT
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str) -> str:
+        if self.agent_name == "medical_coder":
+            return CoderAgent.output
+        source = task.split("From ", 1)[1].split(" ", 1)[0]
+        return f"{self.agent_name} read {source}"
+
+
+def make_swarm(tmp_path, output, **kwargs):
+    CoderAgent.output = output
+    return MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=CoderAgent),
+        early_exit=EarlyExitPolicy(),
+        **kwargs,
+    )
+
+
+def test_parse_confidence_reads_numbers_percentages_and_words():
+    assert parse_confidence("**Confidence**: 0.92") == 0.92
+    assert parse_confidence("Confidence level: 85%") == 0.85
+    assert parse_confidence("confidence = 70") == 0.7
+    assert parse_confidence("- **Confidence**: High") == 0.85
+    assert (
+        parse_confidence(
+            "<think>Confidence: 0.99?</think>Confidence: low"
+        )
+        == 0.3
+    )
+    assert parse_confidence("No stated certainty") is None
+
+
+def test_check_lists_every_failed_criterion():
+    policy = EarlyExitPolicy()
+
+    check = policy.check(CONFIDENT, CASE)
+    assert check.confident
+    assert check.codes == ["N18.30"]
+    assert check.agreement == 1.0
+    assert check.valid is None
+
+    check = policy.check("ICD-10 Code: E11.9\nConfidence: 0.5", CASE)
+    assert not check.confident
+    assert check.reasons == [
+        "agreement 0.00 < 0.5",
+        "confidence 0.50 < 0.8",
+    ]
+
+
+def test_confident_coder_skips_the_synthesizer(tmp_path):
+    swarm = make_swarm(tmp_path, CONFIDENT)
+
+    output = json.loads(swarm.run(CASE))
+
+    outputs = {
+        o["agent_name"]: o["agent_output"]
+        for o in output["agent_outputs"]
+    }
+    assert list(outputs) == ["medical_coder", "treatment_agent"]
+    assert (
+        outputs["treatment_agent"]
+        == "treatment_agent read medical_coder"
+    )
+    report = output["early_exit"]
+    assert report["confident"] is True
+    assert report["self_reported"] == 0.92
+    assert report["skipped"] == ["synthesizer"]
+    assert [c["code"] for c in output["codes"]] == ["N18.30"]
+
+
+def test_ambiguous_coder_runs_the_full_chain(tmp_path):
+    swarm = make_swarm(
+        tmp_path, "ICD-10 Code: N18.30\nCoding notes: unclear stage"
+    )
+
+    output = json.loads(asyncio.run(swarm.arun(CASE)))
+
+    assert [o["agent_name"] for o in output["agent_outputs"]] == [
+        "medical_coder",
+        "synthesizer",
+        "treatment_agent",
+    ]
+    assert output["agent_outputs"][-1]["agent_output"] == (
+        "treatment_agent read synthesizer"
+    )
+    report = output["early_exit"]
+    assert report["confident"] is False
+    assert report["reasons"] == ["no confidence reported"]
+    assert report["skipped"] == []
+
+
+def test_early_exit_is_not_reported_as_a_budget_skip(tmp_path):
+    swarm = make_swarm(
+        tmp_path, CONFIDENT, budget=RunBudget(max_dollars=1.0)
+    )
+
+    output = json.loads(swarm.run(CASE))
+
+    assert output["early_exit"]["skipped"] == ["synthesizer"]
+    assert output["budget"]["skipped"] == {}
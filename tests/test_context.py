@@ -0,0 +1,87 @@
+import os
+
+from mcs.agents import AgentPool
+from mcs.context import (
+    ContextPacker,
+    ContextSection,
+    estimate_tokens,
+    trim_text,
+)
+from mcs.main import MedicalCoderSwarm
+
+
+def test_estimate_tokens_is_length_based():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("x" * 4001) == 1001
+
+
+def test_pack_keeps_everything_under_budget():
+    sections = [
+        ContextSection("a", "alpha "),
+        ContextSection("b", "beta", required=True),
+    ]
+    packed = ContextPacker(100).pack(sections)
+
+    assert packed.text == "alpha beta"
+    assert not packed.trimmed and not packed.dropped
+
+
+def test_pack_trims_by_priority_and_keeps_required():
+    sections = [
+        ContextSection("rag", "r" * 4000),
+        ContextSection("header", "HEADER ", required=True),
+        ContextSection("docs", "d" * 4000, priority=1),
+        ContextSection("task", " TASK", required=True),
+    ]
+    packed = ContextPacker(600, min_section_tokens=64).pack(sections)
+
+    assert packed.tokens <= 600
+    assert packed.dropped == ["rag"]
+    assert packed.trimmed == ["docs"]
+    assert packed.text.startswith("HEADER d")
+    assert packed.text.endswith("d TASK")
+
+
+def test_trim_text_keeps_head_and_tail():
+    text = "HEAD" + "x" * 100 + "TAIL"
+    trimmed = trim_text(text, 30, "...")
+
+    assert len(trimmed) == 30
+    assert trimmed.startswith("HEAD") and trimmed.endswith("TAIL")
+
+
+class RecordingAgent:
+    inputs = []
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str):
+        RecordingAgent.inputs.append(task)
+        return "o" * 20000
+
+
+def test_swarm_stage_inputs_respect_budgets(tmp_path):
+    os.environ.setdefault("MASTER_KEY", "test_master_key")
+    swarm = MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=RecordingAgent),
+        patient_documentation="note " * 10000,
+        stage_token_budgets={
+            "medical_coder": 1000,
+            "synthesizer": 500,
+        },
+    )
+    RecordingAgent.inputs = []
+
+    swarm.run("Code eGFR 59")
+
+    coder_input, synthesizer_input, treatment_input = (
+        RecordingAgent.inputs
+    )
+    assert estimate_tokens(coder_input) <= 1000
+    assert coder_input.rstrip().endswith("Task: Code eGFR 59")
+    assert estimate_tokens(synthesizer_input) <= 500
+    assert synthesizer_input.startswith("From medical_coder ")
+    assert estimate_tokens(treatment_input) <= 8000
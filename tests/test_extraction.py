@@ -0,0 +1,108 @@
+import json
+import os
+
+from mcs.agents import AgentPool
+from mcs.extraction import codes_by_category, merge_codes, parse_codes
+from mcs.main import MedicalCoderSwarm, MCSOutput
+
+os.environ.setdefault("MASTER_KEY", "test_master_key")
+
+CODER_OUTPUT = """<think>Could be E11.9, but the CKD link makes it E11.22</think>
+1. **Primary Diagnosis Codes**:
+    - **ICD-10 Code**: N18.30
+    - **Description**: Chronic kidney disease, stage 3 unspecified
+    - **Supporting Documentation**: eGFR 59 on lab report (page 2)
+
+2. **Secondary Diagnosis Codes**:
+    - **ICD-10 Code**: I10
+    - **Description**: Essential hypertension
+    - **Order of Clinical Significance**: 2
+    - **ICD-10 Code**: E11.22
+    - **Description**: Type 2 diabetes mellitus without complications
+    - **Order of Clinical Significance**: 1
+
+3. **Symptom Codes**:
+    - **ICD-10 Code**: R53.83
+    - **Description**: Other fatigue
+"""
+
+SYNTHESIZER_OUTPUT = """Coding Summary:
+- E11.22 Type 2 DM with diabetic CKD
+- R80.9 Proteinuria - evidence: microalbuminuria 300 mg/g
+"""
+
+
+def test_parse_follows_sections_and_labels():
+    records = parse_codes(CODER_OUTPUT, "coder")
+
+    assert [r.code for r in records] == [
+        "N18.30",
+        "I10",
+        "E11.22",
+        "R53.83",
+    ]
+    primary = records[0]
+    assert primary.category == "primary"
+    assert primary.description.startswith("Chronic kidney disease")
+    assert primary.evidence == ["eGFR 59 on lab report (page 2)"]
+    assert records[1].category == "secondary"
+    assert records[1].rank == 2
+    assert records[3].category == "symptom"
+
+
+def test_reasoning_blocks_are_ignored():
+    codes = {r.code for r in parse_codes(CODER_OUTPUT)}
+    assert "E11.9" not in codes
+
+
+def test_inline_descriptions_and_evidence():
+    (record,) = parse_codes(
+        "- R80.9 Proteinuria - evidence: UACR 300"
+    )
+    assert record.description == "Proteinuria"
+    assert record.evidence == ["UACR 300"]
+
+
+def test_merge_ranks_by_category_then_stated_rank():
+    codes = merge_codes(
+        [("coder", CODER_OUTPUT), ("synthesizer", SYNTHESIZER_OUTPUT)]
+    )
+
+    assert [(c.code, c.rank) for c in codes] == [
+        ("N18.30", 1),
+        ("E11.22", 2),
+        ("I10", 3),
+        ("R53.83", 4),
+        ("R80.9", 5),
+    ]
+    e1122 = codes[1]
+    assert e1122.agents == ["coder", "synthesizer"]
+    assert e1122.description.startswith("Type 2 diabetes mellitus")
+    grouped = codes_by_category(codes)
+    assert [c.code for c in grouped["secondary"]] == ["E11.22", "I10"]
+
+
+class ScriptedAgent:
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str) -> str:
+        if self.agent_name == "medical_coder":
+            return CODER_OUTPUT
+        if self.agent_name == "synthesizer":
+            return SYNTHESIZER_OUTPUT
+        return "Continue current care."
+
+
+def test_swarm_output_carries_typed_codes(tmp_path):
+    swarm = MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=ScriptedAgent),
+    )
+    output = MCSOutput.model_validate_json(swarm.run("eGFR 59"))
+
+    assert [c.code for c in output.codes][:2] == ["N18.30", "E11.22"]
+    assert output.codes[0].category == "primary"
+    assert (
+        json.loads(output.model_dump_json())["codes"][0]["rank"] == 1
+    )
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from dotenv import load_dotenv
+
+from mcs.agents import (
+    AgentPool,
+    DeferredAgentFactory,
+    create_agent,
+    default_agent_factory,
+)
+from mcs.context import estimate_tokens
+from mcs.fake_agents import (
+    FakeAgent,
+    FakeAgentError,
+    FakeAgentFactory,
+    FakeProfile,
+    lognormal,
+    uniform,
+)
+from mcs.main import MedicalCoderSwarm
+
+os.environ.setdefault("MASTER_KEY", "test_master_key")
+
+
+def test_fake_agents_are_deterministic():
+    profile = FakeProfile(output_tokens=uniform(50, 500))
+    first = [
+        FakeAgent("synthesizer", profile, seed=7) for _ in range(2)
+    ]
+
+    outputs = [
+        [agent.run(task) for task in ("case a", "case b", "case a")]
+        for agent in first
+    ]
+
+    assert outputs[0] == outputs[1]
+    # Repeated tasks are separate calls and may differ
+    assert outputs[0][0] != outputs[0][2]
+    assert (
+        FakeAgent("synthesizer", profile, seed=8).run("case a")
+        != outputs[0][0]
+    )
+
+
+def test_output_size_and_codes():
+    agent = FakeAgent(
+        "medical_coder", FakeProfile(output_tokens=1000)
+    )
+
+    output = agent.run("case")
+
+    assert abs(estimate_tokens(output) - 1000) <= 2
+    assert "ICD-10 " in output
+
+
+def test_failure_rate_and_latency():
+    agent = FakeAgent(
+        "synthesizer",
+        FakeProfile(latency=lognormal(0.002), failure_rate=0.3),
+    )
+    failures = 0
+    start = time.perf_counter()
+    for index in range(200):
+        try:
+            agent.run(f"case {index}")
+        except FakeAgentError:
+            failures += 1
+    elapsed = time.perf_counter() - start
+
+    assert 30 <= failures <= 90
+    assert elapsed >= 200 * 0.001
+
+
+def test_swarm_runs_offline_on_fakes(tmp_path):
+    factory = FakeAgentFactory(
+        profiles={"treatment_agent": FakeProfile(failure_rate=1.0)}
+    )
+    swarm = MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=factory),
+        max_retries=1,
+    )
+
+    output = json.loads(swarm.run("Assess eGFR 59") or "{}")
+    assert output == {}
+
+    factory.profiles = {}
+    swarm = MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=factory),
+    )
+    output = json.loads(asyncio.run(swarm.arun("Assess eGFR 59")))
+    assert len(output["agent_outputs"]) == 3
+    assert output["codes"]
+
+
+def test_backend_is_chosen_from_the_environment(monkeypatch):
+    monkeypatch.setenv("MCS_AGENT_BACKEND", "fake")
+    monkeypatch.setenv("MCS_FAKE_OUTPUT_TOKENS", "40")
+    factory = default_agent_factory()
+    agent = factory("medical_coder", model_name="small")
+    assert agent.model_name == "small"
+    assert estimate_tokens(agent.run("case")) == 40
+
+    monkeypatch.delenv("MCS_AGENT_BACKEND")
+    assert default_agent_factory() is create_agent
+    monkeypatch.setenv("MCS_AGENT_BACKEND", "other")
+    with pytest.raises(ValueError):
+        default_agent_factory()
+
+
+def test_backend_set_in_dotenv_after_import_is_used(
+    tmp_path, monkeypatch
+):
+    # Recorded so the value loaded from .env is undone afterwards
+    monkeypatch.setenv("MCS_AGENT_BACKEND", "swarms")
+    monkeypatch.delenv("MCS_AGENT_BACKEND")
+    factory = DeferredAgentFactory()
+    # mcs.main loads .env after mcs.agents built its shared factory
+    env_file = tmp_path / ".env"
+    env_file.write_text("MCS_AGENT_BACKEND=fake\n")
+    load_dotenv(env_file)
+
+    assert isinstance(factory("medical_coder"), FakeAgent)
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from mcs.agents import AgentPool
+from mcs.hooks import (
+    HookSet,
+    MCSHook,
+    OpenTelemetryHook,
+    ProfilerHook,
+)
+from mcs.main import MedicalCoderSwarm
+
+os.environ.setdefault("MASTER_KEY", "test_master_key")
+
+
+class EchoAgent:
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str) -> str:
+        if "boom" in task and self.agent_name == "synthesizer":
+            raise RuntimeError("provider error")
+        return f"{self.agent_name}: {task}"
+
+
+class RecordingHook(MCSHook):
+    def __init__(self):
+        self.events = []
+
+    def on_run_start(self, run):
+        self.events.append(("run_start", run.task))
+
+    def on_stage_start(self, run, stage):
+        self.events.append(("stage_start", stage.name))
+
+    def on_stage_end(self, run, stage, result):
+        assert result.stats.wall_time >= 0
+        self.events.append(("stage_end", stage.name))
+
+    def on_error(self, run, error, stage=None):
+        self.events.append(
+            ("error", stage.name if stage else None, str(error))
+        )
+
+    def on_run_end(self, run, output):
+        if output is not None:
+            assert json.loads(output)["agent_outputs"]
+        self.events.append(("run_end", output is not None))
+
+
+class AsyncHook(MCSHook):
+    def __init__(self):
+        self.stages = []
+
+    async def on_stage_end(self, run, stage, result):
+        await asyncio.sleep(0)
+        self.stages.append(stage.name)
+
+
+def make_swarm(tmp_path, hooks, **kwargs):
+    return MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=EchoAgent),
+        hooks=hooks,
+        **kwargs,
+    )
+
+
+STAGES = ["medical_coder", "synthesizer", "treatment_agent"]
+
+
+def test_hooks_see_run_and_stage_boundaries(tmp_path):
+    hook = RecordingHook()
+    swarm = make_swarm(tmp_path, [hook])
+
+    swarm.run("Assess eGFR 59")
+
+    expected = [("run_start", "Assess eGFR 59")]
+    for stage in STAGES:
+        expected += [("stage_start", stage), ("stage_end", stage)]
+    expected.append(("run_end", True))
+    assert hook.events == expected
+
+
+def test_sync_and_async_hooks_work_in_both_modes(tmp_path):
+    recording, coroutine = RecordingHook(), AsyncHook()
+    swarm = make_swarm(tmp_path, [recording, coroutine])
+
+    swarm.run("Assess eGFR 59")
+    assert coroutine.stages == STAGES
+
+    asyncio.run(swarm.arun("Assess eGFR 59"))
+    assert coroutine.stages == STAGES * 2
+    assert recording.events.count(("run_end", True)) == 2
+
+
+def test_errors_are_reported_once(tmp_path):
+    hook = RecordingHook()
+    swarm = make_swarm(tmp_path, [hook])
+
+    swarm.run("boom")
+
+    errors = [event for event in hook.events if event[0] == "error"]
+    assert errors == [("error", "synthesizer", "provider error")]
+    assert hook.events[-1] == ("run_end", False)
+
+
+def test_failing_hooks_do_not_break_the_run(tmp_path, capsys):
+    class BrokenHook(MCSHook):
+        def on_stage_start(self, run, stage):
+            raise ValueError("bad hook")
+
+    swarm = make_swarm(tmp_path, [BrokenHook()])
+
+    output = json.loads(swarm.run("Assess eGFR 59"))
+
+    assert len(output["agent_outputs"]) == 3
+    assert (
+        "BrokenHook.on_stage_start failed" in capsys.readouterr().out
+    )
+
+
+def test_only_overridden_events_are_dispatched():
+    hooks = HookSet([AsyncHook()])
+    assert list(hooks._listeners) == ["on_stage_end"]
+    assert not HookSet()
+
+
+def test_cprofile_hook_writes_a_profile(tmp_path):
+    hook = ProfilerHook("cprofile", output_dir=str(tmp_path / "prof"))
+    swarm = make_swarm(tmp_path, [hook])
+
+    swarm.run("Assess eGFR 59")
+
+    assert os.path.exists(hook.last_path)
+    functions = {name for (_, _, name) in hook.last_profile.stats}
+    # Stage worker threads are profiled too
+    assert "run" in functions
+
+
+def test_profiler_hook_samples_runs(tmp_path):
+    hook = ProfilerHook("cprofile", every=2)
+    swarm = make_swarm(tmp_path, [hook])
+
+    swarm.run("one")
+    first = hook.last_profile
+    swarm.run("two")
+    assert hook.last_profile is first
+    swarm.run("three")
+    assert hook.last_profile is not first
+
+
+def test_opentelemetry_hook_nests_stage_spans(tmp_path):
+    sdk_trace = pytest.importorskip("opentelemetry.sdk.trace")
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+        InMemorySpanExporter,
+    )
+
+    exporter = InMemorySpanExporter()
+    provider = sdk_trace.TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    hook = OpenTelemetryHook(provider.get_tracer("test"))
+    swarm = make_swarm(tmp_path, [hook])
+
+    swarm.run("Assess eGFR 59")
+    swarm.run("boom")
+
+    spans = exporter.get_finished_spans()
+    runs = [span for span in spans if span.name == "mcs.run"]
+    assert len(runs) == 2
+    coder = next(
+        s for s in spans if s.name == "mcs.stage.medical_coder"
+    )
+    assert coder.parent.span_id == runs[0].context.span_id
+    assert coder.attributes["mcs.prompt_tokens"] > 0
+    failed = [s for s in spans if not s.status.is_ok]
+    assert {s.name for s in failed} == {
+        "mcs.stage.synthesizer",
+        "mcs.run",
+    }
@@ -0,0 +1,168 @@
+import json
+import os
+import time
+
+import pytest
+
+from mcs.agents import AgentPool
+from mcs.icd10_index import (
+    ICD10Entry,
+    ICD10Index,
+    build_index,
+    find_codes,
+    parse_order_file,
+)
+from mcs.main import MedicalCoderSwarm
+
+os.environ.setdefault("MASTER_KEY", "test_master_key")
+
+ORDER_LINES = [
+    ("N18", "0", "Chronic kidney disease (CKD)"),
+    ("N183", "0", "Chronic kidney disease, stage 3"),
+    ("N1830", "1", "Chronic kidney disease, stage 3 unspecified"),
+    ("N1831", "1", "Chronic kidney disease, stage 3a"),
+    ("E1122", "1", "Type 2 diabetes mellitus with diabetic CKD"),
+    ("I10", "1", "Essential (primary) hypertension"),
+]
+
+
+def write_order_file(path):
+    with open(path, "w") as file:
+        for number, (code, billable, description) in enumerate(
+            ORDER_LINES, start=1
+        ):
+            file.write(
+                f"{number:05d} {code:<7} {billable} "
+                f"{description[:60]:<60} {description}\n"
+            )
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    order_file = tmp_path / "icd10cm_order.txt"
+    write_order_file(order_file)
+    path = str(tmp_path / "icd10cm.idx")
+    build_index(parse_order_file(str(order_file)), path)
+    return path
+
+
+def test_lookup_returns_description_billable_and_parent(index_path):
+    index = ICD10Index(index_path)
+
+    entry = index.lookup("n18.30")
+    assert entry == ICD10Entry(
+        code="N18.30",
+        description="Chronic kidney disease, stage 3 unspecified",
+        billable=True,
+        parent="N18.3",
+    )
+    assert index.lookup("N18.3").parent == "N18"
+    assert index.lookup("N18").parent is None
+    assert not index.lookup("N18").billable
+    assert len(index) == len(ORDER_LINES)
+
+
+def test_unknown_codes_are_not_found(index_path):
+    index = ICD10Index(index_path)
+
+    assert index.lookup("N18.39") is None
+    assert index.lookup("A00") is None
+    assert index.lookup("Z99.99999") is None
+    assert "I10" in index
+    assert "I11" not in index
+
+
+def test_every_code_round_trips(tmp_path):
+    entries = [
+        ICD10Entry(f"A{n:02d}.{m}", f"code {n} {m}", m % 2 == 0)
+        for n in range(100)
+        for m in range(10)
+    ]
+    path = str(tmp_path / "all.idx")
+    assert build_index(entries, path) == len(entries)
+
+    index = ICD10Index(path)
+    for entry in entries:
+        assert (
+            index.lookup(entry.code).description == entry.description
+        )
+
+
+def test_open_is_fast(index_path):
+    start = time.perf_counter()
+    ICD10Index(index_path).lookup("I10")
+    assert time.perf_counter() - start < 0.05
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.idx"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        ICD10Index(str(path))
+
+
+def test_find_codes_deduplicates_in_order():
+    assert find_codes("I10, N18.30 and I10 again") == [
+        "I10",
+        "N18.30",
+    ]
+
+
+class CodingAgent:
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str) -> str:
+        if self.agent_name == "medical_coder":
+            return "- N18.30 CKD stage 3\n- N18.39 made up"
+        return f"{self.agent_name} agrees with I10"
+
+
+def test_swarm_validates_emitted_codes(index_path, tmp_path):
+    swarm = MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=CodingAgent),
+        icd10_index=index_path,
+    )
+    output = json.loads(swarm.run("eGFR 45"))
+
+    validations = {v["code"]: v for v in output["code_validations"]}
+    assert list(validations) == ["N18.30", "N18.39", "I10"]
+    assert validations["N18.30"]["valid"]
+    assert validations["N18.30"]["billable"]
+    assert validations["N18.30"]["parent"] == "N18.3"
+    assert not validations["N18.39"]["valid"]
+
+
+class ThinkingAgent(CodingAgent):
+    def run(self, task: str) -> str:
+        return (
+            "<think>N18.39? No such code; N18.30 fits.</think>\n"
+            "- N18.30 CKD stage 3"
+        )
+
+
+def test_swarm_does_not_validate_codes_only_reasoned_about(
+    index_path, tmp_path
+):
+    swarm = MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=ThinkingAgent),
+        icd10_index=index_path,
+    )
+    output = json.loads(swarm.run("eGFR 45"))
+
+    assert [v["code"] for v in output["code_validations"]] == [
+        "N18.30"
+    ]
+
+
+def test_swarm_without_index_skips_validation(tmp_path, monkeypatch):
+    monkeypatch.delenv("MCS_ICD10_INDEX", raising=False)
+    swarm = MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=CodingAgent),
+    )
+    output = json.loads(swarm.run("eGFR 45"))
+
+    assert output["code_validations"] is None
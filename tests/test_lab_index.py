@@ -0,0 +1,143 @@
+import json
+import os
+
+from mcs.agents import AgentPool
+from mcs.lab_index import (
+    LabDiagnosisIndex,
+    LabRule,
+    format_lab_diagnoses,
+)
+from mcs.labs import evaluate_labs, extract_labs
+from mcs.main import MedicalCoderSwarm
+
+os.environ.setdefault("MASTER_KEY", "test_master_key")
+
+
+def codes(diagnoses):
+    return [d.code for d in diagnoses]
+
+
+def test_lookup_respects_half_open_ranges():
+    index = LabDiagnosisIndex()
+
+    assert "N18.31" in codes(index.lookup("egfr", 45))
+    assert "N18.32" in codes(index.lookup("egfr", 44.9))
+    assert codes(index.lookup("egfr", 95)) == []
+    assert "E11.65" in codes(index.lookup("hba1c", 12))
+
+
+def test_overlapping_rules_are_all_returned():
+    index = LabDiagnosisIndex(
+        [
+            LabRule("egfr", 0, 60, "A", "a"),
+            LabRule("egfr", 30, 45, "B", "b"),
+            LabRule("egfr", 40, float("inf"), "C", "c"),
+        ]
+    )
+
+    assert sorted(codes(index.lookup("egfr", 42))) == ["A", "B", "C"]
+    assert codes(index.lookup("egfr", 20)) == ["A"]
+    assert codes(index.lookup("egfr", 100)) == ["C"]
+    assert codes(index.lookup("potassium", 5)) == []
+
+
+def test_query_supports_and_contradicts():
+    labs = evaluate_labs(extract_labs("eGFR 52, HbA1c 8.2%, K+ 4.1"))
+    supporting, contradicting = LabDiagnosisIndex().query(
+        labs, codes=["N18.31", "N18.4", "E87.5", "I10"]
+    )
+
+    assert {"N18.31", "N18.30", "E11.9"} <= set(codes(supporting))
+    # eGFR defines the CKD stage; a normal potassium may be treated
+    assert codes(contradicting) == ["N18.4"]
+    assert contradicting[0].evidence == ["egfr=52"]
+
+
+def test_values_alone_do_not_imply_combination_codes():
+    labs = evaluate_labs(
+        extract_labs("HbA1c 7.1%, UACR 45 mg/g, Hgb 10.2, eGFR 75")
+    )
+    supporting, _ = LabDiagnosisIndex().query(labs, codes=())
+
+    assert {"E11.9", "R80.9"} <= set(codes(supporting))
+    assert not {"E11.22", "D63.1", "N18.2"} & set(codes(supporting))
+
+
+def test_treated_diabetes_is_not_contradicted():
+    labs = evaluate_labs(extract_labs("HbA1c 6.1% on metformin"))
+    supporting, contradicting = LabDiagnosisIndex().query(
+        labs, codes=["E11.9"]
+    )
+
+    assert codes(supporting) == ["R73.03"]
+    assert contradicting == []
+
+
+def test_censored_results_neither_support_nor_contradict():
+    labs = evaluate_labs(extract_labs("eGFR >60 ml/min"))
+    supporting, contradicting = LabDiagnosisIndex().query(
+        labs, codes=["N18.31", "N18.4"]
+    )
+
+    assert codes(supporting) == []
+    assert codes(contradicting) == []
+
+
+def test_sex_specific_rules():
+    labs = evaluate_labs(extract_labs("Hgb 12.8 g/dL"))
+    index = LabDiagnosisIndex()
+
+    assert "D64.9" in codes(
+        index.query(labs, sex="male", codes=())[0]
+    )
+    assert codes(index.query(labs, sex="female", codes=())[0]) == []
+    assert codes(index.query(labs, codes=())[0]) == []
+
+
+def test_rules_from_csv(tmp_path):
+    path = tmp_path / "rules.csv"
+    path.write_text(
+        "test,low,high,code,description,defining\n"
+        "potassium,5.5,,E87.5,Hyperkalemia,\n"
+        "egfr,,15,N18.5,CKD stage 5,true\n"
+    )
+    index = LabDiagnosisIndex.from_csv(str(path))
+
+    assert codes(index.lookup("potassium", 6.0)) == ["E87.5"]
+    assert codes(index.lookup("potassium", 5.0)) == []
+    assert [rule.defining for rule in index.rules] == [False, True]
+
+
+def test_format_lab_diagnoses():
+    labs = evaluate_labs(extract_labs("eGFR 52"))
+    supporting, _ = LabDiagnosisIndex().query(labs, codes=())
+
+    text = format_lab_diagnoses(supporting)
+    assert "N18.31 Chronic kidney disease, stage 3a (egfr=52)" in text
+    assert format_lab_diagnoses([]) == ""
+
+
+class CoderAgent:
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str) -> str:
+        if self.agent_name == "medical_coder":
+            assert "Diagnoses indicated by lab ranges" in task
+            return "- N18.4 CKD stage 4\n- N18.31 CKD stage 3a"
+        return "ok"
+
+
+def test_swarm_records_lab_support(tmp_path):
+    swarm = MedicalCoderSwarm(
+        patient_documentation="eGFR: 52 ml/min/1.73m2",
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=CoderAgent),
+    )
+    output = json.loads(swarm.run("Code this visit"))
+
+    verdicts = {
+        d["code"]: d["supporting"] for d in output["lab_diagnoses"]
+    }
+    assert verdicts["N18.31"] is True
+    assert verdicts["N18.4"] is False
@@ -0,0 +1,173 @@
+import os
+
+import numpy as np
+import pytest
+
+from mcs.agents import AgentPool
+from mcs.labs import (
+    TEST_NAMES,
+    evaluate_labs,
+    extract_labs,
+    format_lab_flags,
+    lab_context,
+    parse_demographics,
+)
+from mcs.main import MedicalCoderSwarm
+
+os.environ.setdefault("MASTER_KEY", "test_master_key")
+
+LABS = """
+Lab Results:
+- eGFR: 59 ml/min/1.73m² (Non-African American)
+- Serum Creatinine: 1.5 mg/dL
+- BUN: 22 mg/dL
+- Potassium: 4.8 mmol/L
+- HbA1c: 8.2%
+- Urinalysis: Microalbuminuria detected (300 mg/g creatinine)
+- Glycemic control improvement (target HbA1c <7%)
+"""
+
+
+def test_extracts_tests_values_and_positions():
+    labs = extract_labs(LABS)
+
+    assert [TEST_NAMES[t] for t in labs.tests] == [
+        "egfr",
+        "creatinine",
+        "bun",
+        "potassium",
+        "hba1c",
+        "uacr",
+    ]
+    assert labs.values.tolist() == [59, 1.5, 22, 4.8, 8.2, 300]
+    assert LABS[labs.positions[1] :].lower().startswith("serum")
+
+
+def test_units_are_converted_to_canonical():
+    labs = extract_labs("Creatinine 132.6 umol/L, glucose 7 mmol/L")
+
+    np.testing.assert_allclose(labs.values, [1.5, 126.0])
+
+
+def test_flags_use_age_and_sex_specific_ranges():
+    labs = extract_labs(
+        "Creatinine 1.2 mg/dL. eGFR 70. Hgb 12.5 g/dL"
+    )
+
+    male = evaluate_labs(labs, age=45, sex="male").flags.tolist()
+    assert male == ["N", "L", "L"]
+    female = evaluate_labs(labs, age=45, sex="female").flags.tolist()
+    assert female == ["H", "L", "N"]
+    older = evaluate_labs(labs, age=80, sex="male").flags.tolist()
+    assert older == ["N", "N", "L"]
+
+
+def test_critical_values_are_flagged():
+    labs = evaluate_labs(extract_labs("K+ 7.1 mmol/L, Na+ 118"))
+
+    assert labs.flags.tolist() == ["HH", "LL"]
+
+
+def test_censored_values_keep_their_comparator():
+    labs = evaluate_labs(
+        extract_labs("eGFR >60. eGFR <15 ml/min. Hgb >= 18")
+    )
+
+    assert labs.comparators.tolist() == [">", "<", ">="]
+    assert labs.values.tolist() == [60, 15, 18]
+    # ">60" may well be normal; "<15" and ">=18" cannot be
+    assert labs.flags.tolist() == ["?", "LL", "H"]
+    assert lab_context("eGFR >60") == ""
+
+
+def test_dates_and_durations_are_not_values():
+    labs = extract_labs(
+        "Creatinine (2023-05-01): 1.8 mg/dL\n"
+        "Potassium 3 days ago 5.9\n"
+        "BUN on 05/01/23 was 22\n"
+        "eGFR checked 2 weeks ago\n"
+    )
+
+    assert [TEST_NAMES[t] for t in labs.tests] == [
+        "creatinine",
+        "potassium",
+        "bun",
+    ]
+    assert labs.values.tolist() == [1.8, 5.9, 22]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Potassium chloride 20 mEq tablet daily",
+        "Calcium carbonate 500 mg with meals",
+        "GFR category G3a",
+        "Creatinine clearance reviewed, on 2 agents",
+        "HbA1c checked x2 this year",
+    ],
+)
+def test_drugs_and_categories_are_not_results(text):
+    assert len(extract_labs(text)) == 0
+
+
+def test_flags_use_the_latest_value_per_test():
+    labs = evaluate_labs(
+        extract_labs(
+            "eGFR 52 mL/min (2024-01-05)\n"
+            "eGFR 95 mL/min (2024-06-01)\n"
+            "UACR 40 mg/g\nUACR 300 mg/g"
+        )
+    )
+    text = format_lab_flags(labs)
+
+    assert "eGFR" not in text
+    assert "UACR 300 mg/g [H; ref <=30, 2 abnormal results]" in text
+    assert "(1 result within range omitted)" in text
+
+
+def test_empty_documents():
+    labs = evaluate_labs(extract_labs(""))
+
+    assert len(labs) == 0
+    assert format_lab_flags(labs) == ""
+    assert lab_context("no labs here") == ""
+
+
+def test_demographics():
+    assert parse_demographics("Age: 45\nGender: Male") == (45, "male")
+    assert parse_demographics("67-year-old woman") == (67, "female")
+
+
+def test_context_lists_only_abnormal_results():
+    text = lab_context("Age: 45, Gender: Male\n" + LABS)
+
+    assert "eGFR 59 mL/min/1.73m2 [L; ref >=90]" in text
+    assert "UACR 300 mg/g [H; ref <=30]" in text
+    assert "Potassium" not in text
+    assert "(1 result within range omitted)" in text
+
+
+class RecordingAgent:
+    prompts = {}
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str) -> str:
+        RecordingAgent.prompts[self.agent_name] = task
+        return f"{self.agent_name} done"
+
+
+def test_coder_prompt_carries_lab_flags(tmp_path):
+    swarm = MedicalCoderSwarm(
+        patient_documentation=LABS,
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=RecordingAgent),
+    )
+    swarm.run("Code this visit")
+
+    assert (
+        "Abnormal lab results" in RecordingAgent.prompts[
+            "medical_coder"
+        ]
+    )
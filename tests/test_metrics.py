@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+import time
+
+from mcs.agents import AgentPool
+from mcs.main import MedicalCoderSwarm
+from mcs.metrics import Histogram, MetricsRegistry
+
+os.environ.setdefault("MASTER_KEY", "test_master_key")
+
+
+class FlakyAgent:
+    """Sleeps briefly; the synthesizer fails on its first call."""
+
+    calls = {}
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str) -> str:
+        time.sleep(0.02)
+        count = FlakyAgent.calls.get(self.agent_name, 0) + 1
+        FlakyAgent.calls[self.agent_name] = count
+        if self.agent_name == "synthesizer" and count == 1:
+            raise RuntimeError("rate limited")
+        return f"{self.agent_name} " + "finding " * 100
+
+
+def make_swarm(tmp_path, **kwargs):
+    FlakyAgent.calls = {}
+    return MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=FlakyAgent),
+        metrics=MetricsRegistry(),
+        max_retries=1,
+        **kwargs,
+    )
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(1, 2, 5, 10))
+    for value in (0.5, 1.5, 1.5, 3, 4, 8, 8, 8, 9, 20):
+        histogram.observe(value)
+
+    assert histogram.count == 10
+    assert histogram.sum == 63.5
+    assert histogram.quantile(0.5) == 5.0
+    assert 5 < histogram.quantile(0.8) <= 10
+    assert histogram.quantile(0.99) == 10
+    assert Histogram().quantile(0.5) is None
+
+
+def test_registry_snapshot_and_prometheus_text():
+    registry = MetricsRegistry()
+    registry.observe("latency", 0.2, stage="coder")
+    registry.observe("latency", 0.3, stage="coder")
+    registry.observe("latency", 4.0, stage="synthesizer")
+
+    series = registry.snapshot()["latency"]
+    coder = next(
+        s for s in series if s["labels"] == {"stage": "coder"}
+    )
+    assert coder["count"] == 2
+    assert coder["buckets"]["+Inf"] == 2
+
+    text = registry.to_prometheus()
+    assert "# TYPE latency histogram" in text
+    assert 'latency_count{stage="synthesizer"} 1' in text
+    assert 'latency_bucket{le="0.25",stage="coder"} 1' in text
+
+
+def test_stages_are_measured(tmp_path):
+    swarm = make_swarm(tmp_path)
+
+    output = json.loads(swarm.run("Assess eGFR 59"))
+
+    for stage in output["agent_outputs"]:
+        assert stage["wall_time"] >= 0.02
+        assert stage["queue_time"] >= 0
+        assert stage["prompt_tokens"] > 0
+        assert stage["completion_tokens"] > 200
+    retries = {
+        o["agent_name"]: o["retries"] for o in output["agent_outputs"]
+    }
+    assert retries == {
+        "medical_coder": 0,
+        "synthesizer": 1,
+        "treatment_agent": 0,
+    }
+
+    snapshot = swarm.metrics.snapshot()
+    stages = {
+        s["labels"]["stage"]
+        for s in snapshot["mcs_stage_wall_seconds"]
+    }
+    assert stages == {
+        "medical_coder",
+        "synthesizer",
+        "treatment_agent",
+    }
+    synthesizer = next(
+        s
+        for s in snapshot["mcs_stage_retries"]
+        if s["labels"]["stage"] == "synthesizer"
+    )
+    assert synthesizer["sum"] == 1
+
+
+def test_async_stages_are_measured(tmp_path):
+    swarm = make_swarm(tmp_path)
+
+    output = json.loads(asyncio.run(swarm.arun("Assess eGFR 59")))
+
+    assert all(o["wall_time"] > 0 for o in output["agent_outputs"])
+    assert output["agent_outputs"][1]["retries"] == 1
+
+
+def test_chunk_calls_count_against_the_coder_stage(tmp_path):
+    documentation = "".join(
+        f"Page {page}\nProgress note {'x' * 400}\n"
+        for page in range(6)
+    )
+    swarm = make_swarm(
+        tmp_path,
+        patient_documentation=documentation,
+        map_reduce=True,
+        chunk_max_chars=500,
+    )
+
+    output = json.loads(swarm.run("Code this visit"))
+
+    coder = output["agent_outputs"][0]
+    assert FlakyAgent.calls["medical_coder"] > 1
+    # Every chunk call adds its completion (~200 tokens each)
+    assert coder["completion_tokens"] > 200 * (
+        FlakyAgent.calls["medical_coder"] - 1
+    )
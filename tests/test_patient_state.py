@@ -0,0 +1,136 @@
+import os
+
+from mcs.agents import AgentPool
+from mcs.chunking import chunk_pages, split_pages
+from mcs.main import MedicalCoderSwarm
+from mcs.patient_state import PatientStateStore
+
+
+class PageCountingCoder:
+    coded_pages = []
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str):
+        if self.agent_name != "medical_coder":
+            return f"{self.agent_name} done"
+        lines = []
+        for line in task.splitlines():
+            if line.startswith("[Page "):
+                page = int(line[6:-1])
+                PageCountingCoder.coded_pages.append(page)
+                code = "N18.3" if page < 3 else "E11.22"
+                lines.append(f"- {code} finding (page {page})")
+        return "\n".join(lines)
+
+
+def _swarm(tmp_path, documentation, store):
+    os.environ.setdefault("MASTER_KEY", "test_master_key")
+    return MedicalCoderSwarm(
+        patient_id="patient-7",
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=PageCountingCoder),
+        patient_documentation=documentation,
+        patient_state=store,
+        chunk_max_chars=60,
+    )
+
+
+def test_only_new_and_changed_pages_are_recoded(tmp_path):
+    store = PatientStateStore(str(tmp_path / "state"))
+    pages = [
+        f"2019 visit note {i}, eGFR stable." for i in range(1, 5)
+    ]
+
+    PageCountingCoder.coded_pages = []
+    _swarm(tmp_path, "\f".join(pages), store).run("Code record")
+    assert sorted(PageCountingCoder.coded_pages) == [1, 2, 3, 4]
+
+    # A document from a later year arrives and page 2 is amended
+    pages[1] = "2019 visit note 2, amended: eGFR 45."
+    pages.append("2024 visit note, HbA1c 8.2%.")
+    PageCountingCoder.coded_pages = []
+    swarm = _swarm(tmp_path, "\f".join(pages), store)
+    swarm.run("Code record")
+
+    assert 1 not in PageCountingCoder.coded_pages
+    assert {2, 5} <= set(PageCountingCoder.coded_pages)
+    merged = swarm.output_schema.agent_outputs[0].agent_output
+    assert "**N18.3**: finding (pages: 1-2)" in merged
+    assert "**E11.22**: finding (pages: 3-5)" in merged
+
+    # Nothing changed: no coder calls at all
+    PageCountingCoder.coded_pages = []
+    _swarm(tmp_path, "\f".join(pages), store).run("Code record")
+    assert PageCountingCoder.coded_pages == []
+
+
+def test_state_is_partitioned_by_task(tmp_path):
+    store = PatientStateStore(str(tmp_path / "state"))
+    pages = split_pages("one\ftwo")
+    state = store.load("p")
+    state.add([], pages, "task a", [])
+    store.save(state)
+
+    reused, pending = store.load("p").partition(pages, "task b")
+    assert reused == [] and len(pending) == 2
+
+
+def test_restarted_page_numbers_are_separate_pages(tmp_path):
+    store = PatientStateStore(str(tmp_path / "state"))
+    first = (
+        "Page 1\n2019 intake note, history and exam\n"
+        "Page 2\n2019 labs, eGFR 59 ml/min/1.73m2\n"
+    )
+    second = (
+        "Page 1\n2024 intake note, history and exam\n"
+        "Page 2\n2024 labs, eGFR 41 ml/min/1.73m2\n"
+    )
+
+    PageCountingCoder.coded_pages = []
+    _swarm(tmp_path, first + second, store).run("Code record")
+    assert sorted(PageCountingCoder.coded_pages) == [1, 1, 2, 2]
+
+    # Only the first document's page 1 changed
+    first = first.replace("intake", "amended intake")
+    PageCountingCoder.coded_pages = []
+    _swarm(tmp_path, first + second, store).run("Code record")
+    assert PageCountingCoder.coded_pages == [1]
+
+
+def test_concurrent_saves_keep_each_others_chunks(tmp_path):
+    store = PatientStateStore(str(tmp_path / "state"))
+    pages = split_pages("one\ftwo\fthree")
+    chunks = chunk_pages(pages, max_chars=10)
+    stale = store.load("p")
+    stale.add(chunks[:1], pages, "task", ["N18.3"])
+    store.save(stale)
+
+    first, second = store.load("p"), store.load("p")
+    first.add(chunks[1:2], pages, "task", ["E11.9"])
+    second.add(chunks[2:], pages, "task", ["I10"])
+    store.save(first)
+    # The first chunk's page changed: the second run prunes it
+    second.prune(pages[1:])
+    store.save(second)
+
+    outputs = [chunk.output for chunk in store.load("p").chunks]
+    assert sorted(outputs) == ["E11.9", "I10"]
+
+
+def test_state_is_encrypted_with_the_swarm_handler(tmp_path):
+    store = PatientStateStore(str(tmp_path / "state"))
+    swarm = _swarm(tmp_path, "2019 visit note, eGFR 45.", store)
+    swarm.run("Code record")
+
+    with open(store._path("patient-7")) as file:
+        stored = file.read()
+    assert "patient-7" not in stored
+    assert "N18.3" not in stored
+    # A restarted process with the same keys reads it back
+    reopened = PatientStateStore(
+        str(tmp_path / "state"),
+        secure_handler=_swarm(tmp_path, "", None).secure_handler,
+    )
+    assert reopened.load("patient-7").chunks
@@ -0,0 +1,414 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from mcs.agents import PIPELINE_ROLES, AgentPool
+from mcs.checkpoint import CheckpointStore
+from mcs.hooks import MCSHook
+from mcs.main import MedicalCoderSwarm
+from mcs.pipeline import (
+    DEFAULT_PIPELINE,
+    BypassStage,
+    SPECIALIST_ROLES,
+    Pipeline,
+    SkipStage,
+    Stage,
+    arun_pipeline,
+    run_pipeline,
+)
+
+os.environ.setdefault("MASTER_KEY", "test_master_key")
+
+
+class SlowAgent:
+    """Records the peak number of agents running at once."""
+
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+    prompts = {}
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str) -> str:
+        with SlowAgent.lock:
+            SlowAgent.running += 1
+            SlowAgent.peak = max(SlowAgent.peak, SlowAgent.running)
+        time.sleep(0.1)
+        with SlowAgent.lock:
+            SlowAgent.running -= 1
+        SlowAgent.prompts[self.agent_name] = task
+        return f"{self.agent_name} done"
+
+    async def arun(self, task: str) -> str:
+        return await asyncio.to_thread(self.run, task)
+
+
+LAB_PIPELINE = DEFAULT_PIPELINE.with_stage(
+    Stage("lab_matcher", depends_on=("synthesizer",))
+)
+
+
+def make_swarm(tmp_path, **kwargs):
+    SlowAgent.peak = 0
+    return MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=SlowAgent),
+        **kwargs,
+    )
+
+
+def test_order_follows_dependencies():
+    pipeline = Pipeline(
+        [
+            Stage("c", depends_on=("a", "b")),
+            Stage("b", depends_on=("a",)),
+            Stage("a"),
+        ]
+    )
+    assert [s.name for s in pipeline] == ["a", "b", "c"]
+
+
+def test_invalid_pipelines_are_rejected():
+    with pytest.raises(ValueError, match="unknown stage"):
+        Pipeline([Stage("a", depends_on=("missing",))])
+    with pytest.raises(ValueError, match="cycle"):
+        Pipeline(
+            [
+                Stage("a", depends_on=("b",)),
+                Stage("b", depends_on=("a",)),
+            ]
+        )
+    with pytest.raises(ValueError, match="Duplicate"):
+        Pipeline([Stage("a"), Stage("a")])
+
+
+def test_disabled_stages_skip_their_dependents():
+    pipeline = Pipeline(
+        [
+            Stage("a"),
+            Stage("b", depends_on=("a",), enabled_by="flag"),
+            Stage("c", depends_on=("b",)),
+            Stage("d", depends_on=("a",)),
+        ]
+    )
+    active = pipeline.active(lambda stage: stage.enabled_by is None)
+    assert [s.name for s in active] == ["a", "d"]
+
+
+def test_without_stage_rewires_dependents():
+    pipeline = DEFAULT_PIPELINE.without_stage("synthesizer")
+    assert pipeline["treatment_agent"].depends_on == (
+        "medical_coder",
+    )
+
+
+def test_independent_stages_run_concurrently():
+    pipeline = Pipeline(
+        [Stage("a"), Stage("b"), Stage("c", depends_on=("a", "b"))]
+    )
+    seen = {}
+
+    def execute(stage, inputs):
+        time.sleep(0.1)
+        seen[stage.name] = sorted(inputs)
+        return stage.name.upper()
+
+    start = time.perf_counter()
+    results = run_pipeline(pipeline, execute)
+    elapsed = time.perf_counter() - start
+
+    assert results == {"a": "A", "b": "B", "c": "C"}
+    assert seen["c"] == ["a", "b"]
+    assert elapsed < 0.28
+
+
+def test_failures_propagate():
+    def execute(stage, inputs):
+        raise RuntimeError(f"{stage.name} failed")
+
+    with pytest.raises(RuntimeError, match="a failed"):
+        run_pipeline(Pipeline([Stage("a")]), execute)
+
+
+def test_arun_pipeline_passes_inputs():
+    pipeline = Pipeline([Stage("a"), Stage("b", depends_on=("a",))])
+
+    async def execute(stage, inputs):
+        return "+".join([stage.name, *inputs.values()])
+
+    results = asyncio.run(arun_pipeline(pipeline, execute))
+    assert results == {"a": "a", "b": "b+a"}
+
+
+def test_swarm_runs_parallel_stage_next_to_treatment(tmp_path):
+    swarm = make_swarm(tmp_path, pipeline=LAB_PIPELINE)
+
+    output = json.loads(swarm.run("Assess eGFR 59"))
+
+    assert [o["agent_name"] for o in output["agent_outputs"]] == [
+        "medical_coder",
+        "synthesizer",
+        "treatment_agent",
+        "lab_matcher",
+    ]
+    assert SlowAgent.peak == 2
+    assert "synthesizer done" in SlowAgent.prompts["lab_matcher"]
+
+
+def test_async_swarm_runs_parallel_stage(tmp_path):
+    swarm = make_swarm(
+        tmp_path, pipeline=LAB_PIPELINE, summarization=True
+    )
+
+    output = json.loads(asyncio.run(swarm.arun("Assess eGFR 59")))
+
+    assert len(output["agent_outputs"]) == 4
+    assert output["summary"] == "summarizer_agent done"
+    assert SlowAgent.peak == 2
+
+
+class SpecialistAgent:
+    """The internist hangs; every other agent answers at once."""
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str) -> str:
+        if self.agent_name == "internist":
+            time.sleep(1.0)
+        return f"{self.agent_name} findings"
+
+    async def arun(self, task: str) -> str:
+        if self.agent_name == "internist":
+            await asyncio.sleep(1.0)
+        return f"{self.agent_name} findings"
+
+
+def test_fan_out_consults_specialists_in_parallel(tmp_path):
+    swarm = make_swarm(tmp_path, fan_out=True)
+
+    start = time.perf_counter()
+    output = json.loads(swarm.run("Assess eGFR 59"))
+    elapsed = time.perf_counter() - start
+
+    assert [o["agent_name"] for o in output["agent_outputs"]] == [
+        "medical_coder",
+        "chief_medical_officer",
+        "internist",
+        "lab_matcher",
+        "synthesizer",
+        "treatment_agent",
+    ]
+    assert SlowAgent.peak == 4
+    # Coder and specialists overlap: three stages of wall time, not six
+    assert elapsed < 0.5
+    synthesizer_prompt = SlowAgent.prompts["synthesizer"]
+    for role in ("medical_coder", "internist", "lab_matcher"):
+        assert f"{role} done" in synthesizer_prompt
+
+
+def test_timed_out_specialist_is_left_out(tmp_path, capsys):
+    swarm = MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=SpecialistAgent),
+        fan_out=True,
+        specialist_timeout=0.2,
+    )
+
+    start = time.perf_counter()
+    output = json.loads(swarm.run("Assess eGFR 59"))
+
+    assert time.perf_counter() - start < 0.8
+    names = [o["agent_name"] for o in output["agent_outputs"]]
+    assert "internist" not in names
+    assert "synthesizer" in names
+    assert "Stage internist failed" in capsys.readouterr().out
+
+    output = json.loads(asyncio.run(swarm.arun("Assess eGFR 59")))
+    names = [o["agent_name"] for o in output["agent_outputs"]]
+    assert "internist" not in names
+    assert "lab_matcher" in names
+
+
+class HangingAgent:
+    """The internist blocks until ``release`` is set."""
+
+    release = threading.Event()
+    finished = threading.Event()
+    hung = []
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str) -> str:
+        if self.agent_name == "internist":
+            HangingAgent.hung.append(self)
+            HangingAgent.release.wait(timeout=5)
+            HangingAgent.finished.set()
+        return f"{self.agent_name} findings"
+
+
+class HangingAsyncAgent(HangingAgent):
+    """Like swarms agents, awaits ``run`` in a thread from ``arun``."""
+
+    async def arun(self, task: str) -> str:
+        return await asyncio.to_thread(self.run, task)
+
+
+class StageEndHook(MCSHook):
+    def __init__(self):
+        self.ended = []
+
+    def on_stage_end(self, run, stage, result):
+        self.ended.append(stage.name)
+
+
+@pytest.mark.parametrize(
+    "use_async, factory",
+    [
+        (False, HangingAgent),
+        (True, HangingAgent),
+        (True, HangingAsyncAgent),
+    ],
+)
+def test_timed_out_stage_leaves_nothing_behind(
+    tmp_path, use_async, factory
+):
+    HangingAgent.release.clear()
+    HangingAgent.finished.clear()
+    HangingAgent.hung = []
+    pool = AgentPool(
+        roles=(*PIPELINE_ROLES, *SPECIALIST_ROLES),
+        agent_factory=factory,
+    )
+    hook = StageEndHook()
+    swarm = MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=pool,
+        fan_out=True,
+        specialist_timeout=0.1,
+        checkpoint_store=CheckpointStore(
+            str(tmp_path / "checkpoints")
+        ),
+        hooks=[hook],
+    )
+
+    def check_next_lease():
+        # The internist is still running: the next lease gets others
+        (hung,) = HangingAgent.hung
+        assert pool.idle == 0
+        with pool.lease() as agents:
+            assert agents["internist"] is not hung
+        HangingAgent.release.set()
+        assert HangingAgent.finished.wait(timeout=5)
+        time.sleep(0.1)
+
+    if use_async:
+
+        async def run_and_check():
+            await swarm.arun("Assess eGFR 59")
+            # asyncio.run would wait for the hung thread on exit
+            await asyncio.to_thread(check_next_lease)
+
+        asyncio.run(run_and_check())
+    else:
+        swarm.run("Assess eGFR 59")
+        check_next_lease()
+
+    assert "internist" not in hook.ended
+    assert os.listdir(tmp_path / "checkpoints") == []
+
+
+def test_optional_failures_skip_stages_without_inputs():
+    pipeline = Pipeline(
+        [
+            Stage("a"),
+            Stage("b", required=False),
+            Stage("c", depends_on=("a", "b")),
+            Stage("d", depends_on=("b",), required=False),
+        ]
+    )
+    failures = []
+
+    def execute(stage, inputs):
+        if stage.name == "b":
+            raise RuntimeError("b failed")
+        return sorted(inputs)
+
+    results = run_pipeline(
+        pipeline,
+        execute,
+        on_failure=lambda stage, error: failures.append(stage.name),
+    )
+
+    assert results == {"a": [], "c": ["a"]}
+    assert failures == ["b", "d"]
+
+
+def test_skipped_stages_skip_dependents_without_failing():
+    pipeline = Pipeline(
+        [
+            Stage("a"),
+            Stage("b", depends_on=("a",)),
+            Stage("c", depends_on=("b",)),
+        ]
+    )
+    skipped, failures = [], []
+
+    def execute(stage, inputs):
+        if stage.name == "b":
+            raise SkipStage("over budget")
+        return stage.name
+
+    results = run_pipeline(
+        pipeline,
+        execute,
+        on_failure=lambda stage, error: failures.append(stage.name),
+        on_skip=lambda stage, reason: skipped.append(
+            (stage.name, reason)
+        ),
+    )
+
+    assert results == {"a": "a"}
+    assert failures == []
+    assert skipped == [
+        ("b", "over budget"),
+        ("c", "inputs of c were skipped"),
+    ]
+
+
+def test_bypassed_stages_hand_their_inputs_to_dependents():
+    pipeline = Pipeline(
+        [
+            Stage("a"),
+            Stage("b", depends_on=("a",)),
+            Stage("c", depends_on=("b",)),
+        ]
+    )
+    seen, skipped = {}, []
+
+    async def execute(stage, inputs):
+        if stage.name == "b":
+            raise BypassStage("confident")
+        seen[stage.name] = dict(inputs)
+        return stage.name
+
+    results = asyncio.run(
+        arun_pipeline(
+            pipeline,
+            execute,
+            on_skip=lambda stage, reason: skipped.append(
+                (stage.name, reason)
+            ),
+        )
+    )
+
+    assert results == {"a": "a", "c": "c"}
+    assert seen["c"] == {"a": "a"}
+    assert skipped == [("b", "confident")]
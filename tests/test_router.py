@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from mcs.agents import AgentPool
+from mcs.main import MedicalCoderSwarm
+from mcs.router import (
+    DEFAULT_TIER_MODELS,
+    ModelRouter,
+    RoutingTable,
+    score_case,
+)
+
+os.environ.setdefault("MASTER_KEY", "test_master_key")
+
+SIMPLE_CASE = "45-year-old male, eGFR 59 ml/min. Assess for CKD."
+
+COMPLEX_CASE = (
+    "Patient: 67-year-old female\n"
+    "History: type 2 diabetes, hypertension, ckd stage 4, "
+    "heart failure, anemia, hyperkalemia, gout, "
+    "nephrotic syndrome, proteinuria, kidney transplant\n"
+    "Labs: eGFR 22 ml/min, creatinine 2.9 mg/dL, potassium 6.1 mmol/L, "
+    "hemoglobin 9.1 g/dL, HbA1c 8.4%\n"
+) + "Progress note: stable overnight. " * 2000
+
+
+class ModelAgent:
+    """Answers with the model it runs on."""
+
+    def __init__(
+        self,
+        agent_name: str,
+        model_name: str = DEFAULT_TIER_MODELS["large"],
+    ):
+        self.agent_name = agent_name
+        self.model_name = model_name
+
+    def run(self, task: str) -> str:
+        return self.model_name
+
+
+def make_swarm(tmp_path, router, **kwargs):
+    return MedicalCoderSwarm(
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=ModelAgent),
+        router=router,
+        **kwargs,
+    )
+
+
+def test_score_case_counts_problems_labs_and_candidates():
+    features = score_case(COMPLEX_CASE)
+
+    assert features.tokens > 12000
+    assert features.problems >= 7
+    assert features.labs >= 4
+    assert features.abnormal_labs >= 3
+    assert features.candidates >= features.problems
+
+
+def test_case_tiers_follow_the_limits():
+    table = RoutingTable()
+
+    tier, reason = table.case_tier(score_case(SIMPLE_CASE))
+    assert tier == "small"
+    assert reason.startswith("fits small: tokens ")
+
+    tier, reason = table.case_tier(score_case(COMPLEX_CASE))
+    assert tier == "large"
+    assert "tokens" in reason and "problems" in reason
+
+
+def test_stage_tiers_clamp_the_case_tier():
+    router = ModelRouter(
+        RoutingTable(
+            stage_tiers={
+                "medical_coder": ("medium", "large"),
+                "summarizer_agent": ("small", "medium"),
+            },
+            stage_models={"synthesizer": {"small": "tiny"}},
+        )
+    )
+    simple = score_case(SIMPLE_CASE)
+    complex_ = score_case(COMPLEX_CASE)
+
+    coder = router.route(simple, "medical_coder")
+    assert coder.tier == "medium"
+    assert coder.reason.endswith("medical_coder needs medium")
+    assert router.route(simple, "synthesizer").model == "tiny"
+    summary = router.route(complex_, "summarizer_agent")
+    assert (summary.tier, summary.model) == (
+        "medium",
+        DEFAULT_TIER_MODELS["medium"],
+    )
+
+
+def test_unknown_tiers_are_rejected():
+    with pytest.raises(ValueError):
+        RoutingTable(models={"huge": "gpt-4o"})
+    with pytest.raises(ValueError):
+        RoutingTable(limits={"large": {"tokens": 1}})
+
+
+def test_simple_case_runs_on_the_small_model(tmp_path):
+    swarm = make_swarm(tmp_path, ModelRouter())
+
+    output = json.loads(swarm.run(SIMPLE_CASE))
+
+    small = DEFAULT_TIER_MODELS["small"]
+    assert [o["agent_output"] for o in output["agent_outputs"]] == [
+        small
+    ] * 3
+    routing = output["routing"]
+    assert routing["tier"] == "small"
+    assert routing["features"]["labs"] == 1
+    assert routing["stages"]["medical_coder"] == {
+        "tier": "small",
+        "model": small,
+        "reason": routing["reason"],
+    }
+
+
+def test_complex_case_keeps_the_large_model(tmp_path):
+    swarm = make_swarm(tmp_path, ModelRouter())
+
+    output = json.loads(asyncio.run(swarm.arun(COMPLEX_CASE)))
+
+    large = DEFAULT_TIER_MODELS["large"]
+    assert [o["agent_output"] for o in output["agent_outputs"]] == [
+        large
+    ] * 3
+    assert output["routing"]["tier"] == "large"
+
+
+def test_runs_without_a_router_record_no_routing(tmp_path):
+    swarm = make_swarm(tmp_path, None)
+
+    output = json.loads(swarm.run(SIMPLE_CASE))
+
+    assert output["routing"] is None
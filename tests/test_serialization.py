@@ -0,0 +1,123 @@
+import json
+import os
+
+from mcs.agents import AgentPool
+from mcs.main import MedicalCoderSwarm
+from mcs.serialization import dumps, is_json_native
+
+os.environ.setdefault("MASTER_KEY", "test_master_key")
+
+
+class EchoAgent:
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+
+    def run(self, task: str) -> str:
+        return f"{self.agent_name}: E11.9 Type 2 diabetes mellitus"
+
+
+def make_swarm(tmp_path, documentation="eGFR 59"):
+    return MedicalCoderSwarm(
+        patient_documentation=documentation,
+        key_storage_path=str(tmp_path / "keys"),
+        agent_pool=AgentPool(agent_factory=EchoAgent),
+    )
+
+
+def test_is_json_native():
+    assert is_json_native({"a": [1, 2.5, None, True, ("x",)]})
+    assert not is_json_native({1: "non-str key"})
+    assert not is_json_native([object()])
+
+
+def test_dumps_matches_json():
+    value = {"a": [1, 2.5, None, True], "b": "é"}
+    assert json.loads(dumps(value)) == value
+    assert json.loads(dumps({1: "x"})) == {"1": "x"}
+
+
+def test_to_dict_tracks_reassigned_attributes(tmp_path):
+    swarm = make_swarm(tmp_path)
+    assert swarm.to_dict()["patient_id"] == swarm.patient_id
+
+    swarm.patient_id = "patient-2"
+    assert swarm.to_dict()["patient_id"] == "patient-2"
+
+    swarm.rag_enabled = True
+    swarm.new_attribute = "late"
+    state = swarm.to_dict()
+    assert state["rag_enabled"] is True
+    assert state["new_attribute"] == "late"
+    assert "_serialized" not in state
+
+
+def test_to_dict_sees_in_place_mutations(tmp_path):
+    swarm = make_swarm(tmp_path)
+    swarm.to_dict()
+    swarm.patient_documentation += " more notes"
+    swarm.agent_outputs.append({"agent": "coder"})
+
+    state = swarm.to_dict()
+    assert state["patient_documentation"].endswith("more notes")
+    assert state["agent_outputs"][-1] == {"agent": "coder"}
+
+
+def test_to_dict_results_are_independent(tmp_path):
+    swarm = make_swarm(tmp_path)
+    swarm.run("Code this visit")
+    swarm.formatter = len
+    first = swarm.to_dict()
+    first["output_schema"]["codes"].clear()
+    first["formatter"]["name"] = "changed"
+
+    second = swarm.to_dict()
+    assert second["output_schema"]["codes"]
+    assert second["formatter"]["name"] == "len"
+    second["output_schema"]["patient_id"] = "other"
+    assert swarm.to_dict()["output_schema"]["patient_id"] == (
+        swarm.patient_id
+    )
+
+
+def test_large_documentation_passes_through(tmp_path):
+    documentation = "Lab Results: eGFR 59\n" * 50_000
+    swarm = make_swarm(tmp_path, documentation)
+
+    assert swarm.to_dict()["patient_documentation"] is documentation
+
+
+def test_output_schema_is_serialized_after_run(tmp_path):
+    swarm = make_swarm(tmp_path)
+    swarm.run("Code this visit")
+
+    state = json.loads(swarm.to_json())
+    schema = state["output_schema"]
+    assert schema["patient_id"] == swarm.patient_id
+    assert [code["code"] for code in schema["codes"]] == ["E11.9"]
+
+
+def test_output_schema_is_cached_until_it_changes(tmp_path):
+    swarm = make_swarm(tmp_path)
+    swarm.run("Code this visit")
+
+    first = swarm.to_dict()["output_schema"]
+    assert swarm.to_dict()["output_schema"] == first
+
+    swarm._record_output(EchoAgent("late_agent"), "late output")
+    outputs = swarm.to_dict()["output_schema"]["agent_outputs"]
+    assert outputs[-1]["agent_name"] == "late_agent"
+
+    swarm.output_schema.summary = "new summary"
+    assert (
+        swarm.to_dict()["output_schema"]["summary"] == "new summary"
+    )
+
+
+def test_forks_get_their_own_cache(tmp_path):
+    swarm = make_swarm(tmp_path)
+    swarm.to_dict()
+    fork = swarm._fork()
+    fork.patient_id = "forked"
+
+    assert fork.to_dict()["patient_id"] == "forked"
+    assert swarm.to_dict()["patient_id"] != "forked"